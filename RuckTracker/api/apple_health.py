@@ -1,10 +1,20 @@
 import logging
-from flask import request, jsonify
+
+from flask import request, jsonify, current_app
 from flask_restful import Resource
 
 from app import db
-from models import User, RuckSession, LocationPoint
+from models import User, AppleHealthIntegration, DEFAULT_APPLE_HEALTH_METRICS
 from api.schemas import apple_health_sync_schema, apple_health_status_schema
+from api.apple_health_import import AppleHealthImporter, import_workout_stream
+from api.apple_health_export import import_export
+from api.apple_health_sync import acknowledge_export, changed_sessions, integration_for, record_sync
+from api.pagination import PaginationError, parse_limit
+from api.route_lod import parse_simplify_args, simplified_route
+from api.streaming import location_points_by_session, route_points
+from utils.json_stream import JSONStreamReader
+from utils.periods import to_utc_naive
+from utils.route_encoding import ROUTE_FORMATS, encode_route
 
 logger = logging.getLogger(__name__)
 
@@ -17,8 +27,17 @@ class AppleHealthSyncResource(Resource):
         
         This endpoint accepts data in Apple Health Export format and converts
         it to our internal format for storage.
+        
+        With stream=true the body is parsed one workout at a time and
+        committed in batches, so large exports never sit in memory whole.
+        Invalid workouts are skipped and reported by index; so are workouts
+        whose values cannot be converted in either mode.
         """
         user = User.query.get_or_404(user_id)
+        
+        if request.args.get('stream', 'false').lower() == 'true':
+            return self._post_stream(user_id)
+        
         data = request.get_json()
         
         # Validate data using schema
@@ -29,68 +48,35 @@ class AppleHealthSyncResource(Resource):
         if not data or 'workouts' not in data:
             return {"message": "Invalid Apple Health data format"}, 400
             
-        workouts = data['workouts']
-        imported_count = 0
+        importer = AppleHealthImporter(user_id)
+        _, errors = importer.import_workouts(data['workouts'])
+        importer.commit()
+        record_sync(user_id)
         
-        for workout in workouts:
-            # Validate workout data has required fields
-            if not all(k in workout for k in ['startDate', 'endDate', 'duration', 'distance']):
-                continue
-                
-            # Check if this is a supported workout type (walking, hiking, or other)
-            workout_type = workout.get('workoutActivityType', '')
-            if not any(t in workout_type.lower() for t in ['walking', 'hiking', 'outdoor']):
-                continue
-                
-            # Check if we already have this session (avoid duplicates)
-            start_time = workout['startDate']
-            existing = RuckSession.query.filter_by(
-                user_id=user_id, 
-                start_time=start_time
-            ).first()
-            
-            if existing:
-                logger.info(f"Skipping already imported workout from {start_time}")
-                continue
-                
-            # Create new session from Apple Health data
-            ruck_weight = workout.get('metadata', {}).get('ruckWeight', 0)
-            
-            session = RuckSession(
-                user_id=user_id,
-                ruck_weight_kg=float(ruck_weight),
-                start_time=workout['startDate'],
-                end_time=workout['endDate'],
-                duration_seconds=int(float(workout['duration'])),
-                distance_km=float(workout['distance']),
-                status='completed'
-            )
-            
-            # Try to get elevation data if available
-            if 'elevationAscended' in workout:
-                session.elevation_gain_m = float(workout['elevationAscended'])
-                
-            # Try to get route data if available
-            if 'route' in workout:
-                for point in workout['route']:
-                    location = LocationPoint(
-                        session=session,
-                        latitude=point['latitude'],
-                        longitude=point['longitude'],
-                        altitude=point.get('altitude'),
-                        timestamp=point['timestamp']
-                    )
-                    db.session.add(location)
-            
-            db.session.add(session)
-            imported_count += 1
-            
-        db.session.commit()
+        result = importer.summary()
+        if errors:
+            result["errors"] = errors
+        return result, 201
         
-        return {
-            "message": f"Successfully imported {imported_count} workouts from Apple Health",
-            "imported_count": imported_count
-        }, 201
+    def _post_stream(self, user_id):
+        """Import the workouts array of the request body incrementally"""
+        importer = AppleHealthImporter(user_id)
+        reader = JSONStreamReader(request.stream)
+        
+        try:
+            errors = import_workout_stream(importer, reader.iter_object_array('workouts'),
+                                           current_app.config["APPLE_HEALTH_IMPORT_BATCH_SIZE"])
+        except ValueError as e:
+            # Workouts read before the malformed part are already committed
+            result = importer.summary()
+            result["message"] = f"Invalid Apple Health data format: {e}"
+            return result, 400
+        
+        record_sync(user_id)
+        result = importer.summary()
+        if errors:
+            result["errors"] = errors
+        return result, 201
         
     def get(self, user_id):
         """
@@ -98,24 +84,42 @@ class AppleHealthSyncResource(Resource):
         
         This endpoint converts our internal workout data to Apple Health
         format so it can be imported into the Apple Health app.
+        
+        Sessions are exported in the order they last changed, a page at a
+        time. The response's next_cursor, passed back as after=, returns
+        only sessions completed or edited since; sending it also records
+        it as the user's acknowledged export position, if it is further on
+        than the one recorded.
         """
         user = User.query.get_or_404(user_id)
         
-        # Get all completed sessions for user
-        sessions = RuckSession.query.filter_by(
-            user_id=user_id,
-            status='completed'
-        ).all()
+        # Routes default to a list of point objects; format= selects a compact encoding
+        route_format = request.args.get('format', 'json')
+        if route_format != 'json' and route_format not in ROUTE_FORMATS:
+            return {"message": f"format must be one of: json, {', '.join(ROUTE_FORMATS)}"}, 400
+        try:
+            simplify, tolerance, max_points = parse_simplify_args(request.args)
+        except ValueError as e:
+            return {"message": str(e)}, 400
+        
+        after = request.args.get('after')
+        try:
+            limit = parse_limit(request.args, current_app.config["PAGE_SIZE_DEFAULT"],
+                                current_app.config["PAGE_SIZE_MAX"])
+            sessions, next_cursor, has_more = changed_sessions(user_id, after, limit)
+        except PaginationError as e:
+            return {"message": str(e)}, 400
+        
+        # Routes of the whole page are read together, unless simplified from the cache
+        points = {} if simplify else location_points_by_session([session.id for session in sessions])
         
         apple_health_data = {
-            "workouts": []
+            "workouts": [],
+            "next_cursor": next_cursor,
+            "has_more": has_more
         }
         
         for session in sessions:
-            # Only include sessions with complete data
-            if not session.start_time or not session.end_time:
-                continue
-                
             workout = {
                 "workoutActivityType": "HKWorkoutActivityTypeWalking",
                 "startDate": session.start_time.isoformat(),
@@ -132,23 +136,61 @@ class AppleHealthSyncResource(Resource):
                 workout["elevationAscended"] = float(session.elevation_gain_m)
                 
             # Add route data if available
-            location_points = LocationPoint.query.filter_by(session_id=session.id).all()
-            if location_points:
+            if simplify:
+                rows = simplified_route(session, simplify, tolerance, max_points)
+            else:
+                rows = points.get(session.id)
+            if rows and route_format in ROUTE_FORMATS:
+                workout["route"] = encode_route(route_points(rows), route_format)
+            elif rows:
                 workout["route"] = [
                     {
-                        "latitude": point.latitude,
-                        "longitude": point.longitude,
-                        "altitude": point.altitude,
-                        "timestamp": point.timestamp.isoformat()
+                        "latitude": row.latitude,
+                        "longitude": row.longitude,
+                        "altitude": row.altitude,
+                        "timestamp": row.timestamp.isoformat() if row.timestamp else None
                     }
-                    for point in location_points
+                    for row in rows
                 ]
                 
             apple_health_data["workouts"].append(workout)
-            
+        
+        acknowledge_export(user_id, after)
         return apple_health_data, 200
 
 
+class AppleHealthExportImportResource(Resource):
+    """Resource for importing the Health app's own export.zip or export.xml"""
+    
+    def post(self, user_id):
+        """
+        Import walking and hiking workouts, with their routes, from a Health app export
+        
+        The export is uploaded as the multipart field "file", or sent as the
+        raw body when it is a bare export.xml. It is parsed incrementally and
+        committed in batches like a streamed sync.
+        """
+        user = User.query.get_or_404(user_id)
+        
+        upload = request.files.get('file')
+        source = upload.stream if upload else request.stream
+        
+        importer = AppleHealthImporter(user_id)
+        try:
+            errors = import_export(importer, source, current_app.config["APPLE_HEALTH_IMPORT_BATCH_SIZE"])
+        except ValueError as e:
+            # Workouts read before the malformed part are already committed
+            result = importer.summary()
+            result["message"] = f"Invalid Apple Health export: {e}"
+            return result, 400
+        
+        record_sync(user_id)
+        result = importer.summary()
+        if errors:
+            result["errors"] = errors
+        return result, 201
+
+
 class AppleHealthIntegrationStatusResource(Resource):
     """Resource for managing Apple Health integration status"""
     
@@ -156,13 +198,15 @@ class AppleHealthIntegrationStatusResource(Resource):
         """Get Apple Health integration status for a user"""
         user = User.query.get_or_404(user_id)
         
-        # This would normally check user settings for Apple Health integration
-        # For now we'll return a placeholder
-        return {
-            "integration_enabled": False,
-            "last_sync_time": None,
-            "metrics_to_sync": ["workouts", "distance", "elevation"]
-        }, 200
+        integration = AppleHealthIntegration.query.filter_by(user_id=user_id).first()
+        if integration is None:
+            return {
+                "integration_enabled": False,
+                "last_sync_time": None,
+                "metrics_to_sync": list(DEFAULT_APPLE_HEALTH_METRICS),
+                "export_cursor": None
+            }, 200
+        return integration.to_dict(), 200
         
     def put(self, user_id):
         """Update Apple Health integration settings"""
@@ -174,11 +218,13 @@ class AppleHealthIntegrationStatusResource(Resource):
         if errors:
             return {"errors": errors}, 400
         
-        # This would normally update user settings
-        # For now we'll just return the input
-        integration_status = {
-            "integration_enabled": data.get('integration_enabled', False),
-            "metrics_to_sync": data.get('metrics_to_sync', [])
-        }
+        data = apple_health_status_schema.load(data)
+        integration = integration_for(user_id)
+        integration.integration_enabled = data['integration_enabled']
+        if 'metrics_to_sync' in data:
+            integration.metrics_to_sync = data['metrics_to_sync']
+        if 'last_sync_time' in data:
+            integration.last_sync_time = to_utc_naive(data['last_sync_time'])
+        db.session.commit()
         
-        return integration_status, 200
\ No newline at end of file
+        return integration.to_dict(), 200
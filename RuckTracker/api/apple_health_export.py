@@ -0,0 +1,225 @@
+import logging
+import os
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+from datetime import datetime
+
+from api.apple_health_import import is_supported_type, import_workout_stream
+
+logger = logging.getLogger(__name__)
+
+# Apple Health export units, as multipliers to seconds, kilometers and meters
+DURATION_UNITS = {'s': 1, 'sec': 1, 'min': 60, 'hr': 3600, 'h': 3600}
+DISTANCE_UNITS = {'km': 1.0, 'm': 0.001, 'mi': 1.609344, 'yd': 0.0009144, 'ft': 0.0003048}
+ELEVATION_UNITS = {'m': 1.0, 'cm': 0.01, 'km': 1000.0, 'ft': 0.3048, 'in': 0.0254}
+
+# Date format of export.xml attributes, e.g. "2024-05-01 07:30:00 -0600"
+EXPORT_DATE_FORMAT = '%Y-%m-%d %H:%M:%S %z'
+
+
+def _local_name(tag):
+    """Tag name without its XML namespace"""
+    return tag.rsplit('}', 1)[-1]
+
+
+def _export_date(value):
+    """
+    Convert an export.xml date to the ISO format the JSON sync uses
+
+    Unparseable values are passed through for schema validation to report.
+    """
+    try:
+        return datetime.strptime(value, EXPORT_DATE_FORMAT).isoformat()
+    except (TypeError, ValueError):
+        return value
+
+
+def _quantity(value, unit, units):
+    """Convert a number in an export unit; None if it is missing, invalid or in an unknown unit"""
+    if value is None or unit not in units:
+        return None
+    try:
+        return float(value) * units[unit]
+    except ValueError:
+        return None
+
+
+def iter_gpx_points(fileobj):
+    """
+    Yield route point dicts of a workout-routes GPX file
+
+    Track points are parsed incrementally and cleared once read.
+
+    Args:
+        fileobj: Binary file object of the GPX document
+
+    Returns:
+        generator: Dicts with latitude, longitude, altitude, accuracies and
+        ISO timestamp, as in the JSON sync format
+    """
+    for _, element in ET.iterparse(fileobj, events=('end',)):
+        if _local_name(element.tag) != 'trkpt':
+            continue
+
+        values = {_local_name(child.tag): child.text for child in element.iter()}
+        timestamp = values.get('time')
+        if timestamp:
+            yield {
+                'latitude': float(element.get('lat')),
+                'longitude': float(element.get('lon')),
+                'altitude': float(values['ele']) if values.get('ele') else None,
+                'horizontal_accuracy_m': float(values['hAcc']) if values.get('hAcc') else None,
+                'vertical_accuracy_m': float(values['vAcc']) if values.get('vAcc') else None,
+                'timestamp': datetime.fromisoformat(timestamp.replace('Z', '+00:00')).isoformat()
+            }
+        element.clear()
+
+
+def _workout_dict(element, open_route):
+    """Convert a Workout element of export.xml to the JSON sync workout format"""
+    workout = {'workoutActivityType': element.get('workoutActivityType')}
+    for field in ('startDate', 'endDate'):
+        if element.get(field):
+            workout[field] = _export_date(element.get(field))
+
+    duration = _quantity(element.get('duration'), element.get('durationUnit', 'min'), DURATION_UNITS)
+    if duration is not None:
+        workout['duration'] = duration
+    distance = _quantity(element.get('totalDistance'), element.get('totalDistanceUnit'), DISTANCE_UNITS)
+
+    route_path = None
+    for child in element:
+        name = _local_name(child.tag)
+        if name == 'MetadataEntry' and child.get('key') == 'HKElevationAscended':
+            # Elevation is stored as "<value> <unit>", e.g. "4523 cm"
+            value, _, unit = child.get('value', '').partition(' ')
+            elevation = _quantity(value or None, unit, ELEVATION_UNITS)
+            if elevation is not None:
+                workout['elevationAscended'] = elevation
+        elif name == 'WorkoutStatistics' and distance is None and 'Distance' in child.get('type', ''):
+            # Newer exports only report distance as a workout statistic
+            distance = _quantity(child.get('sum'), child.get('unit'), DISTANCE_UNITS)
+        elif name == 'WorkoutRoute':
+            reference = next((ref for ref in child.iter() if _local_name(ref.tag) == 'FileReference'), None)
+            if reference is not None:
+                route_path = reference.get('path')
+
+    if distance is not None:
+        workout['distance'] = distance
+
+    if route_path:
+        route_file = open_route(route_path)
+        if route_file is None:
+            logger.warning(f"Route file {route_path} is missing from the export")
+        else:
+            try:
+                with route_file:
+                    workout['route'] = list(iter_gpx_points(route_file))
+            except (ET.ParseError, ValueError, TypeError) as e:
+                logger.warning(f"Skipping unreadable route file {route_path}: {e}")
+
+    return workout
+
+
+def iter_export_workouts(xml_file, open_route):
+    """
+    Yield supported workouts of an Apple Health export.xml in the JSON sync format
+
+    The document is parsed incrementally and every top-level record is
+    cleared once read, so memory stays bounded by one workout and its route
+    however large the export is. Records other than walking and hiking
+    workouts are skipped without being converted.
+
+    Args:
+        xml_file: Binary file object of export.xml
+        open_route: Callable taking a FileReference path and returning a binary
+            file object of the GPX route, or None if it is not available
+
+    Returns:
+        generator: Workout dicts
+
+    Raises:
+        ValueError: If the document is not well-formed XML
+    """
+    depth = 0
+    root = None
+    try:
+        for event, element in ET.iterparse(xml_file, events=('start', 'end')):
+            if event == 'start':
+                if root is None:
+                    root = element
+                depth += 1
+                continue
+
+            depth -= 1
+            if depth != 1:
+                continue
+            if element.tag == 'Workout' and is_supported_type(element.get('workoutActivityType')):
+                yield _workout_dict(element, open_route)
+            # Drop every finished top-level record from the tree
+            root.clear()
+    except ET.ParseError as e:
+        raise ValueError(f"Invalid export.xml: {e}") from None
+
+
+def _open_zip_export(archive):
+    """Find export.xml in an export.zip; returns (xml file, route opener)"""
+    names = set(archive.namelist())
+    xml_name = next((name for name in sorted(names) if posixpath.basename(name) == 'export.xml'), None)
+    if xml_name is None:
+        raise ValueError("The archive does not contain export.xml")
+    base = posixpath.dirname(xml_name)
+
+    def open_route(path):
+        name = posixpath.join(base, path.lstrip('/'))
+        return archive.open(name) if name in names else None
+
+    return archive.open(xml_name), open_route
+
+
+def _open_directory_route(directory):
+    """Route opener for an export.xml extracted next to its workout-routes folder"""
+    def open_route(path):
+        full_path = os.path.join(directory, *path.lstrip('/').split('/'))
+        return open(full_path, 'rb') if os.path.isfile(full_path) else None
+    return open_route
+
+
+def import_export(importer, source, batch_size=100, directory=None):
+    """
+    Import the supported workouts of an Apple Health export.zip or export.xml
+
+    Workouts go through import_workout_stream, so they are validated,
+    deduplicated and bulk inserted like a streamed JSON sync, and committed
+    every batch_size workouts.
+
+    Args:
+        importer (AppleHealthImporter): Importer for the user
+        source: Path or binary file object of export.zip or export.xml; zip
+            archives are only recognized in seekable file objects
+        batch_size (int): Workouts per import batch and commit
+        directory (str): Where route files referenced by a bare export.xml
+            live; defaults to the directory of a source path
+
+    Returns:
+        dict: Validation errors keyed by workout index
+
+    Raises:
+        ValueError: If the export is malformed
+    """
+    is_path = isinstance(source, (str, os.PathLike))
+    if is_path and directory is None:
+        directory = os.path.dirname(os.path.abspath(source))
+
+    # Zip archives need random access; a one-way stream can only be export.xml
+    if (is_path or source.seekable()) and zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            xml_file, open_route = _open_zip_export(archive)
+            with xml_file:
+                return import_workout_stream(importer, iter_export_workouts(xml_file, open_route), batch_size)
+
+    if not is_path and source.seekable():
+        source.seek(0)
+    open_route = _open_directory_route(directory) if directory else (lambda path: None)
+    return import_workout_stream(importer, iter_export_workouts(source, open_route), batch_size)
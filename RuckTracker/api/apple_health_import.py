@@ -0,0 +1,320 @@
+import csv
+import io
+import logging
+import time
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from app import db
+from models import RuckSession, LocationPoint
+from api.rollups import session_contribution, apply_rollup_changes
+from api.schemas import apple_health_workout_schema
+from utils.periods import to_utc_naive
+
+logger = logging.getLogger(__name__)
+
+# Fields every importable workout must have
+REQUIRED_WORKOUT_FIELDS = ('startDate', 'endDate', 'duration', 'distance')
+
+# Workout types imported as rucking sessions, matched case-insensitively
+SUPPORTED_WORKOUT_TYPES = ('walking', 'hiking', 'outdoor')
+
+# Route point columns written by the bulk insert, in COPY column order
+ROUTE_COLUMNS = ('session_id', 'latitude', 'longitude', 'altitude',
+                 'horizontal_accuracy_m', 'vertical_accuracy_m', 'timestamp', 'timestamp_from_client')
+
+# Route points per INSERT or COPY statement
+ROUTE_CHUNK_SIZE = 5000
+
+
+def is_supported_type(workout_type):
+    """Check that a workout activity type is imported as a rucking session"""
+    workout_type = (workout_type or '').lower()
+    return any(supported in workout_type for supported in SUPPORTED_WORKOUT_TYPES)
+
+
+def is_importable(workout):
+    """Check that a workout has the required fields and a supported activity type"""
+    if not all(field in workout for field in REQUIRED_WORKOUT_FIELDS):
+        return False
+    return is_supported_type(workout.get('workoutActivityType'))
+
+
+class AppleHealthImporter:
+    """
+    Imports Apple Health workouts for one user, skipping ones already stored
+
+    A workout is a duplicate when the user already has a session starting at
+    the same instant, either stored or earlier in the same import. Stored
+    start times are fetched with one query per batch of workouts, over the
+    batch's time window, instead of one lookup per workout.
+    """
+
+    def __init__(self, user_id, route_chunk_size=ROUTE_CHUNK_SIZE):
+        self.user_id = user_id
+        self.route_chunk_size = route_chunk_size
+        self.imported_count = 0
+        self.duplicate_count = 0
+        self._seen_start_times = set()
+
+        # Sessions not yet counted in the rollups, and route samples waiting for their session's id
+        self._uncommitted_sessions = []
+        self._pending_routes = []
+        self.route_point_count = 0
+        self.route_insert_seconds = 0.0
+
+    @property
+    def points_per_second(self):
+        """Route points inserted per second spent parsing and writing them"""
+        return self.route_point_count / self.route_insert_seconds if self.route_insert_seconds else 0.0
+
+    def _existing_start_times(self, start_times):
+        """Start times among start_times that the user already has sessions for"""
+        if not start_times:
+            return set()
+        rows = (db.session.query(RuckSession.start_time)
+                .filter(RuckSession.user_id == self.user_id,
+                        RuckSession.start_time >= min(start_times),
+                        RuckSession.start_time <= max(start_times))
+                .all())
+        return {row.start_time for row in rows} & start_times
+
+    def import_workouts(self, workouts):
+        """
+        Add sessions for a batch of workouts to the database session
+
+        Unsupported or incomplete workouts are ignored, and workouts whose
+        values cannot be converted are skipped. Nothing is committed; call
+        commit() after one or more batches.
+
+        Returns:
+            tuple: (sessions created for this batch, errors keyed by the
+            position in workouts of each skipped workout)
+        """
+        candidates = []
+        errors = {}
+        for position, workout in enumerate(workouts):
+            if not is_importable(workout):
+                continue
+            try:
+                candidates.append((position, workout, to_utc_naive(datetime.fromisoformat(workout['startDate']))))
+            except (TypeError, ValueError) as e:
+                errors[position] = {"startDate": [f"Invalid start date: {e}"]}
+
+        self._seen_start_times |= self._existing_start_times(
+            {start_time for _, _, start_time in candidates} - self._seen_start_times
+        )
+
+        sessions = []
+        for position, workout, start_time in candidates:
+            if start_time in self._seen_start_times:
+                logger.info(f"Skipping already imported workout from {start_time}")
+                self.duplicate_count += 1
+                continue
+            try:
+                session = self._build_session(workout, start_time)
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning(f"Skipping workout from {start_time} with invalid values: {e!r}")
+                errors[position] = {"_schema": [f"Workout values could not be converted: {e!r}"]}
+                continue
+            self._seen_start_times.add(start_time)
+            sessions.append(session)
+
+        self.imported_count += len(sessions)
+        self._uncommitted_sessions.extend(sessions)
+        self._insert_routes()
+        return sessions, errors
+
+    def _build_session(self, workout, start_time):
+        """
+        Create a completed session, and its route points, from one workout
+
+        Every value is converted before the session is added, so a workout
+        that fails conversion leaves nothing behind.
+
+        Raises:
+            KeyError, TypeError, ValueError: If a value cannot be converted
+        """
+        ruck_weight = workout.get('metadata', {}).get('ruckWeight', 0)
+
+        session = RuckSession(
+            user_id=self.user_id,
+            ruck_weight_kg=float(ruck_weight),
+            start_time=start_time,
+            end_time=to_utc_naive(datetime.fromisoformat(workout['endDate'])),
+            duration_seconds=int(float(workout['duration'])),
+            distance_km=float(workout['distance']),
+            status='completed'
+        )
+
+        # Try to get elevation data if available
+        if 'elevationAscended' in workout:
+            session.elevation_gain_m = float(workout['elevationAscended'])
+
+        # Route samples are bulk inserted once the session has an id
+        if workout.get('route'):
+            route = [_route_values(point) for point in workout['route']]
+            session.points_received = session.points_stored = len(route)
+            self._pending_routes.append((session, route))
+
+        db.session.add(session)
+        return session
+
+    def _route_rows(self):
+        """Yield insert rows for every pending route sample"""
+        for session, route in self._pending_routes:
+            for values in route:
+                row = dict(zip(ROUTE_COLUMNS[1:], values))
+                row['session_id'] = session.id
+                yield row
+
+    def _insert_routes(self):
+        """
+        Write pending route samples with Core inserts, bypassing the ORM unit of work
+
+        Sessions are flushed first so their ids are known. Samples are written
+        route_chunk_size at a time, through COPY on PostgreSQL with psycopg2
+        and as executemany INSERTs elsewhere.
+        """
+        if not self._pending_routes:
+            return
+
+        started = time.perf_counter()
+        db.session.flush()
+
+        connection = db.session.connection()
+        use_copy = connection.dialect.name == 'postgresql' and connection.dialect.driver == 'psycopg2'
+
+        chunk = []
+        for row in self._route_rows():
+            chunk.append(row)
+            if len(chunk) >= self.route_chunk_size:
+                self._write_route_chunk(connection, chunk, use_copy)
+                chunk = []
+        if chunk:
+            self._write_route_chunk(connection, chunk, use_copy)
+
+        self._pending_routes = []
+        self.route_insert_seconds += time.perf_counter() - started
+
+    def _write_route_chunk(self, connection, rows, use_copy):
+        """Insert one chunk of route rows in the current transaction"""
+        self.route_point_count += len(rows)
+
+        if not use_copy:
+            connection.execute(insert(LocationPoint), rows)
+            return
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([
+                '' if row[column] is None else row[column].isoformat() if column == 'timestamp' else row[column]
+                for column in ROUTE_COLUMNS
+            ])
+        buffer.seek(0)
+
+        # COPY runs on the DBAPI connection behind the session, so it joins its transaction
+        with connection.connection.dbapi_connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {LocationPoint.__table__.name} ({', '.join(ROUTE_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+                buffer
+            )
+
+    def commit(self):
+        """Count the sessions imported since the last commit in the daily rollups and commit them together"""
+        apply_rollup_changes([(None, session_contribution(session)) for session in self._uncommitted_sessions])
+        db.session.commit()
+        self._uncommitted_sessions = []
+
+        if self.route_point_count:
+            logger.info(f"Imported {self.route_point_count} route points "
+                        f"at {self.points_per_second:.0f} points/s")
+
+    def summary(self):
+        """Counts reported to clients after an import"""
+        return {
+            "message": f"Successfully imported {self.imported_count} workouts from Apple Health",
+            "imported_count": self.imported_count,
+            "duplicate_count": self.duplicate_count,
+            "route_point_count": self.route_point_count,
+            "points_per_second": round(self.points_per_second, 1)
+        }
+
+
+def _route_values(point):
+    """Convert one route sample to its ROUTE_COLUMNS values after session_id"""
+    return (
+        float(point['latitude']),
+        float(point['longitude']),
+        _optional_float(point.get('altitude')),
+        _optional_float(point.get('horizontal_accuracy_m')),
+        _optional_float(point.get('vertical_accuracy_m')),
+        to_utc_naive(datetime.fromisoformat(point['timestamp'])),
+        True  # Route samples carry the device's fix time
+    )
+
+
+def _optional_float(value):
+    """float(value), keeping None"""
+    return None if value is None else float(value)
+
+
+def import_workout_stream(importer, workouts, batch_size=100):
+    """
+    Validate and import workouts as they are read, committing every batch_size
+
+    Workouts failing validation or conversion are skipped and reported by
+    their index in the stream. If reading the stream fails part way, the
+    valid workouts read before the failure are still imported before the
+    error propagates.
+
+    Args:
+        importer (AppleHealthImporter): Importer for the syncing user
+        workouts (iterable): Workout dicts, e.g. from JSONStreamReader.iter_object_array
+        batch_size (int): Workouts per import batch and commit
+
+    Returns:
+        dict: Validation errors keyed by workout index
+
+    Raises:
+        ValueError: If the stream of workouts is malformed
+    """
+    errors = {}
+    batch, batch_indices = [], []
+
+    def flush():
+        if batch:
+            _, batch_errors = importer.import_workouts(batch)
+            for position, workout_errors in batch_errors.items():
+                errors[batch_indices[position]] = workout_errors
+            importer.commit()
+            batch.clear()
+            batch_indices.clear()
+
+    workouts = enumerate(workouts)
+    while True:
+        # Only errors raised while reading the stream mean it is malformed
+        try:
+            index, workout = next(workouts)
+        except StopIteration:
+            break
+        except ValueError:
+            flush()
+            raise
+
+        if not isinstance(workout, dict):
+            errors[index] = {"_schema": ["Workout must be an object."]}
+            continue
+        workout_errors = apple_health_workout_schema.validate(workout)
+        if workout_errors:
+            errors[index] = workout_errors
+            continue
+        batch.append(workout)
+        batch_indices.append(index)
+        if len(batch) >= batch_size:
+            flush()
+
+    flush()
+    return errors
@@ -0,0 +1,134 @@
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from models import RuckSession, AppleHealthIntegration
+from api.change_counters import increment_user_counter
+from api.pagination import PaginationError, encode_cursor, decode_cursor
+
+
+def integration_for(user_id):
+    """
+    The user's integration row, created with default settings if missing
+
+    Returns:
+        AppleHealthIntegration: Row attached to the current database session
+    """
+    integration = AppleHealthIntegration.query.filter_by(user_id=user_id).first()
+    if integration is not None:
+        return integration
+
+    integration = AppleHealthIntegration(user_id=user_id)
+    try:
+        with db.session.begin_nested():
+            db.session.add(integration)
+    except IntegrityError:
+        # Another request created it first
+        integration = AppleHealthIntegration.query.filter_by(user_id=user_id).one()
+    return integration
+
+
+def record_sync(user_id, export_cursor=None):
+    """Record an import or export as the user's last sync, and the export position the client acknowledged"""
+    integration = integration_for(user_id)
+    integration.last_sync_time = datetime.utcnow()
+    if export_cursor:
+        integration.export_cursor = export_cursor
+    db.session.commit()
+
+
+@event.listens_for(db.session, 'before_flush')
+def _number_session_changes(session, flush_context, instances):
+    """Give every new or modified session the next change number of its user"""
+    changed = defaultdict(list)
+    for obj in session.new:
+        if isinstance(obj, RuckSession):
+            changed[obj.user_id].append(obj)
+    for obj in session.dirty:
+        if isinstance(obj, RuckSession) and session.is_modified(obj):
+            changed[obj.user_id].append(obj)
+
+    # Always lock counters in the same order
+    for user_id in sorted(changed):
+        sessions = changed[user_id]
+        # The counter row stays locked until commit, so a user's changes commit in number order
+        last = increment_user_counter(user_id, 'session_changes', len(sessions))
+        for change_seq, obj in enumerate(sessions, start=last - len(sessions) + 1):
+            obj.change_seq = change_seq
+
+
+def _cursor_change_seq(cursor):
+    """
+    Change number a cursor continues after
+
+    Cursors issued before change numbers existed start over from the first session.
+
+    Raises:
+        PaginationError: If the cursor is invalid
+    """
+    payload = decode_cursor(cursor)
+    change_seq = payload.get('seq', 0)
+    if not isinstance(change_seq, int):
+        raise PaginationError("Invalid cursor")
+    return change_seq
+
+
+def acknowledge_export(user_id, after):
+    """
+    Record an export cursor the client sent back, if it moves past the recorded one
+
+    Requests repeating or going back behind the recorded position write nothing.
+    """
+    if not after:
+        return
+    position = _cursor_change_seq(after)
+    integration = AppleHealthIntegration.query.filter_by(user_id=user_id).first()
+    if (integration is not None and integration.export_cursor
+            and _cursor_change_seq(integration.export_cursor) >= position):
+        return
+    record_sync(user_id, export_cursor=after)
+
+
+def changed_sessions(user_id, after=None, limit=50):
+    """
+    Exportable sessions of a user that changed after an export cursor
+
+    Completed sessions with start and end times are ordered by change
+    number. Numbers are handed out by the database in commit order, so a
+    cursor marks the last session a client received and every session
+    completed or edited later moves past it and is exported again, even if
+    it started changing first.
+
+    Args:
+        user_id (int): User whose sessions to export
+        after (str): Cursor from a previous export, or None for all sessions
+        limit (int): Most sessions returned
+
+    Returns:
+        tuple: (sessions, next_cursor, has_more); next_cursor marks the end of
+        this page, or repeats after when nothing changed
+
+    Raises:
+        PaginationError: If the cursor is invalid
+    """
+    change_seq = _cursor_change_seq(after) if after else 0
+
+    # One extra row tells whether another page follows
+    sessions = (RuckSession.query
+                .filter(RuckSession.user_id == user_id,
+                        RuckSession.change_seq > change_seq,
+                        RuckSession.status == 'completed',
+                        RuckSession.start_time.isnot(None),
+                        RuckSession.end_time.isnot(None))
+                .order_by(RuckSession.change_seq)
+                .limit(limit + 1)
+                .all())
+    has_more = len(sessions) > limit
+    sessions = sessions[:limit]
+    if not sessions:
+        return sessions, after, False
+
+    return sessions, encode_cursor({'seq': sessions[-1].change_seq}), has_more
@@ -0,0 +1,48 @@
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import db
+from models import UserChangeCounter
+
+
+def increment_user_counter(user_id, field, count=1):
+    """
+    Add count to one of a user's change counters in the caller's transaction
+
+    The counter row stays locked until the transaction ends, so increments
+    of the same user commit in the order of the values they returned.
+
+    Args:
+        user_id (int): User whose counter to increment
+        field (str): UserChangeCounter column, e.g. 'session_changes'
+        count (int): Amount to add
+
+    Returns:
+        int: The counter's value after the increment
+    """
+    table = UserChangeCounter.__table__
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect in ('postgresql', 'sqlite'):
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        statement = insert(table).values(user_id=user_id, **{field: count})
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.user_id],
+            set_={field: table.c[field] + statement.excluded[field]}
+        ).returning(table.c[field])
+        return db.session.execute(statement).scalar_one()
+
+    # Other databases: read-modify-write under a row lock
+    counter = UserChangeCounter.query.filter_by(user_id=user_id).with_for_update().first()
+    if counter is None:
+        counter = UserChangeCounter(user_id=user_id, session_changes=0, statistics_changes=0)
+        db.session.add(counter)
+    setattr(counter, field, getattr(counter, field) + count)
+    return getattr(counter, field)
+
+
+def user_counter(user_id, field):
+    """Current committed value of one of a user's change counters, 0 if never incremented"""
+    value = db.session.execute(
+        db.select(UserChangeCounter.__table__.c[field]).where(UserChangeCounter.user_id == user_id)
+    ).scalar()
+    return value or 0
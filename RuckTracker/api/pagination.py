@@ -0,0 +1,179 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from sqlalchemy import DateTime, and_, tuple_
+
+
+class PaginationError(ValueError):
+    """Invalid pagination parameters, reported to the client as a 400"""
+
+
+def encode_cursor(payload):
+    """Encode a cursor payload as an opaque URL-safe token"""
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a token produced by encode_cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise PaginationError("Invalid cursor")
+    if not isinstance(payload, dict):
+        raise PaginationError("Invalid cursor")
+    return payload
+
+
+def keyset_phases(column, id_column, value=None, last_id=None, descending=False):
+    """
+    Conditions and orderings of the queries that read a keyset ordering from a position
+
+    Rows are ordered by (column, id), and rows whose column is NULL follow
+    all others, ordered by id, in both directions. The two runs are read by
+    separate queries: the first is a plain row-value range on (column, id)
+    that an index on the column can seek into, which an OR with the NULL
+    rows would prevent, and the second reads the NULL run.
+
+    Args:
+        column: Sort column
+        id_column: Unique column used to break ties
+        value: Sort value of the last row read; None once inside the NULL run
+        last_id: Id of the last row read, or None to start from the first row
+        descending (bool): Whether the ordering is descending
+
+    Returns:
+        list: (condition, ordering) pairs, to be read in turn
+    """
+    ordering = (column.desc(), id_column.desc()) if descending else (column.asc(), id_column.asc())
+    if last_id is None:
+        phases = [(column.isnot(None), ordering)]
+    elif value is None:
+        # Already inside the NULL run
+        id_after = id_column < last_id if descending else id_column > last_id
+        return [(and_(column.is_(None), id_after), ordering[1:])]
+    else:
+        position = tuple_(column, id_column)
+        phases = [(position < (value, last_id) if descending else position > (value, last_id), ordering)]
+
+    if column.nullable:
+        phases.append((column.is_(None), ordering[1:]))
+    return phases
+
+
+def fetch_keyset_page(query, fetch, column, id_column, value=None, last_id=None, limit=50, descending=False):
+    """
+    Read up to limit rows of a keyset ordering after a position
+
+    The NULL run is only queried when the rows with a value run out first.
+
+    Args:
+        query: Query or select to read from, already filtered
+        fetch (callable): Runs a query and returns its rows, e.g. lambda query: query.all()
+        column, id_column, value, last_id, descending: As for keyset_phases
+        limit (int): Most rows returned
+
+    Returns:
+        list: Rows in keyset order
+    """
+    rows = []
+    for condition, ordering in keyset_phases(column, id_column, value, last_id, descending):
+        rows += fetch(query.filter(condition).order_by(*ordering).limit(limit - len(rows)))
+        if len(rows) >= limit:
+            break
+    return rows
+
+
+def parse_limit(args, default_limit=50, max_limit=200):
+    """
+    Read the page size from request arguments
+
+    Raises:
+        PaginationError: If limit is not an integer between 1 and max_limit
+    """
+    raw = args.get('limit')
+    if raw is None:
+        return default_limit
+    try:
+        limit = int(raw)
+    except ValueError:
+        limit = None
+    if limit is None or not 1 <= limit <= max_limit:
+        raise PaginationError(f"limit must be an integer between 1 and {max_limit}")
+    return limit
+
+
+def paginate(query, args, sort_columns, id_column, default_sort, default_order='asc',
+             default_limit=50, max_limit=200):
+    """
+    Fetch one page of a query using keyset pagination
+
+    Pages are ordered by the chosen sort column with the id as a tie-breaker,
+    and continue strictly after the position stored in the cursor, so a page
+    costs the same however deep it is and rows inserted meanwhile are neither
+    skipped nor repeated.
+
+    Args:
+        query: Query to paginate, already filtered
+        args: Request arguments with optional limit, after, sort and order
+        sort_columns (dict): Allowed sort names mapped to columns
+        id_column: Unique column used to break ties
+        default_sort (str): Sort name used when none is given
+        default_order (str): 'asc' or 'desc' used when none is given
+        default_limit (int): Page size used when none is given
+        max_limit (int): Largest page size a client may request
+
+    Returns:
+        tuple: (items, next_cursor), next_cursor being None on the last page
+
+    Raises:
+        PaginationError: If a parameter or the cursor is invalid
+    """
+    sort = args.get('sort', default_sort)
+    if sort not in sort_columns:
+        raise PaginationError(f"sort must be one of: {', '.join(sort_columns)}")
+    order = args.get('order', default_order)
+    if order not in ('asc', 'desc'):
+        raise PaginationError("order must be one of: asc, desc")
+
+    limit = parse_limit(args, default_limit, max_limit)
+
+    column = sort_columns[sort]
+    descending = order == 'desc'
+    is_datetime = isinstance(column.type, DateTime)
+
+    value, last_id = None, None
+    after = args.get('after')
+    if after:
+        cursor = decode_cursor(after)
+        # A cursor only continues the ordering it was issued for
+        if cursor.get('sort') != sort or cursor.get('order') != order or not isinstance(cursor.get('id'), int):
+            raise PaginationError("Cursor does not match the requested sort and order")
+        value, last_id = cursor.get('value'), cursor['id']
+        if value is not None and is_datetime:
+            try:
+                value = datetime.fromisoformat(value)
+            except (TypeError, ValueError):
+                raise PaginationError("Invalid cursor")
+
+    # One extra row tells whether another page follows
+    items = fetch_keyset_page(query, lambda page: page.all(), column, id_column,
+                              value, last_id, limit + 1, descending)
+    if len(items) <= limit:
+        return items, None
+
+    items = items[:limit]
+    last = items[-1]
+    value = getattr(last, column.key)
+    if value is not None and is_datetime:
+        value = value.isoformat()
+    next_cursor = encode_cursor({
+        'sort': sort,
+        'order': order,
+        'value': value,
+        'id': getattr(last, id_column.key)
+    })
+    return items, next_cursor
@@ -0,0 +1,97 @@
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from utils.location import filter_inaccurate_points, location_setting
+from utils.periods import to_utc_naive
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def epoch_seconds(timestamp):
+    """Seconds since the epoch of a naive UTC datetime, or NaN if there is none"""
+    return (timestamp - EPOCH).total_seconds() if timestamp is not None else np.nan
+
+
+class PointFilterStats:
+    """Per-worker counts of fixes rejected by the GPS quality filter, by path and reason"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def record(self, source, checked, rejected):
+        with self._lock:
+            counts = self._counts.setdefault(
+                source, {'checked': 0, 'accuracy': 0, 'duplicate_timestamp': 0, 'speed': 0}
+            )
+            counts['checked'] += checked
+            for reason, count in rejected.items():
+                counts[reason] += count
+
+    def stats(self):
+        with self._lock:
+            return {source: dict(counts) for source, counts in self._counts.items()}
+
+
+point_filter_stats = PointFilterStats()
+
+
+def filter_ingest_points(points, previous=None, pending=None):
+    """
+    Drop implausible fixes from a list of validated ingest points
+
+    Only client-supplied timestamps take part in the duplicate and speed
+    checks; points the server will stamp are never rejected by them.
+
+    A last fix has nothing after it to vouch for it, so it is rejected
+    whenever it is too fast to reach from the previous fix. If that previous
+    fix was the bad one, every honest fix sent on its own after it would be
+    rejected the same way. Such a fix is therefore returned as pending and
+    retried ahead of the next points; once they agree with it, the filter
+    keeps it as a relocation and the session continues from there.
+
+    Args:
+        points (list): Loaded LocationPointSchema dicts, in order
+        previous (tuple): (latitude, longitude, timestamp) of the session's last kept fix
+        pending (dict): Fix returned as pending by the previous call, if any
+
+    Returns:
+        tuple: (kept points, number of the given points rejected, pending fix or None)
+    """
+    if not points:
+        return points, 0, pending
+
+    candidates = [pending] + points if pending is not None else points
+    timestamps = [epoch_seconds(to_utc_naive(point.get('timestamp'))) for point in candidates]
+    keep, rejected = filter_inaccurate_points(
+        [point['latitude'] for point in candidates],
+        [point['longitude'] for point in candidates],
+        timestamps,
+        [np.nan if point.get('horizontal_accuracy_m') is None else point['horizontal_accuracy_m']
+         for point in candidates],
+        previous=previous
+    )
+    if pending is not None and not keep[0]:
+        # Counted when it was first rejected
+        rejected['speed'] -= 1
+    point_filter_stats.record('ingest', len(points), rejected)
+
+    kept = [point for point, kept in zip(candidates, keep) if kept]
+    filtered_count = len(points) - int(keep[len(candidates) - len(points):].sum())
+    return kept, filtered_count, _speed_rejected_fix(candidates, timestamps, keep, previous)
+
+
+def _speed_rejected_fix(candidates, timestamps, keep, previous):
+    """The last candidate, if only the speed check can have rejected it"""
+    last = candidates[-1]
+    if keep[-1] or np.isnan(timestamps[-1]):
+        return None
+    accuracy, threshold = last.get('horizontal_accuracy_m'), location_setting('GPS_MAX_ACCURACY_M')
+    if threshold and accuracy is not None and accuracy > threshold:
+        return None
+    earlier = timestamps[:-1] + ([previous[2]] if previous is not None else [])
+    if timestamps[-1] in earlier:
+        return None
+    return last
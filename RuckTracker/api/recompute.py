@@ -0,0 +1,209 @@
+import logging
+import math
+import time
+
+import numpy as np
+from flask_restful import Resource
+from sqlalchemy import select
+
+from app import db
+from models import User, RuckSession, LocationPoint
+from api.point_filter import point_filter_stats
+from api.rollups import session_contribution, apply_rollup_changes
+from api.session_state import forget_session
+from api.write_behind import flush_location_points
+from utils.calculations import calculate_calories
+from utils.location import (
+    track_distances, elevation_changes, elevation_filter_enabled, filter_inaccurate_points
+)
+
+logger = logging.getLogger(__name__)
+
+def load_track(session_id, chunk_size=5000):
+    """
+    Stream a session's location points in timestamp order into arrays
+
+    Rows are fetched chunk_size at a time as plain tuples, so only the
+    resulting arrays grow with the length of the track.
+
+    Returns:
+        tuple: (latitudes, longitudes, altitudes, timestamps, horizontal_accuracy, fix_times)
+        arrays; timestamps are epoch seconds and missing values are NaN.
+        fix_times are the timestamps the client reported, and NaN for points
+        the server stamped on arrival
+    """
+    result = db.session.execute(
+        select(LocationPoint.latitude, LocationPoint.longitude, LocationPoint.altitude,
+               LocationPoint.horizontal_accuracy_m, LocationPoint.timestamp_from_client,
+               LocationPoint.timestamp)
+        .where(LocationPoint.session_id == session_id)
+        .order_by(LocationPoint.timestamp, LocationPoint.id)
+        .execution_options(yield_per=chunk_size)
+    )
+
+    values, times = [], []
+    for rows in result.partitions():
+        values.append(np.array([row[:5] for row in rows], dtype=float))
+        times.append(np.array([row[5] for row in rows], dtype='datetime64[us]'))
+    if not values:
+        return tuple(np.zeros(0) for _ in range(6))
+
+    track = np.concatenate(values)
+    timestamps = (np.concatenate(times) - np.datetime64(0, 'us')) / np.timedelta64(1, 's')
+    # NULL (points stored before the flag existed) counts as server-stamped
+    fix_times = np.where(track[:, 4] == 1, timestamps, np.nan)
+    return track[:, 0], track[:, 1], track[:, 2], timestamps, track[:, 3], fix_times
+
+
+def compute_totals(latitudes, longitudes, altitudes, user_weight_kg, ruck_weight_kg):
+    """
+    Compute session totals from a whole track in one vectorized pass
+
+    Elevation only counts steps between consecutive points that both have
+    an altitude, matching the live ingest path; with elevation filtering
+    configured it is smoothed and thresholded as ingest does instead.
+
+    Returns:
+        dict: distance_km, elevation_gain_m, elevation_loss_m and, when the
+        user's weight is known, calories_burned
+    """
+    distance_km = float(track_distances(latitudes, longitudes).sum())
+
+    if elevation_filter_enabled():
+        elevation_gain_m, elevation_loss_m = elevation_changes(altitudes)
+    else:
+        steps = np.diff(altitudes)
+        steps = steps[~np.isnan(steps)]
+        elevation_gain_m = float(steps[steps > 0].sum())
+        elevation_loss_m = float(-steps[steps < 0].sum())
+
+    totals = {
+        'distance_km': distance_km,
+        'elevation_gain_m': elevation_gain_m,
+        'elevation_loss_m': elevation_loss_m
+    }
+
+    if user_weight_kg:
+        totals['calories_burned'] = calculate_calories(
+            user_weight_kg,
+            ruck_weight_kg,
+            distance_km,
+            elevation_gain_m
+        )
+
+    return totals
+
+
+def recompute_session(session, user_weight_kg, chunk_size=5000):
+    """
+    Rebuild a session's totals from its raw location points
+
+    Only values that actually changed are assigned, so unchanged sessions
+    produce no UPDATE. The caller commits.
+
+    Returns:
+        dict: Changed fields mapped to {"old": ..., "new": ...}
+    """
+    latitudes, longitudes, altitudes, _, horizontal_accuracy, fix_times = load_track(
+        session.id, chunk_size
+    )
+
+    # Stored points predating the GPS quality filter are held to the same standard.
+    # As at ingest, only client fix times take part in the duplicate and speed checks;
+    # server-stamped points only get the accuracy check.
+    keep, rejected = filter_inaccurate_points(latitudes, longitudes, fix_times, horizontal_accuracy)
+    point_filter_stats.record('recompute', len(keep), rejected)
+
+    totals = compute_totals(
+        latitudes[keep], longitudes[keep], altitudes[keep],
+        user_weight_kg,
+        session.ruck_weight_kg
+    )
+
+    changes = {}
+    for field, new_value in totals.items():
+        old_value = getattr(session, field)
+        if old_value is None or not math.isclose(old_value, new_value, rel_tol=1e-9, abs_tol=1e-9):
+            setattr(session, field, new_value)
+            changes[field] = {"old": old_value, "new": new_value}
+
+    return changes
+
+
+def recompute_sessions(user_id=None, status='completed', chunk_size=100, point_chunk_size=5000,
+                       dry_run=False):
+    """
+    Recompute totals for many sessions in id order, one chunk per transaction
+
+    Each chunk is committed and expunged before the next is loaded, so memory
+    is bounded by one chunk of sessions plus the longest track among them.
+
+    Returns:
+        dict: Counts of processed and changed sessions, elapsed time and sessions/second
+    """
+    started = time.perf_counter()
+    processed, changed, last_id = 0, 0, 0
+
+    while True:
+        query = RuckSession.query.filter(RuckSession.id > last_id)
+        if user_id is not None:
+            query = query.filter(RuckSession.user_id == user_id)
+        if status:
+            query = query.filter(RuckSession.status == status)
+        sessions = query.order_by(RuckSession.id).limit(chunk_size).all()
+        if not sessions:
+            break
+
+        user_ids = {session.user_id for session in sessions}
+        weights = dict(
+            db.session.query(User.id, User.weight_kg).filter(User.id.in_(user_ids)).all()
+        )
+
+        rollup_changes = []
+        for session in sessions:
+            rollup_before = session_contribution(session)
+            if recompute_session(session, weights.get(session.user_id), point_chunk_size):
+                changed += 1
+                rollup_changes.append((rollup_before, session_contribution(session)))
+        apply_rollup_changes(rollup_changes)
+        processed += len(sessions)
+        last_id = sessions[-1].id
+
+        if dry_run:
+            db.session.rollback()
+        else:
+            db.session.commit()
+        db.session.expunge_all()
+
+        elapsed = time.perf_counter() - started
+        logger.info(f"Recomputed {processed} sessions ({changed} changed), "
+                    f"{processed / elapsed:.1f} sessions/s")
+
+    elapsed = time.perf_counter() - started
+    return {
+        "processed": processed,
+        "changed": changed,
+        "elapsed_seconds": elapsed,
+        "sessions_per_second": processed / elapsed if elapsed else 0.0
+    }
+
+
+class SessionRecomputeResource(Resource):
+    """Resource for reconciling session totals with raw location data"""
+
+    def post(self, session_id):
+        """Recompute a session's distance, elevation and calories from its location points"""
+        # Buffered points belong to the track being recomputed
+        flush_location_points(session_id)
+        session = RuckSession.query.get_or_404(session_id)
+        user = User.query.get(session.user_id)
+
+        rollup_before = session_contribution(session)
+        changes = recompute_session(session, user.weight_kg if user else None)
+        apply_rollup_changes([(rollup_before, session_contribution(session))])
+        db.session.commit()
+
+        # Cached running totals are stale once rewritten
+        forget_session(session_id)
+
+        return {"session": session.to_dict(), "changes": changes}, 200
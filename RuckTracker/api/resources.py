@@ -1,14 +1,17 @@
 import logging
 from datetime import datetime
 
-from flask import request
+from flask import request, current_app
 from flask_restful import Resource
-from sqlalchemy import func, extract
+from marshmallow import ValidationError
+from sqlalchemy import func, case
 
 from app import db
-from models import User, RuckSession, LocationPoint, SessionReview
+from models import (
+    User, RuckSession, SessionReview, UserDailyStatistics, AppleHealthIntegration, UserChangeCounter, with_review
+)
 from api.schemas import (
-    UserSchema, SessionSchema, LocationPointSchema, 
+    UserSchema, SessionSchema, LocationPointSchema, BatchLocationPointSchema, LocationPointBatchSchema,
     SessionReviewSchema, StatisticsSchema, 
     AppleHealthSyncSchema, AppleHealthStatusSchema
 )
@@ -17,12 +20,33 @@ from api.schemas import (
 user_schema = UserSchema()
 session_schema = SessionSchema()
 location_point_schema = LocationPointSchema()
+batch_location_point_schema = BatchLocationPointSchema()
+location_point_batch_schema = LocationPointBatchSchema()
 session_review_schema = SessionReviewSchema()
 statistics_schema = StatisticsSchema()
 apple_health_sync_schema = AppleHealthSyncSchema()
 apple_health_status_schema = AppleHealthStatusSchema()
-from utils.location import calculate_distance, calculate_elevation_change
+from api.session_state import (
+    SessionState, session_states, forget_session, forget_user_sessions
+)
+from api.pagination import paginate, PaginationError
+from api.streaming import (
+    stream_session_response, iter_route_points, route_points, point_row_dict
+)
+from api.route_lod import parse_simplify_args, simplified_route, forget_route, route_lods
+from api.rollups import session_contribution, apply_rollup_changes
+from api.statistics_cache import statistics_cache
+from api.point_filter import filter_ingest_points, point_filter_stats
+from api.write_behind import (
+    location_buffer, save_location_points, flush_location_points, discard_location_points,
+    SessionNotActiveError
+)
+from utils.location import calculate_distance, calculate_elevation_change, within_deadband
 from utils.calculations import calculate_calories
+from utils.route_encoding import ROUTE_FORMATS, encode_route
+from utils.periods import (
+    BUCKET_KEYS, bucket_ranges, year_range, month_range, iso_week_range, to_utc_naive
+)
 
 logger = logging.getLogger(__name__)
 
@@ -54,13 +78,21 @@ class UserResource(Resource):
             user.weight_kg = data['weight_kg']
         
         db.session.commit()
+        
+        # Cached running state carries the old weight for calorie estimates
+        if 'weight_kg' in data:
+            forget_user_sessions(user_id)
         return {"user": user.to_dict()}, 200
     
     def delete(self, user_id):
         """Delete a user"""
         user = User.query.get_or_404(user_id)
+        # Tables created before the cascade was declared still need the row removed first
+        AppleHealthIntegration.query.filter_by(user_id=user_id).delete()
+        UserChangeCounter.query.filter_by(user_id=user_id).delete()
         db.session.delete(user)
         db.session.commit()
+        forget_user_sessions(user_id)
         return {"message": "User deleted successfully"}, 200
 
 
@@ -68,9 +100,21 @@ class UserListResource(Resource):
     """Resource for creating users and listing all users"""
     
     def get(self):
-        """Get all users"""
-        users = User.query.all()
-        return {"users": [user.to_dict() for user in users]}, 200
+        """Get a page of users, ordered by id unless another sort is requested"""
+        try:
+            users, next_cursor = paginate(
+                User.query,
+                request.args,
+                sort_columns={'id': User.id, 'created_at': User.created_at},
+                id_column=User.id,
+                default_sort='id',
+                default_limit=current_app.config["PAGE_SIZE_DEFAULT"],
+                max_limit=current_app.config["PAGE_SIZE_MAX"]
+            )
+        except PaginationError as e:
+            return {"message": str(e)}, 400
+        
+        return {"users": [user.to_dict() for user in users], "next_cursor": next_cursor}, 200
     
     def post(self):
         """Create a new user"""
@@ -110,13 +154,55 @@ class SessionResource(Resource):
     """Resource for managing individual rucking sessions"""
     
     def get(self, session_id):
-        """Get a session by ID"""
+        """
+        Get a session by ID
+        
+        With include_points=true&stream=true the points are read and written
+        out in chunks instead of being built into one list in memory.
+        With format=polyline or format=binary the route is returned as one
+        compact encoded string instead (see utils.route_encoding).
+        tolerance= and/or max_points= return a simplified route (see
+        api.route_lod), as points or in the requested format.
+        """
         include_points = request.args.get('include_points', 'false').lower() == 'true'
+        stream = request.args.get('stream', 'false').lower() == 'true'
+        route_format = request.args.get('format', 'json')
+        if route_format != 'json' and route_format not in ROUTE_FORMATS:
+            return {"message": f"format must be one of: json, {', '.join(ROUTE_FORMATS)}"}, 400
+        try:
+            simplify, tolerance, max_points = parse_simplify_args(request.args)
+        except ValueError as e:
+            return {"message": str(e)}, 400
+        
         session = RuckSession.query.get_or_404(session_id)
+        chunk_size = current_app.config["POINT_STREAM_CHUNK_SIZE"]
+        
+        # Simplified routes are small, so they are built in memory whatever the format
+        rows = None
+        if simplify:
+            rows = simplified_route(session, simplify, tolerance, max_points)
+        
+        # Compact formats replace the point list with a single encoded route
+        if route_format in ROUTE_FORMATS:
+            result = session.to_dict()
+            points = route_points(rows) if rows is not None else iter_route_points(session.id, chunk_size)
+            result['route'] = encode_route(points, route_format)
+            return {"session": result}, 200
+        
+        if rows is not None:
+            result = session.to_dict()
+            result['location_points'] = [point_row_dict(row) for row in rows]
+            return {"session": result}, 200
+        
+        if include_points and stream:
+            return stream_session_response(session, chunk_size)
+        
         return {"session": session.to_dict(include_points=include_points)}, 200
     
     def put(self, session_id):
         """Update a session's information"""
+        # Status changes must see every buffered point and total
+        flush_location_points(session_id)
         session = RuckSession.query.get_or_404(session_id)
         data = request.get_json()
         
@@ -125,6 +211,8 @@ class SessionResource(Resource):
         if errors:
             return {"errors": errors}, 400
         
+        rollup_before = session_contribution(session)
+        
         # Update session fields
         if 'ruck_weight_kg' in data:
             session.ruck_weight_kg = data['ruck_weight_kg']
@@ -156,14 +244,33 @@ class SessionResource(Resource):
                     total_seconds = (current_time - session.start_time).total_seconds()
                     session.duration_seconds = int(total_seconds) - session.paused_duration_seconds
         
+        if 'status' in data:
+            # Write the status first and re-read the totals behind it, so points
+            # committed meanwhile are counted and later ones see the new status
+            db.session.flush()
+            db.session.refresh(session, ['distance_km', 'elevation_gain_m', 'elevation_loss_m', 'calories_burned'])
+        
+        # Keep the daily rollups in the same transaction as the session change
+        apply_rollup_changes([(rollup_before, session_contribution(session))])
         db.session.commit()
+        
+        # Ingest must re-check status and weights on its next point, and a
+        # reactivated session can receive points again
+        forget_session(session_id)
+        forget_route(session_id)
+        
         return {"session": session.to_dict()}, 200
     
     def delete(self, session_id):
         """Delete a session"""
+        # Points still buffered for the session would only fail to insert later
+        discard_location_points(session_id)
         session = RuckSession.query.get_or_404(session_id)
+        apply_rollup_changes([(session_contribution(session), None)])
         db.session.delete(session)
         db.session.commit()
+        forget_session(session_id)
+        forget_route(session_id)
         return {"message": "Session deleted successfully"}, 200
 
 
@@ -171,14 +278,27 @@ class SessionListResource(Resource):
     """Resource for creating sessions and listing all sessions"""
     
     def get(self):
-        """Get all sessions for a user"""
+        """Get a page of a user's sessions, most recently started first by default"""
         user_id = request.args.get('user_id')
         
         if not user_id:
             return {"message": "user_id parameter is required"}, 400
         
-        sessions = RuckSession.query.filter_by(user_id=user_id).all()
-        return {"sessions": [session.to_dict() for session in sessions]}, 200
+        try:
+            sessions, next_cursor = paginate(
+                RuckSession.query.filter_by(user_id=user_id).options(with_review()),
+                request.args,
+                sort_columns={'start_time': RuckSession.start_time, 'id': RuckSession.id},
+                id_column=RuckSession.id,
+                default_sort='start_time',
+                default_order='desc',
+                default_limit=current_app.config["PAGE_SIZE_DEFAULT"],
+                max_limit=current_app.config["PAGE_SIZE_MAX"]
+            )
+        except PaginationError as e:
+            return {"message": str(e)}, 400
+        
+        return {"sessions": [session.to_dict() for session in sessions], "next_cursor": next_cursor}, 200
     
     def post(self):
         """Create a new session"""
@@ -211,78 +331,224 @@ class SessionStatisticsResource(Resource):
     """Resource for updating session statistics with location data"""
     
     def post(self, session_id):
-        """Add location point and update session statistics"""
-        session = RuckSession.query.get_or_404(session_id)
-        
-        # Only accept updates for active sessions
-        if session.status != 'active':
-            return {"message": f"Session is not active (current status: {session.status})"}, 400
+        """
+        Add location data and update session statistics
+        
+        Accepts either a single point or a batch of the form {"points": [...]},
+        which clients use to replay fixes buffered while out of coverage.
+        Batch points are applied in array order within one transaction, and
+        each must carry its fix timestamp. Fixes failing the GPS quality
+        filter (inaccurate, repeated timestamp or implausibly fast) count as
+        received but are otherwise ignored. A last fix rejected as too fast is
+        retried with the next request's points and kept if they agree with it,
+        so a bad fix cannot shut out every honest one after it.
+        
+        A batch response reports accepted_count (points added to the session),
+        rejected_count and rejected (invalid points, by index) and
+        filtered_count (valid points dropped by the GPS quality filter).
+        """
+        # Active sessions are served from cached running state; only the first
+        # point after a cache miss reads the session, its last point and the user.
+        # With row locking, every request instead locks the session and rebuilds
+        # its state, so workers without sticky routing see each other's points.
+        locking = current_app.config["INGEST_ROW_LOCKING"]
+        state = None if locking else session_states.get(session_id)
+        if state is None:
+            # Buffered points must be visible before state is rebuilt from the database
+            flush_location_points(session_id)
+            query = RuckSession.query.filter_by(id=session_id)
+            if locking:
+                query = query.with_for_update()
+            session = query.first_or_404()
+            
+            # Only accept updates for active sessions
+            if session.status != 'active':
+                return {"message": f"Session is not active (current status: {session.status})"}, 400
+            
+            state = SessionState.load(session)
+            if not locking:
+                # Threads that missed together must share one state
+                state = session_states.setdefault(session_id, state)
         
         data = request.get_json()
         
-        # Validate location data
-        errors = location_point_schema.validate(data)
-        if errors:
-            return {"errors": errors}, 400
-        
-        # Create new location point
-        point = LocationPoint(
-            session_id=session_id,
-            latitude=data['latitude'],
-            longitude=data['longitude'],
-            altitude=data.get('altitude'),
-            timestamp=datetime.utcnow()
-        )
+        # Batch mode: validate points individually so one bad fix doesn't reject the rest
+        if isinstance(data, dict) and 'points' in data:
+            errors = location_point_batch_schema.validate(data)
+            if errors:
+                return {"errors": errors}, 400
+            
+            points, rejected = [], []
+            for index, point_data in enumerate(data['points']):
+                try:
+                    points.append(batch_location_point_schema.load(point_data))
+                except ValidationError as err:
+                    rejected.append({"index": index, "errors": err.messages})
+            
+            try:
+                with state.lock:
+                    kept, filtered_count, pending = filter_ingest_points(
+                        points, state.previous_fix(), state.pending_fix
+                    )
+                    self._add_points(state, kept, received=len(points), buffered=not locking)
+                    state.pending_fix = pending
+            except SessionNotActiveError:
+                return self._session_ended(session_id)
+            
+            return {
+                "message": f"{len(kept)} location points added and statistics updated",
+                "statistics": state.statistics(),
+                "accepted_count": len(kept),
+                "rejected_count": len(rejected),
+                "rejected": rejected,
+                "filtered_count": filtered_count
+            }, 200
         
-        db.session.add(point)
+        # Validate location data
+        try:
+            point_data = location_point_schema.load(data)
+        except ValidationError as err:
+            return {"errors": err.messages}, 400
+        
+        try:
+            with state.lock:
+                kept, filtered_count, pending = filter_ingest_points(
+                    [point_data], state.previous_fix(), state.pending_fix
+                )
+                self._add_points(state, kept, received=1, buffered=not locking)
+                state.pending_fix = pending
+        except SessionNotActiveError:
+            return self._session_ended(session_id)
         
-        # Get previous location point to calculate incremental changes
-        prev_point = (LocationPoint.query
-                      .filter_by(session_id=session_id)
-                      .order_by(LocationPoint.timestamp.desc())
-                      .first())
+        if filtered_count:
+            return {
+                "message": "Location point rejected by the GPS quality filter",
+                "statistics": state.statistics()
+            }, 200
         
-        # If there's a previous point, calculate distance and elevation changes
-        if prev_point:
-            # Calculate distance increment
-            distance_increment = calculate_distance(
-                (prev_point.latitude, prev_point.longitude),
-                (point.latitude, point.longitude)
-            )
+        return {
+            "message": "Location point added and statistics updated",
+            "statistics": state.statistics()
+        }, 200
+    
+    def _session_ended(self, session_id):
+        """
+        Reject points for a session that stopped being active after its state was cached
+        
+        Points this worker still buffers for it would only be dropped at the next flush.
+        """
+        forget_session(session_id)
+        discard_location_points(session_id)
+        return {"message": "Session is not active"}, 400
+    
+    def _add_points(self, state, points, received=None, buffered=True):
+        """
+        Insert location points and add their increments to the session totals
+        
+        Totals follow every point given, which have already passed the GPS
+        quality filter; received counts those the filter rejected as well.
+        With INGEST_DEADBAND_METERS set, points that stay within the deadband
+        of the last stored point are counted but not stored.
+        """
+        current_time = datetime.utcnow()
+        deadband_meters = current_app.config["INGEST_DEADBAND_METERS"]
+        deadband_seconds = current_app.config["INGEST_DEADBAND_SECONDS"]
+        distance_increment, elevation_gain, elevation_loss = 0.0, 0.0, 0.0
+        last_latitude, last_longitude, last_altitude, last_timestamp = (
+            state.last_latitude, state.last_longitude, state.last_altitude, state.last_timestamp
+        )
+        last_timestamp_from_client = state.last_timestamp_from_client
+        has_previous = state.has_last_point
+        # Advance a copy, so a failed write leaves the cached tracker untouched
+        elevation = state.elevation.copy() if state.elevation is not None else None
+        kept = (state.kept_latitude, state.kept_longitude, state.kept_altitude, state.kept_timestamp)
+        rows = []
+        
+        for point_data in points:
+            point = {
+                'session_id': state.session_id,
+                'latitude': point_data['latitude'],
+                'longitude': point_data['longitude'],
+                'altitude': point_data.get('altitude'),
+                'horizontal_accuracy_m': point_data.get('horizontal_accuracy_m'),
+                'vertical_accuracy_m': point_data.get('vertical_accuracy_m'),
+                'timestamp': to_utc_naive(point_data.get('timestamp')) or current_time,
+                'timestamp_from_client': point_data.get('timestamp') is not None
+            }
             
-            # Calculate elevation change if altitude data available
-            elevation_gain, elevation_loss = 0, 0
-            if prev_point.altitude is not None and point.altitude is not None:
-                elevation_gain, elevation_loss = calculate_elevation_change(
-                    prev_point.altitude, point.altitude
+            # If there's a previous point, calculate distance and elevation changes
+            if has_previous:
+                distance_increment += calculate_distance(
+                    (last_latitude, last_longitude),
+                    (point['latitude'], point['longitude'])
                 )
+                if elevation is None:
+                    gain, loss = calculate_elevation_change(last_altitude, point['altitude'])
+                    elevation_gain += gain
+                    elevation_loss += loss
             
-            # Update session statistics
-            session.distance_km += distance_increment
-            session.elevation_gain_m += elevation_gain
-            session.elevation_loss_m += elevation_loss
+            # Filtered elevation follows every altitude, including the first one
+            if elevation is not None:
+                gain, loss = elevation.add(point['altitude'])
+                elevation_gain += gain
+                elevation_loss += loss
             
-            # Calculate and update calories burned
-            user = User.query.get(session.user_id)
-            if user and user.weight_kg:
-                session.calories_burned = calculate_calories(
-                    user.weight_kg,
-                    session.ruck_weight_kg,
-                    session.distance_km,
-                    session.elevation_gain_m
-                )
+            last_latitude, last_longitude, last_altitude = point['latitude'], point['longitude'], point['altitude']
+            last_timestamp = point['timestamp']
+            last_timestamp_from_client = point['timestamp_from_client']
+            has_previous = True
+            
+            candidate = (point['latitude'], point['longitude'], point['altitude'], point['timestamp'])
+            if deadband_meters and kept[0] is not None and within_deadband(
+                    kept, candidate, deadband_meters, deadband_seconds):
+                continue
+            rows.append(point)
+            kept = candidate
+        
+        received = len(points) if received is None else received
+        increments = None
+        if received:
+            increments = {
+                'distance_km': distance_increment,
+                'elevation_gain_m': elevation_gain,
+                'elevation_loss_m': elevation_loss,
+                'points_received': received,
+                'points_stored': len(rows)
+            }
         
-        db.session.commit()
+        totals = save_location_points(
+            rows, state.session_id, increments,
+            state.user_weight_kg, state.ruck_weight_kg,
+            buffered=buffered
+        )
         
-        return {
-            "message": "Location point added and statistics updated",
-            "statistics": {
-                "distance_km": session.distance_km,
-                "elevation_gain_m": session.elevation_gain_m,
-                "elevation_loss_m": session.elevation_loss_m,
-                "calories_burned": session.calories_burned
+        if totals is None:
+            # Nothing written to the session yet, so advance the cached totals locally
+            totals = {
+                'distance_km': state.distance_km + distance_increment,
+                'elevation_gain_m': state.elevation_gain_m + elevation_gain,
+                'elevation_loss_m': state.elevation_loss_m + elevation_loss,
+                'calories_burned': state.calories_burned
             }
-        }, 200
+            if (distance_increment or elevation_gain) and state.user_weight_kg:
+                totals['calories_burned'] = calculate_calories(
+                    state.user_weight_kg,
+                    state.ruck_weight_kg,
+                    totals['distance_km'],
+                    totals['elevation_gain_m']
+                )
+        
+        # Only advance the cached state once the write has succeeded or been buffered
+        state.last_latitude, state.last_longitude, state.last_altitude, state.last_timestamp = (
+            last_latitude, last_longitude, last_altitude, last_timestamp
+        )
+        state.last_timestamp_from_client = last_timestamp_from_client
+        state.kept_latitude, state.kept_longitude, state.kept_altitude, state.kept_timestamp = kept
+        state.elevation = elevation
+        state.distance_km = totals['distance_km']
+        state.elevation_gain_m = totals['elevation_gain_m']
+        state.elevation_loss_m = totals['elevation_loss_m']
+        state.calories_burned = totals['calories_burned']
 
 
 class SessionReviewResource(Resource):
@@ -327,127 +593,194 @@ class SessionReviewResource(Resource):
         return {"review": review.to_dict()}, 201
 
 
-class WeeklyStatisticsResource(Resource):
+class StatisticsResource(Resource):
+    """Base resource for statistics aggregated from a user's daily rollups"""
+    
+    def _respond(self, user_id, period=None, bucket=None):
+        """Return cached statistics for the user and period, aggregating them on a miss"""
+        if bucket is not None:
+            if bucket not in BUCKET_KEYS:
+                return {"message": f"bucket must be one of: {', '.join(BUCKET_KEYS)}"}, 400
+            if period is None:
+                return {"message": "bucket requires a period to break down"}, 400
+        
+        params = {
+            'period': [bound.isoformat() for bound in period] if period else None,
+            'bucket': bucket
+        }
+        statistics = statistics_cache.get_or_compute(
+            user_id, params, lambda: self._compute(user_id, period, bucket)
+        )
+        return {"statistics": statistics}, 200
+    
+    def _compute(self, user_id, period, bucket):
+        """Aggregate the user's rollups, with a per-bucket breakdown of the period when requested"""
+        query = UserDailyStatistics.query.filter_by(user_id=user_id)
+        
+        if period is not None:
+            # Periods are whole days, so the half-open range maps directly onto rollup days
+            start, end = period
+            query = query.filter(UserDailyStatistics.day >= start.date(),
+                                 UserDailyStatistics.day < end.date())
+        
+        if bucket is None:
+            return self._aggregate_statistics(query)
+        
+        rows, breakdown = self._aggregate_buckets(query, *period, bucket)
+        
+        # Period totals are the sum of the buckets, so no second query is needed
+        stats = self._statistics({
+            field: sum(getattr(row, field) or 0 for row in rows)
+            for field in ('total_distance', 'total_elevation_gain', 'total_calories',
+                          'session_count', 'total_duration')
+        })
+        stats[BUCKET_KEYS[bucket]] = breakdown
+        
+        return stats
+    
+    def _aggregate_columns(self):
+        """Aggregate expressions shared by the totals and breakdown queries"""
+        return (
+            func.sum(UserDailyStatistics.distance_km).label('total_distance'),
+            func.sum(UserDailyStatistics.elevation_gain_m).label('total_elevation_gain'),
+            func.sum(UserDailyStatistics.calories_burned).label('total_calories'),
+            func.sum(UserDailyStatistics.session_count).label('session_count'),
+            func.sum(UserDailyStatistics.duration_seconds).label('total_duration')
+        )
+    
+    def _aggregate_statistics(self, query):
+        """Aggregate statistics from query results"""
+        results = query.with_entities(*self._aggregate_columns()).first()
+        return self._statistics(results._mapping if results else {})
+    
+    def _aggregate_buckets(self, query, start, end, bucket):
+        """
+        Aggregate statistics for every bucket of [start, end) in one GROUP BY query
+        
+        The query must already be restricted to [start, end). Buckets are
+        numbered with a CASE over their end bounds, which works on every
+        database, and buckets without sessions are filled with zeros.
+        """
+        buckets = bucket_ranges(start, end, bucket)
+        bucket_index = case(
+            *[(UserDailyStatistics.day < bucket_end.date(), index)
+              for index, (_, _, bucket_end) in enumerate(buckets)]
+        ).label('bucket_index')
+        
+        rows = (query
+                .with_entities(bucket_index, *self._aggregate_columns())
+                .group_by(bucket_index)
+                .all())
+        
+        rows_by_index = {row.bucket_index: row for row in rows}
+        breakdown = []
+        for index, (label, _, _) in enumerate(buckets):
+            row = rows_by_index.get(index)
+            bucket_stats = self._statistics(row._mapping if row else {})
+            bucket_stats.update(label)
+            breakdown.append(bucket_stats)
+        
+        return rows, breakdown
+    
+    def _statistics(self, values):
+        """Convert aggregate values to the statistics response dictionary"""
+        total_distance = float(values['total_distance']) if values.get('total_distance') else 0
+        session_count = int(values['session_count']) if values.get('session_count') else 0
+        
+        return {
+            'total_distance_km': total_distance,
+            'total_elevation_gain_m': float(values['total_elevation_gain']) if values.get('total_elevation_gain') else 0,
+            'total_calories_burned': float(values['total_calories']) if values.get('total_calories') else 0,
+            'average_distance_km': total_distance / session_count if session_count else 0,
+            'session_count': session_count,
+            'total_duration_seconds': int(values['total_duration']) if values.get('total_duration') else 0
+        }
+
+
+class WeeklyStatisticsResource(StatisticsResource):
     """Resource for weekly statistics aggregation"""
     
     def get(self):
         """Get weekly statistics for a user"""
-        user_id = request.args.get('user_id')
+        user_id = request.args.get('user_id', type=int)
         if not user_id:
             return {"message": "user_id parameter is required"}, 400
         
-        # Get week number and year from request or use current
-        week = request.args.get('week')
-        year = request.args.get('year')
+        # Get ISO week number and ISO week-numbering year from request
+        week = request.args.get('week', type=int)
+        year = request.args.get('year', type=int)
         
-        query = RuckSession.query.filter_by(user_id=user_id, status='completed')
+        period = None
         
         if week and year:
-            # Filter by specific week and year
-            query = query.filter(
-                extract('week', RuckSession.end_time) == week,
-                extract('year', RuckSession.end_time) == year
-            )
-        
-        # Aggregate statistics
-        stats = self._aggregate_statistics(query)
-        
-        return {"statistics": stats}, 200
-    
-    def _aggregate_statistics(self, query):
-        """Aggregate statistics from query results"""
-        results = query.with_entities(
-            func.sum(RuckSession.distance_km).label('total_distance'),
-            func.sum(RuckSession.elevation_gain_m).label('total_elevation_gain'),
-            func.sum(RuckSession.calories_burned).label('total_calories'),
-            func.avg(RuckSession.distance_km).label('avg_distance'),
-            func.count(RuckSession.id).label('session_count'),
-            func.sum(RuckSession.duration_seconds).label('total_duration')
-        ).first()
-        
-        # Convert to dictionary
-        if results:
-            stats = {
-                'total_distance_km': float(results.total_distance) if results.total_distance else 0,
-                'total_elevation_gain_m': float(results.total_elevation_gain) if results.total_elevation_gain else 0,
-                'total_calories_burned': float(results.total_calories) if results.total_calories else 0,
-                'average_distance_km': float(results.avg_distance) if results.avg_distance else 0,
-                'session_count': results.session_count,
-                'total_duration_seconds': results.total_duration if results.total_duration else 0
-            }
-        else:
-            stats = {
-                'total_distance_km': 0,
-                'total_elevation_gain_m': 0,
-                'total_calories_burned': 0,
-                'average_distance_km': 0,
-                'session_count': 0,
-                'total_duration_seconds': 0
-            }
+            try:
+                period = iso_week_range(year, week)
+            except ValueError:
+                return {"message": "Invalid week or year"}, 400
         
-        return stats
+        return self._respond(user_id, period, request.args.get('bucket'))
 
 
-class MonthlyStatisticsResource(Resource):
+class MonthlyStatisticsResource(StatisticsResource):
     """Resource for monthly statistics aggregation"""
     
     def get(self):
         """Get monthly statistics for a user"""
-        user_id = request.args.get('user_id')
+        user_id = request.args.get('user_id', type=int)
         if not user_id:
             return {"message": "user_id parameter is required"}, 400
         
         # Get month and year from request or use current
-        month = request.args.get('month')
-        year = request.args.get('year')
+        month = request.args.get('month', type=int)
+        year = request.args.get('year', type=int)
         
-        query = RuckSession.query.filter_by(user_id=user_id, status='completed')
+        period = None
         
         if month and year:
-            # Filter by specific month and year
-            query = query.filter(
-                extract('month', RuckSession.end_time) == month,
-                extract('year', RuckSession.end_time) == year
-            )
-        
-        # Use the same aggregation method as weekly
-        weekly_resource = WeeklyStatisticsResource()
-        stats = weekly_resource._aggregate_statistics(query)
+            try:
+                period = month_range(year, month)
+            except ValueError:
+                return {"message": "Invalid month or year"}, 400
         
-        return {"statistics": stats}, 200
+        return self._respond(user_id, period, request.args.get('bucket'))
 
 
-class YearlyStatisticsResource(Resource):
+class YearlyStatisticsResource(StatisticsResource):
     """Resource for yearly statistics aggregation"""
     
     def get(self):
         """Get yearly statistics for a user"""
-        user_id = request.args.get('user_id')
+        user_id = request.args.get('user_id', type=int)
         if not user_id:
             return {"message": "user_id parameter is required"}, 400
         
         # Get year from request or use current
-        year = request.args.get('year')
-        
-        query = RuckSession.query.filter_by(user_id=user_id, status='completed')
-        
-        if year:
-            # Filter by specific year
-            query = query.filter(extract('year', RuckSession.end_time) == year)
+        year = request.args.get('year', type=int)
+        bucket = request.args.get('bucket')
         
-        # Use the same aggregation method as weekly
-        weekly_resource = WeeklyStatisticsResource()
-        stats = weekly_resource._aggregate_statistics(query)
+        period = None
         
-        # Add monthly breakdown for the year
-        monthly_breakdown = []
         if year:
-            for month in range(1, 13):
-                month_query = query.filter(extract('month', RuckSession.end_time) == month)
-                month_stats = weekly_resource._aggregate_statistics(month_query)
-                month_stats['month'] = month
-                monthly_breakdown.append(month_stats)
+            try:
+                period = year_range(year)
+            except ValueError:
+                return {"message": "Invalid year"}, 400
             
-            stats['monthly_breakdown'] = monthly_breakdown
+            # A year is broken down by month unless another bucket is requested
+            bucket = bucket or 'month'
         
-        return {"statistics": stats}, 200
+        return self._respond(user_id, period, bucket)
+
+
+class MetricsResource(Resource):
+    """Resource exposing per-worker cache and buffer counters"""
+    
+    def get(self):
+        """Get operational counters for this worker"""
+        return {
+            "session_state_cache": session_states.stats(),
+            "location_buffer": location_buffer.stats(),
+            "route_lod_cache": route_lods.stats(),
+            "point_filter": point_filter_stats.stats(),
+            "statistics_cache": statistics_cache.stats()
+        }, 200
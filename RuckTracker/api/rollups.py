@@ -0,0 +1,234 @@
+import logging
+import math
+from collections import defaultdict
+
+from sqlalchemy import Date, func
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import db
+from models import User, RuckSession, UserDailyStatistics
+from api.statistics_cache import mark_user_statistics_changed
+
+logger = logging.getLogger(__name__)
+
+# Rollup columns and the session column each one sums
+ROLLUP_FIELDS = {
+    'distance_km': RuckSession.distance_km,
+    'elevation_gain_m': RuckSession.elevation_gain_m,
+    'calories_burned': RuckSession.calories_burned,
+    'duration_seconds': RuckSession.duration_seconds,
+}
+
+
+def session_contribution(session):
+    """
+    What a session adds to the daily rollups in its current state
+
+    Only completed sessions with an end time count, on the day they ended.
+
+    Returns:
+        tuple: (user_id, day, values), or None if the session does not count
+    """
+    if session.status != 'completed' or session.end_time is None:
+        return None
+
+    values = {field: getattr(session, field) or 0 for field in ROLLUP_FIELDS}
+    values['session_count'] = 1
+    return session.user_id, session.end_time.date(), values
+
+
+def apply_rollup_changes(changes):
+    """
+    Apply session changes to the daily rollups in the caller's transaction
+
+    Each change is a (before, after) pair of session_contribution() results,
+    taken before and after the session was modified; use None for a session
+    that is new or deleted. Contributions are applied as increments with an
+    upsert, so concurrent writers touching the same day do not overwrite
+    each other.
+    """
+    deltas = defaultdict(lambda: defaultdict(float))
+    for before, after in changes:
+        for contribution, sign in ((before, -1), (after, 1)):
+            if contribution is None:
+                continue
+            user_id, day, values = contribution
+            for field, value in values.items():
+                deltas[(user_id, day)][field] += sign * value
+
+    rows = [
+        dict(
+            user_id=user_id,
+            day=day,
+            distance_km=values['distance_km'],
+            elevation_gain_m=values['elevation_gain_m'],
+            calories_burned=values['calories_burned'],
+            duration_seconds=int(values['duration_seconds']),
+            session_count=int(values['session_count'])
+        )
+        for (user_id, day), values in deltas.items()
+        if any(values.values())
+    ]
+    if not rows:
+        return
+
+    _upsert_increments(rows)
+
+    # Cached statistics of these users go stale when this transaction commits
+    for user_id in {row['user_id'] for row in rows}:
+        mark_user_statistics_changed(user_id)
+
+    # Days left without sessions no longer need a row
+    for row in rows:
+        UserDailyStatistics.query.filter(
+            UserDailyStatistics.user_id == row['user_id'],
+            UserDailyStatistics.day == row['day'],
+            UserDailyStatistics.session_count <= 0
+        ).delete(synchronize_session=False)
+
+
+def _upsert_increments(rows):
+    """Add rows to existing rollups, inserting the days that have none yet"""
+    table = UserDailyStatistics.__table__
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect in ('postgresql', 'sqlite'):
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        statement = insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.day],
+            set_={
+                field: table.c[field] + statement.excluded[field]
+                for field in (*ROLLUP_FIELDS, 'session_count')
+            }
+        )
+        db.session.execute(statement, rows)
+        return
+
+    # Other databases: read-modify-write under a row lock
+    for row in rows:
+        rollup = (UserDailyStatistics.query
+                  .filter_by(user_id=row['user_id'], day=row['day'])
+                  .with_for_update()
+                  .first())
+        if rollup is None:
+            db.session.add(UserDailyStatistics(**row))
+            continue
+        for field in (*ROLLUP_FIELDS, 'session_count'):
+            setattr(rollup, field, getattr(rollup, field) + row[field])
+
+
+def aggregate_daily_totals(user_ids):
+    """
+    Aggregate raw completed sessions per user and day
+
+    Returns:
+        dict: {(user_id, day): values} with the same fields as the rollup rows
+    """
+    day = func.date(RuckSession.end_time, type_=Date).label('day')
+    rows = (db.session.query(
+                RuckSession.user_id,
+                day,
+                *(func.coalesce(func.sum(column), 0).label(field) for field, column in ROLLUP_FIELDS.items()),
+                func.count(RuckSession.id).label('session_count'))
+            .filter(RuckSession.user_id.in_(user_ids),
+                    RuckSession.status == 'completed',
+                    RuckSession.end_time.isnot(None))
+            .group_by(RuckSession.user_id, day)
+            .all())
+
+    return {
+        (row.user_id, row.day): {
+            'distance_km': float(row.distance_km),
+            'elevation_gain_m': float(row.elevation_gain_m),
+            'calories_burned': float(row.calories_burned),
+            'duration_seconds': int(row.duration_seconds),
+            'session_count': int(row.session_count)
+        }
+        for row in rows
+    }
+
+
+def _user_id_chunks(user_id=None, chunk_size=500):
+    """Yield lists of user ids in id order, or just the given user"""
+    if user_id is not None:
+        yield [user_id]
+        return
+
+    last_id = 0
+    while True:
+        user_ids = [row.id for row in (db.session.query(User.id)
+                                       .filter(User.id > last_id)
+                                       .order_by(User.id)
+                                       .limit(chunk_size))]
+        if not user_ids:
+            return
+        yield user_ids
+        last_id = user_ids[-1]
+
+
+def rebuild_daily_rollups(user_id=None, chunk_size=500):
+    """
+    Rebuild rollups from raw sessions, one transaction per chunk of users
+
+    Returns:
+        dict: Counts of users processed and rollup rows written
+    """
+    users, rows_written = 0, 0
+
+    for user_ids in _user_id_chunks(user_id, chunk_size):
+        totals = aggregate_daily_totals(user_ids)
+
+        UserDailyStatistics.query.filter(
+            UserDailyStatistics.user_id.in_(user_ids)
+        ).delete(synchronize_session=False)
+        db.session.add_all(
+            UserDailyStatistics(user_id=row_user_id, day=day, **values)
+            for (row_user_id, day), values in totals.items()
+        )
+        for rebuilt_user_id in user_ids:
+            mark_user_statistics_changed(rebuilt_user_id)
+        db.session.commit()
+
+        users += len(user_ids)
+        rows_written += len(totals)
+        logger.info(f"Rebuilt daily rollups for {users} users ({rows_written} rows)")
+
+    return {"users": users, "rows": rows_written}
+
+
+def check_daily_rollups(user_id=None, chunk_size=500):
+    """
+    Compare rollups against raw sessions without modifying anything
+
+    Returns:
+        list: One dict per mismatching (user_id, day) with expected and actual values
+    """
+    mismatches = []
+
+    for user_ids in _user_id_chunks(user_id, chunk_size):
+        expected = aggregate_daily_totals(user_ids)
+        actual = {
+            (row.user_id, row.day): {
+                field: getattr(row, field) for field in (*ROLLUP_FIELDS, 'session_count')
+            }
+            for row in UserDailyStatistics.query.filter(UserDailyStatistics.user_id.in_(user_ids))
+        }
+
+        for key in expected.keys() | actual.keys():
+            expected_values, actual_values = expected.get(key), actual.get(key)
+            if expected_values and actual_values and all(
+                math.isclose(expected_values[field], actual_values[field], rel_tol=1e-9, abs_tol=1e-6)
+                for field in expected_values
+            ):
+                continue
+            mismatches.append({
+                "user_id": key[0],
+                "day": key[1].isoformat(),
+                "expected": expected_values,
+                "actual": actual_values
+            })
+
+        db.session.expunge_all()
+
+    return mismatches
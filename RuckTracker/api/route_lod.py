@@ -0,0 +1,128 @@
+import logging
+from collections import namedtuple
+
+import numpy as np
+
+from app import app
+from api.streaming import iter_location_point_chunks
+from utils.cache import LRUCache
+from utils.simplify import IMPORTANCE_FUNCTIONS, SIMPLIFY_METHODS, local_xy, select_points
+
+logger = logging.getLogger(__name__)
+
+
+# Row-like point with the api.streaming.POINT_COLUMNS values
+RoutePoint = namedtuple('RoutePoint', (
+    'id', 'session_id', 'latitude', 'longitude', 'altitude',
+    'horizontal_accuracy_m', 'vertical_accuracy_m', 'timestamp'
+))
+
+# Point values held as float64 columns, missing values as NaN
+FLOAT_FIELDS = ('latitude', 'longitude', 'altitude', 'horizontal_accuracy_m', 'vertical_accuracy_m')
+
+
+def _optional(value):
+    """None for a NaN column value"""
+    return None if value != value else value
+
+
+class RouteLevelsOfDetail:
+    """
+    A session's route together with the importance of each of its points
+
+    Any level of detail is a threshold on the importance array, so one
+    object answers every tolerance and max_points without recomputing.
+    Points are held as NumPy columns (about 60 bytes a point) rather than
+    database rows, and rows are only rebuilt for the points a level keeps.
+    """
+
+    __slots__ = ('session_id', 'ids', 'columns', 'timestamps', 'importance')
+
+    def __init__(self, session_id, rows, method='rdp'):
+        self.session_id = session_id
+        self.ids = np.array([row.id for row in rows], dtype=np.int64)
+        self.columns = {
+            field: np.array([getattr(row, field) for row in rows], dtype=np.float64)
+            for field in FLOAT_FIELDS
+        }
+        # Naive UTC datetimes; NaT for missing timestamps
+        self.timestamps = np.array([row.timestamp for row in rows], dtype='datetime64[us]')
+        x, y = local_xy(self.columns['latitude'], self.columns['longitude'])
+        self.importance = IMPORTANCE_FUNCTIONS[method](x, y).astype(np.float32)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def select(self, tolerance=None, max_points=None):
+        """Return RoutePoint rows of the points kept at a tolerance and/or point budget"""
+        indices = np.asarray(select_points(self.importance, tolerance, max_points), dtype=np.intp)
+        columns = [self.columns[field][indices].tolist() for field in FLOAT_FIELDS]
+        return [
+            RoutePoint(point_id, self.session_id, latitude, longitude, _optional(altitude),
+                       _optional(horizontal), _optional(vertical), timestamp)
+            for point_id, latitude, longitude, altitude, horizontal, vertical, timestamp
+            in zip(self.ids[indices].tolist(), *columns, self.timestamps[indices].tolist())
+        ]
+
+
+# Per-worker cache of computed levels of detail for completed sessions,
+# bounded by the number of points held as well as the number of routes
+route_lods = LRUCache(
+    max_size=app.config["ROUTE_LOD_CACHE_SIZE"],
+    max_weight=app.config["ROUTE_LOD_CACHE_MAX_POINTS"],
+    weigh=len
+)
+
+
+def parse_simplify_args(args):
+    """
+    Read simplify, tolerance and max_points from request arguments
+
+    Returns:
+        tuple: (method, tolerance, max_points), with method None when the
+        route should not be simplified
+
+    Raises:
+        ValueError: If an argument is invalid
+    """
+    tolerance = args.get('tolerance', type=float)
+    max_points = args.get('max_points', type=int)
+    if 'tolerance' in args and (tolerance is None or not tolerance >= 0):
+        raise ValueError("tolerance must be a non-negative number")
+    if 'max_points' in args and (max_points is None or max_points < 2):
+        raise ValueError("max_points must be an integer of at least 2")
+
+    method = args.get('simplify', 'rdp')
+    if method not in SIMPLIFY_METHODS:
+        raise ValueError(f"simplify must be one of: {', '.join(SIMPLIFY_METHODS)}")
+
+    if tolerance is None and max_points is None:
+        return None, None, None
+    return method, tolerance, max_points
+
+
+def simplified_route(session, method='rdp', tolerance=None, max_points=None):
+    """
+    Location point rows of a simplified session route
+
+    Levels of detail of completed sessions are cached, since their points no
+    longer change; other sessions are simplified on every call.
+
+    Returns:
+        list: Rows with the api.streaming.POINT_COLUMNS values, in time order
+    """
+    key = (session.id, method)
+    lods = route_lods.get(key)
+    if lods is None:
+        rows = [row for chunk in iter_location_point_chunks(session.id) for row in chunk]
+        lods = RouteLevelsOfDetail(session.id, rows, method)
+        if session.status == 'completed':
+            route_lods.set(key, lods)
+
+    return lods.select(tolerance, max_points)
+
+
+def forget_route(session_id):
+    """Drop cached levels of detail of a session whose points or status changed"""
+    for method in SIMPLIFY_METHODS:
+        route_lods.pop((session_id, method))
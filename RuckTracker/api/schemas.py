@@ -1,4 +1,4 @@
-from marshmallow import Schema, fields, validate
+from marshmallow import Schema, fields, validate, EXCLUDE
 
 class UserSchema(Schema):
     """Schema for validating user data"""
@@ -34,7 +34,17 @@ class LocationPointSchema(Schema):
     latitude = fields.Float(required=True, validate=validate.Range(min=-90, max=90))
     longitude = fields.Float(required=True, validate=validate.Range(min=-180, max=180))
     altitude = fields.Float()
-    timestamp = fields.DateTime(dump_only=True)
+    horizontal_accuracy_m = fields.Float(validate=validate.Range(min=0))
+    vertical_accuracy_m = fields.Float(validate=validate.Range(min=0))
+    timestamp = fields.DateTime()  # Optional client fix time, defaults to server time
+
+class BatchLocationPointSchema(LocationPointSchema):
+    """Schema for validating one point of a batch; replayed fixes must carry their own time"""
+    timestamp = fields.DateTime(required=True)
+
+class LocationPointBatchSchema(Schema):
+    """Schema for validating a batch of buffered location points"""
+    points = fields.List(fields.Dict(), required=True, validate=validate.Length(min=1, max=1000))
 
 class SessionReviewSchema(Schema):
     """Schema for validating session review data"""
@@ -55,6 +65,18 @@ class StatisticsSchema(Schema):
     total_duration_seconds = fields.Int()
     monthly_breakdown = fields.List(fields.Dict(), dump_only=True)
 
+class AppleHealthRoutePointSchema(Schema):
+    """Schema for validating one route sample of an Apple Health workout"""
+    class Meta:
+        unknown = EXCLUDE  # Samples may carry extra fields such as speed or course
+
+    latitude = fields.Float(required=True, validate=validate.Range(min=-90, max=90))
+    longitude = fields.Float(required=True, validate=validate.Range(min=-180, max=180))
+    altitude = fields.Float(allow_none=True)
+    horizontal_accuracy_m = fields.Float(allow_none=True, validate=validate.Range(min=0))
+    vertical_accuracy_m = fields.Float(allow_none=True, validate=validate.Range(min=0))
+    timestamp = fields.DateTime(required=True)
+
 class AppleHealthWorkoutSchema(Schema):
     """Schema for validating Apple Health workout data"""
     workoutActivityType = fields.Str(required=True)
@@ -64,7 +86,7 @@ class AppleHealthWorkoutSchema(Schema):
     distance = fields.Float(required=True)
     elevationAscended = fields.Float()
     metadata = fields.Dict()
-    route = fields.List(fields.Dict())
+    route = fields.List(fields.Nested(AppleHealthRoutePointSchema))
 
 class AppleHealthSyncSchema(Schema):
     """Schema for validating Apple Health sync data"""
@@ -77,5 +99,6 @@ class AppleHealthStatusSchema(Schema):
     last_sync_time = fields.DateTime(allow_none=True)
 
 # Create schema instances
+apple_health_workout_schema = AppleHealthWorkoutSchema()
 apple_health_sync_schema = AppleHealthSyncSchema()
 apple_health_status_schema = AppleHealthStatusSchema()
\ No newline at end of file
@@ -0,0 +1,120 @@
+import logging
+import threading
+
+from app import app
+from models import User, LocationPoint
+from api.point_filter import epoch_seconds
+from utils.cache import LRUCache
+from utils.location import ElevationTracker, elevation_filter_enabled, location_setting
+
+logger = logging.getLogger(__name__)
+
+
+class SessionState:
+    """
+    Running state of an active session, kept between ingest requests
+
+    Holds everything the ingest path needs to compute increments for the
+    next point without touching the database: the last fix, the running
+    totals and the weights used for the calorie estimate.
+    """
+
+    __slots__ = (
+        'session_id', 'user_id', 'ruck_weight_kg', 'user_weight_kg',
+        'last_latitude', 'last_longitude', 'last_altitude', 'last_timestamp', 'last_timestamp_from_client',
+        'kept_latitude', 'kept_longitude', 'kept_altitude', 'kept_timestamp',
+        'distance_km', 'elevation_gain_m', 'elevation_loss_m', 'calories_burned',
+        'elevation', 'pending_fix', 'lock'
+    )
+
+    def __init__(self, session, user_weight_kg=None, last_point=None, elevation=None):
+        self.session_id = session.id
+        self.user_id = session.user_id
+        self.ruck_weight_kg = session.ruck_weight_kg
+        self.user_weight_kg = user_weight_kg
+
+        self.last_latitude = last_point.latitude if last_point else None
+        self.last_longitude = last_point.longitude if last_point else None
+        self.last_altitude = last_point.altitude if last_point else None
+        self.last_timestamp = last_point.timestamp if last_point else None
+        self.last_timestamp_from_client = bool(last_point and last_point.timestamp_from_client)
+
+        # Last stored point, which the ingest deadband compares new points against;
+        # the last received point above may be one the deadband dropped
+        self.kept_latitude = self.last_latitude
+        self.kept_longitude = self.last_longitude
+        self.kept_altitude = self.last_altitude
+        self.kept_timestamp = last_point.timestamp if last_point else None
+
+        self.distance_km = session.distance_km or 0.0
+        self.elevation_gain_m = session.elevation_gain_m or 0.0
+        self.elevation_loss_m = session.elevation_loss_m or 0.0
+        self.calories_burned = session.calories_burned or 0.0
+
+        # Smoothing/hysteresis state when elevation filtering is enabled
+        self.elevation = elevation
+
+        # Last fix the GPS quality filter rejected as too fast, retried with the next points
+        self.pending_fix = None
+
+        # Serializes ingest for this session between threads of one worker
+        self.lock = threading.Lock()
+
+    @classmethod
+    def load(cls, session):
+        """Build the running state for a session from the database"""
+        recent_points = (LocationPoint.query
+                         .filter_by(session_id=session.id)
+                         .order_by(LocationPoint.timestamp.desc())
+                         .limit(location_setting('ELEVATION_WINDOW'))
+                         .all())
+        last_point = recent_points[0] if recent_points else None
+        
+        elevation = None
+        if elevation_filter_enabled():
+            elevation = ElevationTracker.resume(
+                [point.altitude for point in reversed(recent_points) if point.altitude is not None]
+            )
+        
+        user = User.query.get(session.user_id)
+        return cls(session, user.weight_kg if user else None, last_point, elevation)
+
+    @property
+    def has_last_point(self):
+        return self.last_latitude is not None and self.last_longitude is not None
+
+    def previous_fix(self):
+        """
+        (latitude, longitude, epoch seconds) of the last accepted point, for the GPS quality filter
+
+        The time is unknown (NaN) when the server stamped the point on arrival.
+        """
+        timestamp = self.last_timestamp if self.last_timestamp_from_client else None
+        return self.last_latitude, self.last_longitude, epoch_seconds(timestamp)
+
+    def statistics(self):
+        """Running totals returned to the client after each update"""
+        return {
+            "distance_km": self.distance_km,
+            "elevation_gain_m": self.elevation_gain_m,
+            "elevation_loss_m": self.elevation_loss_m,
+            "calories_burned": self.calories_burned
+        }
+
+
+# Per-worker cache of active sessions, keyed by session id. The TTL bounds how
+# long another worker's status change can go unnoticed by this one.
+session_states = LRUCache(
+    max_size=app.config["SESSION_STATE_CACHE_SIZE"],
+    ttl_seconds=app.config["SESSION_STATE_CACHE_TTL"]
+)
+
+
+def forget_session(session_id):
+    """Drop cached running state once a session stops being active or is edited"""
+    session_states.pop(session_id)
+
+
+def forget_user_sessions(user_id):
+    """Drop cached running state for every session of a user, e.g. after a weight change"""
+    session_states.discard_where(lambda state: state.user_id == user_id)
@@ -0,0 +1,159 @@
+import json
+import logging
+import threading
+import time
+
+from sqlalchemy import event
+
+from app import app, db
+from api.change_counters import increment_user_counter, user_counter
+from utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class InProcessCacheBackend:
+    """LRU/TTL backend private to this worker"""
+
+    def __init__(self, max_size=10000, ttl_seconds=300):
+        self._cache = LRUCache(max_size=max_size, ttl_seconds=ttl_seconds)
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def set(self, key, value):
+        self._cache.set(key, value)
+
+    def delete(self, key):
+        self._cache.pop(key)
+
+    def stats(self):
+        stats = self._cache.stats()
+        return {'backend': 'memory', 'size': stats['size'], 'evictions': stats['evictions']}
+
+
+class LocalSharedCacheBackend:
+    """
+    In-memory stand-in for a shared cache server such as Redis or memcached
+
+    Values are stored serialized, as a network cache would, and several
+    backends can share one store to stand in for several workers in tests.
+    The store lives in this process, so real workers never share it; a real
+    shared backend only needs the same get/set/delete/stats methods.
+    """
+
+    def __init__(self, store=None, ttl_seconds=300):
+        self.store = store if store is not None else {}
+        self.ttl_seconds = ttl_seconds
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self.store.get(key)
+            if entry is None:
+                return None
+            payload, expires_at = entry
+            if expires_at is not None and time.monotonic() > expires_at:
+                del self.store[key]
+                self.evictions += 1
+                return None
+            return json.loads(payload)
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            self.store[key] = (json.dumps(value), expires_at)
+
+    def delete(self, key):
+        with self._lock:
+            self.store.pop(key, None)
+
+    def stats(self):
+        return {'backend': 'local-shared', 'size': len(self.store), 'evictions': self.evictions}
+
+
+class StatisticsCache:
+    """
+    Cache of statistics responses keyed by user and period parameters
+
+    Every key embeds the user's statistics_changes counter, which lives in
+    the database and is incremented in the transaction that changes the
+    statistics. Each lookup reads the counter first, so as soon as a change
+    commits, every worker stops matching the user's older entries, which
+    age out of the backend on their own. The backend only has to store
+    values; it never has to be told about invalidations.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend
+
+        # Counters for monitoring
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get_or_compute(self, user_id, params, compute):
+        """Return the cached response for user_id and params, computing and storing it on a miss"""
+        if self.backend is None:
+            return compute()
+
+        version = user_counter(user_id, 'statistics_changes')
+        key = f"statistics:{user_id}:{version}:{json.dumps(params)}"
+        cached = self.backend.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        value = compute()
+        self.backend.set(key, value)
+        return value
+
+    def stats(self):
+        """Return hit/miss/invalidation counters and backend size and evictions"""
+        stats = {
+            'enabled': self.backend is not None,
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations
+        }
+        if self.backend is not None:
+            stats.update(self.backend.stats())
+        return stats
+
+
+def _backend_from_config(config):
+    """Build the backend named by STATISTICS_CACHE_BACKEND"""
+    backend = config["STATISTICS_CACHE_BACKEND"]
+    if backend == 'memory':
+        return InProcessCacheBackend(config["STATISTICS_CACHE_SIZE"], config["STATISTICS_CACHE_TTL"])
+    if backend == 'local-shared':
+        return LocalSharedCacheBackend(ttl_seconds=config["STATISTICS_CACHE_TTL"])
+    if backend == 'none':
+        return None
+    raise ValueError(f"Unknown STATISTICS_CACHE_BACKEND: {backend}")
+
+
+statistics_cache = StatisticsCache(_backend_from_config(app.config))
+
+
+def configure_statistics_cache(backend):
+    """Install a different backend, e.g. a client for a shared cache server"""
+    statistics_cache.backend = backend
+
+
+def mark_user_statistics_changed(user_id):
+    """Make every worker drop a user's cached statistics once the current transaction commits"""
+    increment_user_counter(user_id, 'statistics_changes')
+    db.session.info.setdefault('statistics_users', set()).add(user_id)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _count_committed_invalidations(session):
+    statistics_cache.invalidations += len(session.info.pop('statistics_users', ()))
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _forget_rolled_back_users(session):
+    session.info.pop('statistics_users', None)
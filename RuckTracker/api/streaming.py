@@ -0,0 +1,120 @@
+import json
+
+from flask import Response, stream_with_context
+from sqlalchemy import select
+
+from app import db
+from models import LocationPoint
+from api.pagination import fetch_keyset_page
+
+# Columns read per point, in the order of LocationPoint.to_dict
+POINT_COLUMNS = (
+    LocationPoint.id,
+    LocationPoint.session_id,
+    LocationPoint.latitude,
+    LocationPoint.longitude,
+    LocationPoint.altitude,
+    LocationPoint.horizontal_accuracy_m,
+    LocationPoint.vertical_accuracy_m,
+    LocationPoint.timestamp,
+)
+
+
+def iter_location_point_chunks(session_id, chunk_size=1000):
+    """
+    Yield a session's location points in time order, one page of rows at a time
+
+    Each page is its own keyset query on (timestamp, id), so no cursor or
+    connection is held between pages and only one page is ever in memory.
+
+    Args:
+        session_id (int): Session whose points to read
+        chunk_size (int): Rows per page
+
+    Returns:
+        generator: Lists of row tuples with the POINT_COLUMNS values
+    """
+    query = select(*POINT_COLUMNS).where(LocationPoint.session_id == session_id)
+    last = None
+    while True:
+        rows = fetch_keyset_page(
+            query, lambda page: db.session.execute(page).all(),
+            LocationPoint.timestamp, LocationPoint.id,
+            last.timestamp if last else None, last.id if last else None,
+            limit=chunk_size
+        )
+        if not rows:
+            return
+        yield rows
+        if len(rows) < chunk_size:
+            return
+        last = rows[-1]
+
+
+def location_points_by_session(session_ids):
+    """
+    Load the location points of several sessions with one query
+
+    Returns:
+        dict: Session id mapped to its rows with the POINT_COLUMNS values, in
+        time order; sessions without points are absent
+    """
+    if not session_ids:
+        return {}
+    query = (select(*POINT_COLUMNS)
+             .where(LocationPoint.session_id.in_(session_ids))
+             .order_by(LocationPoint.session_id, LocationPoint.timestamp.asc().nulls_last(), LocationPoint.id))
+
+    points = {}
+    for row in db.session.execute(query):
+        points.setdefault(row.session_id, []).append(row)
+    return points
+
+
+def route_points(rows):
+    """Yield (latitude, longitude, altitude, timestamp) tuples of location point rows"""
+    for row in rows:
+        yield row.latitude, row.longitude, row.altitude, row.timestamp
+
+
+def iter_route_points(session_id, chunk_size=1000):
+    """Yield (latitude, longitude, altitude, timestamp) tuples of a session in time order"""
+    for rows in iter_location_point_chunks(session_id, chunk_size):
+        yield from route_points(rows)
+
+
+def point_row_dict(row):
+    """Convert a location point row to the dict LocationPoint.to_dict returns"""
+    return {
+        'id': row.id,
+        'session_id': row.session_id,
+        'latitude': row.latitude,
+        'longitude': row.longitude,
+        'altitude': row.altitude,
+        'horizontal_accuracy_m': row.horizontal_accuracy_m,
+        'vertical_accuracy_m': row.vertical_accuracy_m,
+        'timestamp': row.timestamp.isoformat() if row.timestamp else None
+    }
+
+
+def stream_session_response(session, chunk_size=1000):
+    """
+    Stream {"session": {..., "location_points": [...]}} as a chunked response
+
+    The session fields are serialized up front; points are written to the
+    response page by page, so memory stays flat however long the track is.
+    """
+    session_json = json.dumps(session.to_dict())
+    session_id = session.id
+
+    def generate():
+        # Reopen the session object to append the points array as its last key
+        yield '{"session": ' + session_json[:-1] + ', "location_points": ['
+        first = True
+        for rows in iter_location_point_chunks(session_id, chunk_size):
+            chunk = ', '.join(json.dumps(point_row_dict(row)) for row in rows)
+            yield chunk if first else ', ' + chunk
+            first = False
+        yield ']}}'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
@@ -0,0 +1,412 @@
+import atexit
+import logging
+import threading
+import time
+
+from sqlalchemy import func, insert, update
+from sqlalchemy.exc import InterfaceError, OperationalError
+from werkzeug.exceptions import BadRequest, ServiceUnavailable
+
+from app import app, db
+from models import RuckSession, LocationPoint
+from api.session_state import forget_session
+from utils.calculations import calculate_calories
+
+logger = logging.getLogger(__name__)
+
+# Session totals maintained by adding per-point increments
+INCREMENT_FIELDS = ('distance_km', 'elevation_gain_m', 'elevation_loss_m')
+
+# Session point counters maintained the same way
+COUNTER_FIELDS = ('points_received', 'points_stored')
+
+
+class PointsPendingError(ServiceUnavailable):
+    """A session's buffered points could not be written yet, so its stored state is incomplete"""
+
+    def __init__(self, session_id):
+        super().__init__(f"Location points of session {session_id} are still waiting to be written; retry shortly")
+
+
+class SessionNotActiveError(BadRequest):
+    """A session stopped being active before increments could be added to it"""
+
+    def __init__(self, session_id):
+        super().__init__(f"Session {session_id} is not active")
+        self.session_id = session_id
+
+
+def _is_transient(error):
+    """Whether a write failed for reasons unrelated to the rows, such as a lost connection or a lock timeout"""
+    return isinstance(error, (OperationalError, InterfaceError)) or getattr(error, 'connection_invalidated', False)
+
+
+class LocationPointBuffer:
+    """
+    Per-worker write-behind buffer for location points
+
+    Ingested points are appended in memory and written as one multi-row
+    insert, together with the summed increments of every session they touch,
+    once max_points are buffered or the oldest point has waited max_delay_ms.
+    Those two limits are the durability bound: a crash loses at most that
+    many points or that much time of ingest for this worker.
+
+    If the combined write fails, each session is retried in its own
+    transaction, so one bad session cannot hold back the others. A session
+    whose own write fails max_attempts times is dropped and logged.
+    Connection-level failures are retried without counting against it.
+    """
+
+    def __init__(self, enabled=False, max_points=500, max_delay_ms=1000, max_attempts=3):
+        self.enabled = enabled
+        self.max_points = max_points
+        self.max_delay_ms = max_delay_ms
+        self.max_attempts = max_attempts
+
+        self._rows = []
+        self._increments = {}
+        self._oldest_at = None
+        self._failed_attempts = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flusher = None
+
+        # Counters for monitoring
+        self.flush_count = 0
+        self.failed_flush_count = 0
+        self.flushed_points = 0
+        self.dropped_sessions = 0
+        self.dropped_points = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    def append(self, rows, session_id, increments, user_weight_kg, ruck_weight_kg):
+        """Buffer point rows and the session increments they produce"""
+        with self._lock:
+            self._rows.extend(rows)
+            if increments:
+                self._merge_increments(session_id, dict(
+                    increments, user_weight_kg=user_weight_kg, ruck_weight_kg=ruck_weight_kg
+                ))
+            if self._oldest_at is None:
+                self._oldest_at = time.monotonic()
+            full = len(self._rows) >= self.max_points
+
+        if full:
+            self.flush()
+
+    def _merge_increments(self, session_id, pending):
+        """Add pending increments for a session to those already buffered"""
+        buffered = self._increments.get(session_id)
+        if buffered is None:
+            self._increments[session_id] = pending
+            return
+        for field in INCREMENT_FIELDS + COUNTER_FIELDS:
+            buffered[field] += pending[field]
+
+    def flush_if_due(self):
+        """Flush when the oldest buffered point has exceeded max_delay_ms"""
+        oldest_at = self._oldest_at
+        if oldest_at is not None and (time.monotonic() - oldest_at) * 1000 >= self.max_delay_ms:
+            self.flush()
+
+    def pending(self, session_id):
+        """Whether a session has points or increments waiting to be written"""
+        with self._lock:
+            return session_id in self._increments or any(row['session_id'] == session_id for row in self._rows)
+
+    def discard(self, session_id):
+        """Drop a session's buffered points and increments, e.g. because the session is being deleted"""
+        with self._lock:
+            self._rows = [row for row in self._rows if row['session_id'] != session_id]
+            self._increments.pop(session_id, None)
+            self._failed_attempts.pop(session_id, None)
+            if not self._rows and not self._increments:
+                self._oldest_at = None
+
+    def flush(self):
+        """
+        Write every buffered point and session increment, in a single transaction if possible
+
+        Failures are logged and the affected sessions stay buffered or are
+        dropped; they are never raised to the caller.
+
+        Returns:
+            int: Number of points written
+        """
+        with self._flush_lock:
+            with self._lock:
+                rows, increments = self._rows, self._increments
+                self._rows, self._increments, self._oldest_at = [], {}, None
+
+            if not rows and not increments:
+                return 0
+
+            started = time.perf_counter()
+            try:
+                written = self._write(rows, increments)
+                self._failed_attempts.clear()
+            except Exception as e:
+                db.session.rollback()
+                self.failed_flush_count += 1
+                if _is_transient(e):
+                    logger.warning(f"Failed to flush {len(rows)} buffered location points, will retry: {e}")
+                    self._requeue(rows, increments)
+                    return 0
+                logger.warning(f"Failed to flush {len(rows)} buffered location points, "
+                               f"retrying session by session: {e}")
+                written = self._flush_sessions(rows, increments)
+
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.flush_count += 1
+            self.flushed_points += written
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self.total_flush_ms += elapsed_ms
+            return written
+
+    def _write(self, rows, increments):
+        """
+        Apply increments and insert rows in one transaction
+
+        Sessions that are no longer active, e.g. completed by another worker
+        while their points waited here, keep neither increments nor points.
+        """
+        inactive = set()
+        for session_id, pending in increments.items():
+            totals = apply_session_increments(
+                session_id, pending, pending['user_weight_kg'], pending['ruck_weight_kg']
+            )
+            if totals is None:
+                inactive.add(session_id)
+
+        if inactive:
+            stale = [row for row in rows if row['session_id'] in inactive]
+            rows = [row for row in rows if row['session_id'] not in inactive]
+        if rows:
+            db.session.execute(insert(LocationPoint), rows)
+        db.session.commit()
+
+        if inactive:
+            self.dropped_points += len(stale)
+            logger.warning(
+                f"Dropped {len(stale)} buffered location points of sessions "
+                f"{sorted(inactive)} that are no longer active"
+            )
+            # The next point re-reads these sessions and is rejected there
+            for session_id in inactive:
+                forget_session(session_id)
+        return len(rows)
+
+    def _flush_sessions(self, rows, increments):
+        """Write each session's share of a failed flush separately; returns points written"""
+        rows_by_session = {}
+        for row in rows:
+            rows_by_session.setdefault(row['session_id'], []).append(row)
+        session_ids = list(dict.fromkeys(list(rows_by_session) + list(increments)))
+
+        written = 0
+        for position, session_id in enumerate(session_ids):
+            session_rows = rows_by_session.get(session_id, [])
+            session_increments = {session_id: increments[session_id]} if session_id in increments else {}
+            try:
+                session_written = self._write(session_rows, session_increments)
+            except Exception as e:
+                db.session.rollback()
+                if _is_transient(e):
+                    # Nothing is known about this session or the rest; try them all again later
+                    remaining = session_ids[position:]
+                    self._requeue(
+                        [row for session_id in remaining for row in rows_by_session.get(session_id, [])],
+                        {session_id: increments[session_id] for session_id in remaining if session_id in increments}
+                    )
+                    break
+
+                attempts = self._failed_attempts.get(session_id, 0) + 1
+                if attempts >= self.max_attempts:
+                    self._failed_attempts.pop(session_id, None)
+                    self.dropped_sessions += 1
+                    self.dropped_points += len(session_rows)
+                    logger.error(
+                        f"Dropping {len(session_rows)} buffered location points and increments "
+                        f"{session_increments.get(session_id)} of session {session_id} "
+                        f"after {attempts} failed writes: {e}"
+                    )
+                else:
+                    self._failed_attempts[session_id] = attempts
+                    self._requeue(session_rows, session_increments)
+                continue
+
+            self._failed_attempts.pop(session_id, None)
+            written += session_written
+        return written
+
+    def _requeue(self, rows, increments):
+        """Put unwritten rows and increments back in front of anything buffered meanwhile"""
+        with self._lock:
+            self._rows = rows + self._rows
+            for session_id, pending in increments.items():
+                self._merge_increments(session_id, pending)
+            if self._oldest_at is None and (self._rows or self._increments):
+                self._oldest_at = time.monotonic()
+
+    def start(self, flask_app):
+        """Start the background flusher and flush whatever is left at shutdown"""
+        if self._flusher is not None:
+            return
+
+        def run():
+            interval = max(self.max_delay_ms / 4000, 0.01)
+            while True:
+                time.sleep(interval)
+                with flask_app.app_context():
+                    try:
+                        self.flush_if_due()
+                    except Exception:
+                        # Keep the flusher alive whatever happens; flush failures are logged there
+                        logger.exception("Location point flusher failed")
+
+        def flush_on_exit():
+            with flask_app.app_context():
+                self.flush()
+
+        self._flusher = threading.Thread(target=run, name='location-point-flusher', daemon=True)
+        self._flusher.start()
+        atexit.register(flush_on_exit)
+
+    def stats(self):
+        """Return buffer depth and flush latency counters"""
+        return {
+            'enabled': self.enabled,
+            'depth': len(self._rows),
+            'pending_sessions': len(self._increments),
+            'max_points': self.max_points,
+            'max_delay_ms': self.max_delay_ms,
+            'flush_count': self.flush_count,
+            'failed_flush_count': self.failed_flush_count,
+            'flushed_points': self.flushed_points,
+            'dropped_sessions': self.dropped_sessions,
+            'dropped_points': self.dropped_points,
+            'max_attempts': self.max_attempts,
+            'last_flush_ms': self.last_flush_ms,
+            'max_flush_ms': self.max_flush_ms,
+            'avg_flush_ms': self.total_flush_ms / self.flush_count if self.flush_count else 0.0
+        }
+
+
+location_buffer = LocationPointBuffer(
+    enabled=app.config["LOCATION_WRITE_BEHIND"],
+    max_points=app.config["LOCATION_WRITE_BEHIND_MAX_POINTS"],
+    max_delay_ms=app.config["LOCATION_WRITE_BEHIND_MAX_DELAY_MS"],
+    max_attempts=app.config["LOCATION_WRITE_BEHIND_MAX_ATTEMPTS"]
+)
+
+
+def apply_session_increments(session_id, increments, user_weight_kg, ruck_weight_kg):
+    """
+    Add distance and elevation increments to an active session in one atomic UPDATE
+
+    Concurrent writers never lose each other's increments. Calories depend
+    on the totals rather than the increments, so they are only written while
+    the totals are still the ones this UPDATE returned; a writer that has
+    moved them on since writes its own, newer value. Point counters are
+    added the same way.
+
+    Returns:
+        dict: Session totals after the update, or None if the session is gone
+        or no longer active
+    """
+    result = db.session.execute(
+        update(RuckSession)
+        .where(RuckSession.id == session_id, RuckSession.status == 'active')
+        .values({
+            **{
+                field: func.coalesce(getattr(RuckSession, field), 0.0) + increments[field]
+                for field in INCREMENT_FIELDS
+            },
+            **{
+                field: func.coalesce(getattr(RuckSession, field), 0) + increments[field]
+                for field in COUNTER_FIELDS
+            }
+        })
+        .returning(
+            RuckSession.distance_km,
+            RuckSession.elevation_gain_m,
+            RuckSession.elevation_loss_m,
+            RuckSession.calories_burned
+        )
+        .execution_options(synchronize_session=False)
+    ).first()
+
+    if result is None:
+        return None
+
+    totals = dict(result._mapping)
+    if user_weight_kg and (increments['distance_km'] or increments['elevation_gain_m']):
+        totals['calories_burned'] = calculate_calories(
+            user_weight_kg,
+            ruck_weight_kg,
+            totals['distance_km'],
+            totals['elevation_gain_m']
+        )
+        db.session.execute(
+            update(RuckSession)
+            .where(
+                RuckSession.id == session_id,
+                RuckSession.distance_km == totals['distance_km'],
+                RuckSession.elevation_gain_m == totals['elevation_gain_m']
+            )
+            .values(calories_burned=totals['calories_burned'])
+            .execution_options(synchronize_session=False)
+        )
+
+    return totals
+
+
+def save_location_points(rows, session_id, increments, user_weight_kg, ruck_weight_kg, buffered=True):
+    """
+    Persist point rows and session increments now, or buffer them when write-behind is enabled
+
+    Returns:
+        dict: Session totals after a direct write, or None when nothing was
+        written to the session yet
+
+    Raises:
+        SessionNotActiveError: If the session stopped being active; nothing
+        is written then
+    """
+    if buffered and location_buffer.enabled:
+        location_buffer.append(rows, session_id, increments, user_weight_kg, ruck_weight_kg)
+        return None
+
+    totals = None
+    if increments:
+        totals = apply_session_increments(session_id, increments, user_weight_kg, ruck_weight_kg)
+        if totals is None:
+            db.session.rollback()
+            raise SessionNotActiveError(session_id)
+    if rows:
+        db.session.execute(insert(LocationPoint), rows)
+    db.session.commit()
+    return totals
+
+
+def flush_location_points(session_id=None):
+    """
+    Make buffered points visible before reading or changing a session
+
+    Raises:
+        PointsPendingError: If session_id is given and that session's points
+        could not be written; failures of other sessions are not raised
+    """
+    if location_buffer.enabled:
+        location_buffer.flush()
+        if session_id is not None and location_buffer.pending(session_id):
+            raise PointsPendingError(session_id)
+
+
+def discard_location_points(session_id):
+    """Forget buffered points of a session that is being deleted"""
+    if location_buffer.enabled:
+        location_buffer.discard(session_id)
@@ -33,6 +33,54 @@ app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
 }
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
+# Configure per-worker cache of active session running state
+app.config["SESSION_STATE_CACHE_SIZE"] = int(os.environ.get("SESSION_STATE_CACHE_SIZE", 10000))
+app.config["SESSION_STATE_CACHE_TTL"] = int(os.environ.get("SESSION_STATE_CACHE_TTL", 300))
+
+# Lock the session row on every ingest request instead of trusting cached state,
+# for deployments that cannot route a session's points to the same worker
+app.config["INGEST_ROW_LOCKING"] = os.environ.get("INGEST_ROW_LOCKING", "false").lower() == "true"
+
+# Configure the ingest deadband: points within this distance of the last stored point
+# (horizontally and vertically) and this many seconds after it are counted but not stored.
+# 0 meters disables it.
+app.config["INGEST_DEADBAND_METERS"] = float(os.environ.get("INGEST_DEADBAND_METERS", 0))
+app.config["INGEST_DEADBAND_SECONDS"] = float(os.environ.get("INGEST_DEADBAND_SECONDS", 30))
+
+# Configure distance calculation, elevation filtering and the GPS quality filter
+# (see utils/location.py); 0 disables a GPS check
+app.config["DISTANCE_MODE"] = os.environ.get("DISTANCE_MODE", "geodesic")
+app.config["ELEVATION_SMOOTHING"] = os.environ.get("ELEVATION_SMOOTHING", "none")
+app.config["ELEVATION_WINDOW"] = int(os.environ.get("ELEVATION_WINDOW", 5))
+app.config["ELEVATION_HYSTERESIS_M"] = float(os.environ.get("ELEVATION_HYSTERESIS_M", 0))
+app.config["GPS_MAX_ACCURACY_M"] = float(os.environ.get("GPS_MAX_ACCURACY_M", 50))
+app.config["GPS_MAX_SPEED_MPS"] = float(os.environ.get("GPS_MAX_SPEED_MPS", 12))
+
+# Configure list endpoint page sizes
+app.config["PAGE_SIZE_DEFAULT"] = int(os.environ.get("PAGE_SIZE_DEFAULT", 50))
+app.config["PAGE_SIZE_MAX"] = int(os.environ.get("PAGE_SIZE_MAX", 200))
+
+# Configure how many location points a streamed session response reads per query
+app.config["POINT_STREAM_CHUNK_SIZE"] = int(os.environ.get("POINT_STREAM_CHUNK_SIZE", 1000))
+
+# Configure how many completed sessions' simplified routes each worker keeps
+app.config["ROUTE_LOD_CACHE_SIZE"] = int(os.environ.get("ROUTE_LOD_CACHE_SIZE", 256))
+app.config["ROUTE_LOD_CACHE_MAX_POINTS"] = int(os.environ.get("ROUTE_LOD_CACHE_MAX_POINTS", 1000000))
+
+# Configure the statistics response cache: memory (per worker), local-shared or none
+app.config["STATISTICS_CACHE_BACKEND"] = os.environ.get("STATISTICS_CACHE_BACKEND", "memory")
+app.config["STATISTICS_CACHE_SIZE"] = int(os.environ.get("STATISTICS_CACHE_SIZE", 10000))
+app.config["STATISTICS_CACHE_TTL"] = int(os.environ.get("STATISTICS_CACHE_TTL", 300))
+
+# Configure how many workouts a streamed Apple Health sync imports per commit
+app.config["APPLE_HEALTH_IMPORT_BATCH_SIZE"] = int(os.environ.get("APPLE_HEALTH_IMPORT_BATCH_SIZE", 100))
+
+# Configure optional write-behind buffering of location points
+app.config["LOCATION_WRITE_BEHIND"] = os.environ.get("LOCATION_WRITE_BEHIND", "false").lower() == "true"
+app.config["LOCATION_WRITE_BEHIND_MAX_POINTS"] = int(os.environ.get("LOCATION_WRITE_BEHIND_MAX_POINTS", 500))
+app.config["LOCATION_WRITE_BEHIND_MAX_DELAY_MS"] = int(os.environ.get("LOCATION_WRITE_BEHIND_MAX_DELAY_MS", 1000))
+app.config["LOCATION_WRITE_BEHIND_MAX_ATTEMPTS"] = int(os.environ.get("LOCATION_WRITE_BEHIND_MAX_ATTEMPTS", 3))
+
 # Initialize database
 db.init_app(app)
 
@@ -44,6 +92,10 @@ with app.app_context():
     # Import models
     import models  # noqa: F401
     
+    # Reject unknown distance and elevation settings before serving anything
+    from utils.location import check_location_settings
+    check_location_settings(app.config)
+    
     # Create tables
     db.create_all()
     
@@ -52,11 +104,13 @@ with app.app_context():
         UserResource, UserListResource,
         SessionResource, SessionListResource,
         SessionStatisticsResource, SessionReviewResource,
-        WeeklyStatisticsResource, MonthlyStatisticsResource, YearlyStatisticsResource
+        WeeklyStatisticsResource, MonthlyStatisticsResource, YearlyStatisticsResource,
+        MetricsResource
     )
     from api.apple_health import (
-        AppleHealthSyncResource, AppleHealthIntegrationStatusResource
+        AppleHealthSyncResource, AppleHealthExportImportResource, AppleHealthIntegrationStatusResource
     )
+    from api.recompute import SessionRecomputeResource
     
     # User endpoints
     api.add_resource(UserResource, '/api/users/<int:user_id>')
@@ -67,6 +121,7 @@ with app.app_context():
     api.add_resource(SessionListResource, '/api/sessions')
     api.add_resource(SessionStatisticsResource, '/api/sessions/<int:session_id>/statistics')
     api.add_resource(SessionReviewResource, '/api/sessions/<int:session_id>/review')
+    api.add_resource(SessionRecomputeResource, '/api/sessions/<int:session_id>/recompute')
     
     # Aggregated statistics endpoints
     api.add_resource(WeeklyStatisticsResource, '/api/statistics/weekly')
@@ -75,8 +130,21 @@ with app.app_context():
     
     # Apple Health integration endpoints
     api.add_resource(AppleHealthSyncResource, '/api/users/<int:user_id>/apple-health/sync')
+    api.add_resource(AppleHealthExportImportResource, '/api/users/<int:user_id>/apple-health/export')
     api.add_resource(AppleHealthIntegrationStatusResource, '/api/users/<int:user_id>/apple-health/status')
     
+    # Operational metrics
+    api.add_resource(MetricsResource, '/api/metrics')
+    
+    # Register maintenance commands (flask --app main <command>)
+    from commands import register_commands
+    register_commands(app)
+    
+    # Start the write-behind flusher when buffering is enabled
+    from api.write_behind import location_buffer
+    if location_buffer.enabled:
+        location_buffer.start(app)
+    
     # Add route for homepage
     @app.route('/')
     def index():
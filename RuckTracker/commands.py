@@ -0,0 +1,89 @@
+import click
+
+from app import db
+from models import User
+from api.apple_health_import import AppleHealthImporter
+from api.apple_health_export import import_export
+from api.recompute import recompute_sessions
+from api.rollups import rebuild_daily_rollups, check_daily_rollups
+
+
+@click.command('recompute-sessions')
+@click.option('--user-id', type=int, default=None, help='Only recompute sessions of this user')
+@click.option('--status', default='completed', show_default=True,
+              help="Only recompute sessions with this status ('' for all)")
+@click.option('--chunk-size', type=int, default=100, show_default=True,
+              help='Sessions loaded and committed per transaction')
+@click.option('--dry-run', is_flag=True, help='Report changes without writing them')
+def recompute_sessions_command(user_id, status, chunk_size, dry_run):
+    """Recompute session totals from raw location points"""
+    report = recompute_sessions(
+        user_id=user_id,
+        status=status or None,
+        chunk_size=chunk_size,
+        dry_run=dry_run
+    )
+    click.echo(
+        f"Processed {report['processed']} sessions, {report['changed']} changed, "
+        f"in {report['elapsed_seconds']:.1f}s ({report['sessions_per_second']:.1f} sessions/s)"
+    )
+
+
+@click.command('rebuild-rollups')
+@click.option('--user-id', type=int, default=None, help='Only rebuild rollups of this user')
+@click.option('--chunk-size', type=int, default=500, show_default=True,
+              help='Users rebuilt per transaction')
+def rebuild_rollups_command(user_id, chunk_size):
+    """Rebuild daily statistics rollups from raw sessions"""
+    report = rebuild_daily_rollups(user_id=user_id, chunk_size=chunk_size)
+    click.echo(f"Rebuilt {report['rows']} daily rollups for {report['users']} users")
+
+
+@click.command('check-rollups')
+@click.option('--user-id', type=int, default=None, help='Only check rollups of this user')
+@click.option('--chunk-size', type=int, default=500, show_default=True,
+              help='Users compared per query')
+def check_rollups_command(user_id, chunk_size):
+    """Compare daily statistics rollups against raw sessions"""
+    mismatches = check_daily_rollups(user_id=user_id, chunk_size=chunk_size)
+    for mismatch in mismatches:
+        click.echo(
+            f"user {mismatch['user_id']} on {mismatch['day']}: "
+            f"expected {mismatch['expected']}, found {mismatch['actual']}"
+        )
+    if mismatches:
+        raise click.ClickException(f"{len(mismatches)} daily rollups disagree with raw sessions")
+    click.echo("Daily rollups match raw sessions")
+
+
+@click.command('import-apple-health')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--user-id', type=int, required=True, help='User to import the workouts for')
+@click.option('--batch-size', type=int, default=100, show_default=True,
+              help='Workouts imported per transaction')
+def import_apple_health_command(path, user_id, batch_size):
+    """Import walking and hiking workouts from a Health app export.zip or export.xml"""
+    if db.session.get(User, user_id) is None:
+        raise click.ClickException(f"User {user_id} does not exist")
+
+    importer = AppleHealthImporter(user_id)
+    try:
+        errors = import_export(importer, path, batch_size=batch_size)
+    except ValueError as e:
+        raise click.ClickException(f"{e} (imported {importer.imported_count} workouts before the error)")
+
+    for index, workout_errors in errors.items():
+        click.echo(f"workout {index}: {workout_errors}")
+    click.echo(
+        f"Imported {importer.imported_count} workouts, skipped {importer.duplicate_count} duplicates "
+        f"and {len(errors)} invalid workouts; {importer.route_point_count} route points "
+        f"at {importer.points_per_second:.0f} points/s"
+    )
+
+
+def register_commands(app):
+    """Register maintenance commands with the Flask CLI"""
+    app.cli.add_command(recompute_sessions_command)
+    app.cli.add_command(rebuild_rollups_command)
+    app.cli.add_command(check_rollups_command)
+    app.cli.add_command(import_apple_health_command)
@@ -1,7 +1,11 @@
 from datetime import datetime
+from sqlalchemy.orm import joinedload
 from app import db
 from flask_login import UserMixin
 
+# Metrics synced with Apple Health until the user chooses otherwise
+DEFAULT_APPLE_HEALTH_METRICS = ('workouts', 'distance', 'elevation')
+
 
 class User(UserMixin, db.Model):
     """User model for rucking app"""
@@ -49,6 +53,13 @@ class RuckSession(db.Model):
     elevation_loss_m = db.Column(db.Float, default=0.0)  # Total elevation loss in meters
     calories_burned = db.Column(db.Float, default=0.0)  # Estimated calories burned
     
+    # Location points received from the client and kept after deadband compression
+    points_received = db.Column(db.Integer, default=0)
+    points_stored = db.Column(db.Integer, default=0)
+    
+    # Position in the user's sequence of session changes, assigned when the change is flushed
+    change_seq = db.Column(db.BigInteger, nullable=True)
+    
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -59,6 +70,15 @@ class RuckSession(db.Model):
     # Relationship with session review
     review = db.relationship('SessionReview', uselist=False, back_populates='session')
     
+    __table_args__ = (
+        # Statistics filter completed sessions of a user by end time
+        db.Index('ix_ruck_session_user_status_end_time', 'user_id', 'status', 'end_time'),
+        # Session listings and Apple Health duplicate checks look up a user's sessions by start time
+        db.Index('ix_ruck_session_user_start_time', 'user_id', 'start_time'),
+        # Apple Health delta exports page through a user's sessions by change sequence
+        db.Index('ix_ruck_session_user_change_seq', 'user_id', 'change_seq'),
+    )
+    
     def to_dict(self, include_points=False):
         """Convert session data to dictionary for API responses"""
         result = {
@@ -74,6 +94,8 @@ class RuckSession(db.Model):
             'elevation_gain_m': self.elevation_gain_m,
             'elevation_loss_m': self.elevation_loss_m,
             'calories_burned': self.calories_burned,
+            'points_received': self.points_received,
+            'points_stored': self.points_stored,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
             'review': self.review.to_dict() if self.review else None
@@ -95,9 +117,22 @@ class LocationPoint(db.Model):
     longitude = db.Column(db.Float, nullable=False)
     altitude = db.Column(db.Float, nullable=True)  # Elevation in meters
     
+    # Reported accuracy radius of the fix, in meters
+    horizontal_accuracy_m = db.Column(db.Float, nullable=True)
+    vertical_accuracy_m = db.Column(db.Float, nullable=True)
+    
     # Timestamp for this location point
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # True when the timestamp is the fix time the client reported; False or NULL
+    # when the server stamped the point on arrival, which says nothing about speed
+    timestamp_from_client = db.Column(db.Boolean, nullable=True)
+    
+    __table_args__ = (
+        # Ingest, route exports and recomputation read a session's points in time order
+        db.Index('ix_location_point_session_timestamp', 'session_id', 'timestamp'),
+    )
+    
     def to_dict(self):
         """Convert location point data to dictionary for API responses"""
         return {
@@ -106,6 +141,8 @@ class LocationPoint(db.Model):
             'latitude': self.latitude,
             'longitude': self.longitude,
             'altitude': self.altitude,
+            'horizontal_accuracy_m': self.horizontal_accuracy_m,
+            'vertical_accuracy_m': self.vertical_accuracy_m,
             'timestamp': self.timestamp.isoformat() if self.timestamp else None
         }
 
@@ -136,3 +173,76 @@ class SessionReview(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+
+
+def with_review():
+    """Query option loading each session's review in the same SELECT, for queries that serialize sessions"""
+    return joinedload(RuckSession.review)
+
+
+class UserDailyStatistics(db.Model):
+    """Per-user, per-day totals of completed sessions, keyed by the day each session ended"""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    
+    # Totals over the day's completed sessions
+    distance_km = db.Column(db.Float, nullable=False, default=0.0)
+    elevation_gain_m = db.Column(db.Float, nullable=False, default=0.0)
+    calories_burned = db.Column(db.Float, nullable=False, default=0.0)
+    duration_seconds = db.Column(db.Integer, nullable=False, default=0)
+    session_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'day', name='uq_user_daily_statistics_user_day'),
+    )
+    
+    def to_dict(self):
+        """Convert rollup data to dictionary for API responses"""
+        return {
+            'user_id': self.user_id,
+            'day': self.day.isoformat(),
+            'distance_km': self.distance_km,
+            'elevation_gain_m': self.elevation_gain_m,
+            'calories_burned': self.calories_burned,
+            'duration_seconds': self.duration_seconds,
+            'session_count': self.session_count
+        }
+
+
+class AppleHealthIntegration(db.Model):
+    """Per-user Apple Health integration settings and sync progress"""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False, unique=True)
+    
+    # Settings chosen by the user
+    integration_enabled = db.Column(db.Boolean, nullable=False, default=False)
+    metrics_to_sync = db.Column(db.JSON, nullable=False, default=lambda: list(DEFAULT_APPLE_HEALTH_METRICS))
+    
+    # Last import or export, and the export cursor the client last acknowledged
+    last_sync_time = db.Column(db.DateTime, nullable=True)
+    export_cursor = db.Column(db.String(255), nullable=True)
+    
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        """Convert integration status to dictionary for API responses"""
+        return {
+            'integration_enabled': self.integration_enabled,
+            'last_sync_time': self.last_sync_time.isoformat() if self.last_sync_time else None,
+            'metrics_to_sync': self.metrics_to_sync,
+            'export_cursor': self.export_cursor
+        }
+
+
+class UserChangeCounter(db.Model):
+    """Per-user counters kept in the database, so every worker sees the same values"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    
+    # Last change number handed out to the user's sessions
+    session_changes = db.Column(db.BigInteger, nullable=False, default=0)
+    
+    # Bumped whenever the user's statistics change; part of every cached statistics key
+    statistics_changes = db.Column(db.BigInteger, nullable=False, default=0)
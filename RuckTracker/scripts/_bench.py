@@ -0,0 +1,32 @@
+"""
+Shared setup for the benchmark scripts in this directory
+
+Scripts run from the project root, e.g. python scripts/bench_route_encoding.py,
+always against a throwaway SQLite database, never DATABASE_URL.
+"""
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+# Modules under api/ expect the application to be set up before they are imported
+import app  # noqa: E402,F401
+
+
+def best_of(function, repeat=3):
+    """
+    Run function repeat times
+
+    Returns:
+        tuple: (fastest wall time in seconds, result of the last run)
+    """
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - started)
+    return best, result
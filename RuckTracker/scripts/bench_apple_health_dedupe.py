@@ -0,0 +1,92 @@
+"""
+Time an Apple Health sync import and count its SQL statements
+
+Existing sessions are found with one start-time query per batch of workouts
+rather than one lookup per workout. Workouts are posted to the sync endpoint
+through the test client: a first import, a re-sync where every workout is a
+duplicate, and a small sync mixing new workouts with duplicates.
+
+    python scripts/bench_apple_health_dedupe.py [--workouts 5000]
+"""
+import argparse
+import random
+from datetime import datetime, timedelta
+
+import _bench
+
+from app import app, db
+from models import User
+from tests.helpers import recorded_queries
+
+
+def workouts(count, first=datetime(2021, 1, 1, 7)):
+    """Walking workouts within a day each, with distinct start times spread over about three years"""
+    rng = random.Random(1)
+    result = []
+    for minute in sorted(rng.sample(range(3 * 365 * 24 * 60), count)):
+        started = first + timedelta(minutes=minute)
+        duration = rng.randrange(1800, 3 * 3600)
+        result.append({
+            'workoutActivityType': 'HKWorkoutActivityTypeWalking',
+            'startDate': started.isoformat() + '+00:00',
+            'endDate': (started + timedelta(seconds=duration)).isoformat() + '+00:00',
+            'duration': duration,
+            'distance': round(rng.uniform(2, 15), 2),
+            'elevationAscended': round(rng.uniform(0, 400), 1),
+            'metadata': {'ruckWeight': 15}
+        })
+    return result
+
+
+def new_user(name):
+    user = User(username=name, email=f'{name}@example.com', weight_kg=80)
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+
+def sync(client, user_id, payload):
+    """Post one sync, returning (seconds, SQL statements, response body)"""
+    with recorded_queries() as statements:
+        seconds, response = _bench.best_of(
+            lambda: client.post(f'/api/users/{user_id}/apple-health/sync', json={'workouts': payload}), 1
+        )
+    assert response.status_code == 201, response.get_json()
+    return seconds, len(statements), response.get_json()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--workouts', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    payload = workouts(args.workouts)
+    span = datetime.fromisoformat(payload[-1]['startDate']) - datetime.fromisoformat(payload[0]['startDate'])
+    print(f"SQLite, {len(payload):,} workouts over {span.days} days, via the test client "
+          f"(best of {args.repeat})")
+
+    app.logger.disabled = True
+    with app.app_context():
+        client = app.test_client()
+
+        runs = [sync(client, new_user(f'first{attempt}'), payload) for attempt in range(args.repeat)]
+        seconds, statements, body = min(runs)
+        assert body['imported_count'] == len(payload), body
+        print(f"  first import          {seconds:6.2f} s  {statements:>6,} SQL statements")
+
+        user_id = new_user('resync')
+        sync(client, user_id, payload)
+        seconds, statements, body = min(sync(client, user_id, payload) for _ in range(args.repeat))
+        assert body['duplicate_count'] == len(payload), body
+        print(f"  re-sync, all dupes    {seconds:6.2f} s  {statements:>6,} SQL statements")
+
+        mixed_user = new_user('mixed')
+        sync(client, mixed_user, payload[:-20])
+        seconds, statements, body = sync(client, mixed_user, payload[-32:])
+        assert (body['imported_count'], body['duplicate_count']) == (20, 12), body
+        print(f"  20 new + 12 dupes     {seconds * 1000:6.1f} ms {statements:>6,} SQL statements")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Measure the error and cost of each distance mode against the WGS-84 geodesic
+
+Regenerates the table at the top of utils/location.py: the maximum relative
+error of the spherical modes over random bearings and segment lengths at
+several latitudes, the cost of one scalar call, and array throughput.
+
+    python scripts/bench_distance_modes.py [--segments 2000] [--points 1000000]
+"""
+import argparse
+import random
+import timeit
+
+import numpy as np
+from geopy.distance import geodesic
+
+import _bench
+
+from utils.location import DISTANCE_MODES, calculate_distance, track_distances
+
+LATITUDES = (0, 30, 45, 60, 75)
+
+
+def segments(latitude, count, rng):
+    """Point pairs from latitude, at random bearings and 5 m to 5 km apart along the geodesic"""
+    pairs = []
+    for _ in range(count):
+        start = (latitude, rng.uniform(-180, 180))
+        meters = 10 ** rng.uniform(np.log10(5), np.log10(5000))
+        end = geodesic(meters=meters).destination(start, rng.uniform(0, 360))
+        pairs.append((start, (end.latitude, end.longitude), meters / 1000))
+    return pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--segments', type=int, default=2000, help='random segments per latitude')
+    parser.add_argument('--points', type=int, default=1000000, help='track length for array throughput')
+    args = parser.parse_args()
+    rng = random.Random(1)
+
+    print(f"Maximum relative error versus the geodesic, {args.segments} segments of 5 m to 5 km per latitude")
+    print("  latitude        " + "  ".join(f"{latitude:>6}°" for latitude in LATITUDES))
+    by_latitude = {latitude: segments(latitude, args.segments, rng) for latitude in LATITUDES}
+    for mode in DISTANCE_MODES[1:]:
+        errors = [
+            max(abs(calculate_distance(start, end, mode) - kilometers) / kilometers
+                for start, end, kilometers in by_latitude[latitude])
+            for latitude in LATITUDES
+        ]
+        print(f"  {mode:<16}" + "  ".join(f"{error:7.2%}" for error in errors))
+    spread = max(
+        abs(calculate_distance(start, end, 'equirectangular') / calculate_distance(start, end, 'haversine') - 1)
+        for pairs in by_latitude.values() for start, end, _ in pairs
+    )
+    print(f"  equirectangular within {spread:.0e} of haversine")
+
+    start, end, _ = by_latitude[45][0]
+    print("Cost per scalar call")
+    for mode in DISTANCE_MODES:
+        calls = 2000 if mode == 'geodesic' else 200000
+        seconds = min(timeit.repeat(lambda: calculate_distance(start, end, mode), number=calls, repeat=3))
+        print(f"  {mode:<16}{seconds / calls * 1e6:7.2f} µs")
+
+    headings = np.cumsum(np.random.default_rng(1).normal(0, 0.2, args.points))
+    latitudes = 45 + np.cumsum(1.3e-5 * np.cos(headings))
+    longitudes = 7 + np.cumsum(1.7e-5 * np.sin(headings))
+    print(f"Array throughput (utils.geodesy), {args.points:,}-point track")
+    for mode in DISTANCE_MODES:
+        seconds, _ = _bench.best_of(lambda: track_distances(latitudes, longitudes, mode))
+        print(f"  {mode:<16}{args.points / seconds / 1e6:7.1f}M points/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Compare the size and speed of the JSON, polyline and binary route formats
+
+A synthetic walk at 1 Hz with altitude and fix times is encoded as the
+session endpoint's point objects and in each compact format, then decoded.
+
+    python scripts/bench_route_encoding.py [--points 21600]
+"""
+import argparse
+import base64
+import gzip
+import json
+import math
+import random
+from datetime import datetime, timedelta
+
+import _bench
+
+from api.route_lod import RoutePoint
+from api.streaming import point_row_dict, route_points
+from utils.route_encoding import decode_binary, decode_polyline, encode_route
+
+
+def walk(count):
+    """RoutePoint rows of a wandering walk, one fix a second"""
+    rng = random.Random(1)
+    latitude, longitude, altitude, heading = 40.0, -105.0, 1600.0, 0.0
+    started = datetime(2024, 5, 1, 7)
+    rows = []
+    for index in range(count):
+        heading += rng.gauss(0, 0.2)
+        latitude += 1.3e-5 * math.cos(heading)
+        longitude += 1.7e-5 * math.sin(heading)
+        altitude += rng.gauss(0, 0.3)
+        rows.append(RoutePoint(index + 1, 1, latitude, longitude, round(altitude, 1),
+                               rng.uniform(3, 15), rng.uniform(3, 15),
+                               started + timedelta(seconds=index)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--points', type=int, default=21600, help='fixes in the track (21600 is 6 h at 1 Hz)')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    rows = walk(args.points)
+    points = list(route_points(rows))
+    formats = {
+        'json': (lambda: json.dumps([point_row_dict(row) for row in rows]), json.loads),
+        'polyline': (lambda: encode_route(points, 'polyline')['data'], decode_polyline),
+        'binary': (lambda: encode_route(points, 'binary')['data'],
+                   lambda data: decode_binary(base64.b64decode(data))),
+    }
+
+    print(f"{args.points:,}-point track (best of {args.repeat})")
+    for name, (encode, decode) in formats.items():
+        encode_seconds, data = _bench.best_of(encode, args.repeat)
+        decode_seconds, decoded = _bench.best_of(lambda: decode(data), args.repeat)
+        assert len(decoded) == args.points
+        size = len(data.encode())
+        print(f"  {name:<9} {size:>10,} B (gzip {len(gzip.compress(data.encode())):>9,})  "
+              f"enc {encode_seconds * 1000:6.1f} ms  dec {decode_seconds * 1000:6.1f} ms")
+        if name == 'binary':
+            print(f"  {'':<9} ({len(base64.b64decode(data)):,} B before base64)")
+
+
+if __name__ == '__main__':
+    main()
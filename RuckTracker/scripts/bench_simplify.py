@@ -0,0 +1,92 @@
+"""
+Time route simplification and the cached levels of detail behind it
+
+Importance arrays are computed once per route; any tolerance or point
+budget is then a threshold on them. The script times both steps on a
+synthetic walk, then GET requests for a simplified completed session,
+cold and served from the level-of-detail cache.
+
+    python scripts/bench_simplify.py [--points 50000]
+"""
+import argparse
+import math
+import random
+from datetime import datetime, timedelta
+
+import _bench
+from sqlalchemy import insert
+
+from app import app, db
+from api.route_lod import route_lods
+from models import LocationPoint, RuckSession, User
+from utils.simplify import IMPORTANCE_FUNCTIONS, local_xy, select_points
+
+# Tolerances per method: meters for RDP, square meters of effective area for VW
+TOLERANCES = {'rdp': (1, 5, 20), 'vw': (1, 5, 20)}
+
+
+def walk(count):
+    """Point rows of a wandering walk, one fix a second"""
+    rng = random.Random(1)
+    latitude, longitude, altitude, heading = 40.0, -105.0, 1600.0, 0.0
+    started = datetime(2024, 5, 1, 7)
+    rows = []
+    for index in range(count):
+        heading += rng.gauss(0, 0.2)
+        latitude += 1.3e-5 * math.cos(heading) + rng.gauss(0, 2e-6)
+        longitude += 1.7e-5 * math.sin(heading) + rng.gauss(0, 2e-6)
+        altitude += rng.gauss(0, 0.3)
+        rows.append({'latitude': latitude, 'longitude': longitude, 'altitude': altitude,
+                     'timestamp': started + timedelta(seconds=index)})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--points', type=int, default=50000, help='fixes in the track (50000 is about 14 h at 1 Hz)')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    rows = walk(args.points)
+    x, y = local_xy([row['latitude'] for row in rows], [row['longitude'] for row in rows])
+    print(f"{args.points:,}-point track (best of {args.repeat})")
+    for method, importance_function in IMPORTANCE_FUNCTIONS.items():
+        seconds, importance = _bench.best_of(lambda: importance_function(x, y), args.repeat)
+        kept = [len(select_points(importance, tolerance)) for tolerance in TOLERANCES[method]]
+        select_seconds, _ = _bench.best_of(lambda: select_points(importance, TOLERANCES[method][1]), 20)
+        print(f"  {method} importance {seconds * 1000:.0f} ms; tolerance "
+              f"{'/'.join(map(str, TOLERANCES[method]))} -> {'/'.join(map(str, kept))} points; "
+              f"selecting a level {select_seconds * 1000:.2f} ms")
+
+    with app.app_context():
+        user = User(username='walker', email='walker@example.com', weight_kg=80)
+        db.session.add(user)
+        db.session.flush()
+        session = RuckSession(user_id=user.id, ruck_weight_kg=15, status='completed',
+                              start_time=rows[0]['timestamp'], end_time=rows[-1]['timestamp'])
+        db.session.add(session)
+        db.session.commit()
+        db.session.execute(insert(LocationPoint), [dict(row, session_id=session.id) for row in rows])
+        db.session.commit()
+
+        client = app.test_client()
+        url = f"/api/sessions/{session.id}?tolerance=5"
+
+        def cold():
+            route_lods.clear()
+            return client.get(url)
+
+        cold_seconds, response = _bench.best_of(cold, args.repeat)
+        assert response.status_code == 200
+        cached_seconds, _ = _bench.best_of(lambda: client.get(url), args.repeat)
+        lods = route_lods.get((session.id, 'rdp'))
+        held = (lods.ids.nbytes + lods.timestamps.nbytes + lods.importance.nbytes
+                + sum(column.nbytes for column in lods.columns.values()))
+        print(f"  GET tolerance=5: {cold_seconds * 1000:.0f} ms cold (includes loading {args.points:,} rows), "
+              f"{cached_seconds * 1000:.0f} ms cached")
+        print(f"  cached level of detail holds {held / 1e6:.1f} MB of arrays "
+              f"({held / len(lods):.0f} B a point)")
+
+
+if __name__ == '__main__':
+    main()
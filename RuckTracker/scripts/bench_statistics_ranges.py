@@ -0,0 +1,78 @@
+"""
+Aggregate one user's sessions of a month and a year, filtered with extract() and with a range
+
+The statistics endpoints used to compare extract() parts of end_time, which
+no index serves; they now filter half-open end_time ranges, which the
+(user_id, status, end_time) index does.
+
+    python scripts/bench_statistics_ranges.py [--users 20] [--sessions 10000]
+"""
+import argparse
+import random
+from datetime import datetime, timedelta
+
+import _bench
+from sqlalchemy import extract, func, insert
+
+from app import app, db
+from models import RuckSession, User
+from utils.periods import month_range, year_range
+
+
+def populate(users, sessions):
+    rng = random.Random(1)
+    first = datetime(2018, 1, 1)
+    db.session.execute(insert(User), [
+        {'username': f'user{index}', 'email': f'user{index}@example.com', 'weight_kg': 80}
+        for index in range(users)
+    ])
+    for user_id in range(1, users + 1):
+        rows = []
+        for _ in range(sessions):
+            started = first + timedelta(minutes=rng.randrange(6 * 365 * 24 * 60))
+            rows.append({
+                'user_id': user_id, 'ruck_weight_kg': 15, 'status': 'completed',
+                'start_time': started, 'end_time': started + timedelta(hours=1),
+                'duration_seconds': 3600, 'distance_km': rng.uniform(2, 12),
+                'elevation_gain_m': rng.uniform(0, 300), 'calories_burned': rng.uniform(200, 900)
+            })
+        db.session.execute(insert(RuckSession), rows)
+    db.session.commit()
+
+
+def aggregate(*conditions):
+    return (db.session.query(func.count(RuckSession.id), func.sum(RuckSession.distance_km),
+                             func.sum(RuckSession.elevation_gain_m), func.sum(RuckSession.calories_burned))
+            .filter(RuckSession.user_id == 1, RuckSession.status == 'completed', *conditions)
+            .one())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--sessions', type=int, default=10000, help='completed sessions per user')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with app.app_context():
+        populate(args.users, args.sessions)
+        print(f"SQLite, {args.users} users x {args.sessions} completed sessions, aggregating one user "
+              f"(best of {args.repeat})")
+
+        periods = {
+            'month': ((extract('year', RuckSession.end_time) == 2021, extract('month', RuckSession.end_time) == 6),
+                      month_range(2021, 6)),
+            'year': ((extract('year', RuckSession.end_time) == 2021,), year_range(2021)),
+        }
+        for name, (parts, (start, end)) in periods.items():
+            extract_seconds, by_parts = _bench.best_of(lambda: aggregate(*parts), args.repeat)
+            range_seconds, by_range = _bench.best_of(
+                lambda: aggregate(RuckSession.end_time >= start, RuckSession.end_time < end), args.repeat
+            )
+            assert by_parts[0] == by_range[0], (by_parts, by_range)
+            print(f"  {name:<6} {by_range[0]:>5} sessions  extract() {extract_seconds * 1000:6.2f} ms  "
+                  f"range {range_seconds * 1000:6.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+import os
+import tempfile
+
+# Tests run against DATABASE_URL when it is set, e.g. a PostgreSQL database,
+# and otherwise against a throwaway SQLite file that worker threads can share
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}"
+
+import pytest
+
+from app import app as flask_app, db
+from api.route_lod import route_lods
+from api.session_state import session_states
+from api.statistics_cache import InProcessCacheBackend, configure_statistics_cache
+
+
+@pytest.fixture
+def app():
+    """The application, inside an app context, with empty tables and caches"""
+    session_states.clear()
+    route_lods.clear()
+    configure_statistics_cache(InProcessCacheBackend())
+    with flask_app.app_context():
+        db.drop_all()
+        db.create_all()
+        yield flask_app
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def user(client):
+    """A user created through the API, as returned by it"""
+    response = client.post('/api/users', json={
+        'username': 'rucker', 'email': 'rucker@example.com', 'weight_kg': 80
+    })
+    assert response.status_code == 201
+    return response.get_json()['user']
@@ -0,0 +1,61 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from app import db
+
+
+@contextmanager
+def recorded_queries():
+    """
+    Record the SQL statements executed inside the block
+
+    Yields:
+        list: (statement, parameters) tuples as sent to the DBAPI cursor
+    """
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+
+def query_plan(statement, parameters):
+    """
+    The database's plan for a recorded statement, as one string
+
+    PostgreSQL plans with sequential scans disabled, so an index is chosen
+    whenever one can serve the query, even over nearly empty test tables.
+    """
+    connection = db.engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        if db.engine.dialect.name == 'postgresql':
+            cursor.execute("SET enable_seqscan = off")
+            cursor.execute(f"EXPLAIN {statement}", parameters)
+            return '\n'.join(row[0] for row in cursor.fetchall())
+        cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        return '\n'.join(row[-1] for row in cursor.fetchall())
+    finally:
+        connection.rollback()
+        connection.close()
+
+
+def count_queries(request):
+    """
+    Run a request and count the SQL statements it executes
+
+    Args:
+        request (callable): Makes the request, e.g. lambda: client.get(url)
+
+    Returns:
+        tuple: (response, number of statements)
+    """
+    with recorded_queries() as statements:
+        response = request()
+    return response, len(statements)
@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta
+
+from app import db
+from models import AppleHealthIntegration, RuckSession
+
+
+def add_completed_session(user_id, day):
+    started = datetime(2024, 3, 1, 7) + timedelta(days=day)
+    session = RuckSession(user_id=user_id, ruck_weight_kg=15, status='completed',
+                          start_time=started, end_time=started + timedelta(hours=1),
+                          duration_seconds=3600, distance_km=5.0)
+    db.session.add(session)
+    db.session.commit()
+    return session.id
+
+
+def export(client, user, after=None):
+    url = f"/api/users/{user['id']}/apple-health/sync" + (f"?after={after}" if after else '')
+    response = client.get(url)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_export_follows_commit_order_not_timestamps(client, user):
+    first = add_completed_session(user['id'], 0)
+    add_completed_session(user['id'], 1)
+    cursor = export(client, user)['next_cursor']
+
+    # An edit stamped by a worker whose clock is behind, committed after the export
+    session = db.session.get(RuckSession, first)
+    session.distance_km = 6.0
+    session.updated_at = datetime(2000, 1, 1)
+    db.session.commit()
+
+    page = export(client, user, cursor)
+    assert [workout['distance'] for workout in page['workouts']] == [6.0]
+    assert export(client, user, page['next_cursor'])['workouts'] == []
+
+
+def test_export_records_cursor_only_when_it_advances(client, user):
+    add_completed_session(user['id'], 0)
+    export(client, user)
+    assert AppleHealthIntegration.query.filter_by(user_id=user['id']).first() is None
+
+    first_cursor = export(client, user)['next_cursor']
+    add_completed_session(user['id'], 1)
+    second_cursor = export(client, user, first_cursor)['next_cursor']
+    export(client, user, second_cursor)
+    assert AppleHealthIntegration.query.filter_by(user_id=user['id']).one().export_cursor == second_cursor
+
+    # Replaying an older cursor does not move the recorded position back
+    export(client, user, first_cursor)
+    db.session.expire_all()
+    assert AppleHealthIntegration.query.filter_by(user_id=user['id']).one().export_cursor == second_cursor
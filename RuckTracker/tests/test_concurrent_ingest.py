@@ -0,0 +1,187 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import update
+
+from app import db
+from api import write_behind
+from api.rollups import check_daily_rollups
+from api.session_state import session_states
+from api.write_behind import location_buffer
+from models import LocationPoint, RuckSession
+from utils.calculations import calculate_calories
+from utils.location import calculate_distance, calculate_elevation_change
+
+
+@pytest.fixture
+def active_session(client, user):
+    response = client.post('/api/sessions', json={'user_id': user['id'], 'ruck_weight_kg': 10})
+    session_id = response.get_json()['session']['id']
+    assert client.put(f'/api/sessions/{session_id}', json={'status': 'active'}).status_code == 200
+    return session_id
+
+
+def _random_points(count, seed=4):
+    rng = random.Random(seed)
+    return [
+        {'latitude': 40 + rng.random() * 0.01, 'longitude': -105 + rng.random() * 0.01,
+         'altitude': 1600 + rng.random() * 20}
+        for _ in range(count)
+    ]
+
+
+@pytest.fixture
+def separate_workers(monkeypatch):
+    """
+    Make every request behave like a different worker
+
+    Each request rebuilds its own session state instead of sharing the
+    cached one, whose lock would otherwise serialize the whole ingest, and
+    the increments each request applies are recorded.
+    """
+    monkeypatch.setattr(session_states, 'get', lambda key: None)
+    monkeypatch.setattr(session_states, 'setdefault', lambda key, value: value)
+
+    applied = []
+    apply = write_behind.apply_session_increments
+
+    def recording_apply(session_id, increments, *args):
+        totals = apply(session_id, increments, *args)
+        if totals is not None:
+            applied.append(dict(increments))
+        return totals
+
+    monkeypatch.setattr(write_behind, 'apply_session_increments', recording_apply)
+    return applied
+
+
+def _post_all(app, session_id, points):
+    def post(point):
+        return app.test_client().post(f'/api/sessions/{session_id}/statistics', json=point).status_code
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        return list(pool.map(post, points))
+
+
+def _assert_totals_match(session_id, applied, weight_kg):
+    """Session totals and points are exactly the sum of the increments that were applied"""
+    db.session.expire_all()
+    session = db.session.get(RuckSession, session_id)
+    distance_km = sum(increments['distance_km'] for increments in applied)
+    gain_m = sum(increments['elevation_gain_m'] for increments in applied)
+    assert session.distance_km == pytest.approx(distance_km, rel=1e-9)
+    assert session.elevation_gain_m == pytest.approx(gain_m, rel=1e-9)
+    assert session.elevation_loss_m == pytest.approx(
+        sum(increments['elevation_loss_m'] for increments in applied), rel=1e-9
+    )
+    assert session.points_received == sum(increments['points_received'] for increments in applied)
+    assert LocationPoint.query.filter_by(session_id=session_id).count() == session.points_stored
+    assert session.calories_burned == pytest.approx(
+        calculate_calories(weight_kg, 10, distance_km, gain_m), rel=1e-9
+    )
+
+
+def test_parallel_posts_from_separate_workers_lose_no_increments(app, user, active_session, separate_workers):
+    points = _random_points(200)
+
+    assert set(_post_all(app, active_session, points)) == {200}
+
+    assert len(separate_workers) == len(points)
+    _assert_totals_match(active_session, separate_workers, user['weight_kg'])
+
+
+def test_completing_during_parallel_posts_keeps_rollups_exact(app, user, active_session, separate_workers):
+    points = _random_points(200, seed=5)
+
+    def complete():
+        # Complete once ingest is well under way, while posts keep arriving
+        while len(separate_workers) < 50:
+            time.sleep(0.001)
+        return app.test_client().put(f'/api/sessions/{active_session}', json={'status': 'completed'}).status_code
+
+    with ThreadPoolExecutor(max_workers=1) as completer:
+        completion = completer.submit(complete)
+        statuses = _post_all(app, active_session, points)
+        assert completion.result() == 200
+
+    assert set(statuses) == {200, 400}
+    assert statuses.count(200) == len(separate_workers)
+    _assert_totals_match(active_session, separate_workers, user['weight_kg'])
+    assert check_daily_rollups() == []
+
+
+def test_parallel_posts_with_row_locking_match_serial_recomputation(app, user, active_session, monkeypatch):
+    if db.engine.dialect.name == 'sqlite':
+        pytest.skip("SQLite ignores SELECT ... FOR UPDATE")
+    monkeypatch.setitem(app.config, 'INGEST_ROW_LOCKING', True)
+    points = _random_points(200)
+
+    assert set(_post_all(app, active_session, points)) == {200}
+
+    # Every request rebuilt its state under the row lock, so the stored
+    # points replayed one at a time in the order they were written agree
+    db.session.expire_all()
+    stored = LocationPoint.query.filter_by(session_id=active_session).order_by(LocationPoint.id).all()
+    assert len(stored) == len(points)
+    distance_km = gain_m = loss_m = 0.0
+    for previous, point in zip(stored, stored[1:]):
+        distance_km += calculate_distance((previous.latitude, previous.longitude),
+                                          (point.latitude, point.longitude))
+        gain, loss = calculate_elevation_change(previous.altitude, point.altitude)
+        gain_m += gain
+        loss_m += loss
+
+    session = db.session.get(RuckSession, active_session)
+    assert session.distance_km == pytest.approx(distance_km, rel=1e-9)
+    assert session.elevation_gain_m == pytest.approx(gain_m, rel=1e-9)
+    assert session.elevation_loss_m == pytest.approx(loss_m, rel=1e-9)
+    assert session.calories_burned == pytest.approx(
+        calculate_calories(user['weight_kg'], 10, distance_km, gain_m), rel=1e-9
+    )
+
+def _complete_elsewhere(client, session_id):
+    """Complete a session the way another worker would, without flushing this worker's buffer"""
+    enabled = location_buffer.enabled
+    location_buffer.enabled = False
+    try:
+        assert client.put(f'/api/sessions/{session_id}', json={'status': 'completed'}).status_code == 200
+    finally:
+        location_buffer.enabled = enabled
+
+
+def test_buffered_points_are_dropped_once_the_session_completed(app, client, active_session, monkeypatch):
+    monkeypatch.setattr(location_buffer, 'enabled', True)
+    assert client.post(f'/api/sessions/{active_session}/statistics',
+                       json={'latitude': 40.0, 'longitude': -105.0}).status_code == 200
+    client.post(f'/api/sessions/{active_session}/statistics', json={'latitude': 40.0, 'longitude': -105.01})
+    assert location_buffer.pending(active_session)
+
+    _complete_elsewhere(client, active_session)
+    location_buffer.flush()
+
+    assert not location_buffer.pending(active_session)
+    db.session.expire_all()
+    session = db.session.get(RuckSession, active_session)
+    assert session.distance_km == 0
+    assert LocationPoint.query.filter_by(session_id=active_session).count() == 0
+    assert check_daily_rollups() == []
+
+
+def test_cached_state_rejects_points_once_the_session_completed(app, client, active_session):
+    assert client.post(f'/api/sessions/{active_session}/statistics',
+                       json={'latitude': 40.0, 'longitude': -105.0}).status_code == 200
+    # Another worker completes the session; this one still holds its state
+    db.session.execute(update(RuckSession).where(RuckSession.id == active_session).values(status='completed'))
+    db.session.commit()
+    assert session_states.get(active_session) is not None
+
+    response = client.post(f'/api/sessions/{active_session}/statistics',
+                           json={'latitude': 40.0, 'longitude': -105.01})
+
+    assert response.status_code == 400
+    assert session_states.get(active_session) is None
+    db.session.expire_all()
+    assert db.session.get(RuckSession, active_session).distance_km == 0
+    assert LocationPoint.query.filter_by(session_id=active_session).count() == 1
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+from geopy.distance import geodesic
+
+from utils.geodesy import haversine, equirectangular, vincenty, segment_distances, cumulative_distance
+from utils.location import calculate_distance, haversine_distance, equirectangular_distance, track_distances
+
+
+@pytest.fixture(scope='module')
+def segments():
+    """Segments of 5 m to 5 km at latitudes up to 75°, in random directions"""
+    rng = np.random.default_rng(6)
+    lat1 = rng.uniform(-75, 75, 300)
+    lon1 = rng.uniform(-180, 180, 300)
+    bearings = rng.uniform(0, 360, 300)
+    lengths_km = np.exp(rng.uniform(np.log(0.005), np.log(5), 300))
+    ends = [geodesic(kilometers=length).destination((lat, lon), bearing)
+            for lat, lon, bearing, length in zip(lat1, lon1, bearings, lengths_km)]
+    lat2 = np.array([end.latitude for end in ends])
+    lon2 = np.array([end.longitude for end in ends])
+    return lat1, lon1, lat2, lon2
+
+
+def geopy_distances(lat1, lon1, lat2, lon2):
+    return np.array([geodesic((a, b), (c, d)).kilometers for a, b, c, d in zip(lat1, lon1, lat2, lon2)])
+
+
+def test_vincenty_matches_geopy_to_a_millimeter(segments):
+    np.testing.assert_allclose(vincenty(*segments), geopy_distances(*segments), rtol=0, atol=1e-6)
+
+
+def test_vincenty_long_and_antipodal_pairs():
+    lat1 = np.array([0.0, 51.5, 0.0, -33.9])
+    lon1 = np.array([0.0, -0.1, 0.0, 18.4])
+    lat2 = np.array([0.5, 40.7, 0.0, 33.9])
+    lon2 = np.array([179.7, -74.0, 0.0, -161.6])
+    np.testing.assert_allclose(vincenty(lat1, lon1, lat2, lon2),
+                               geopy_distances(lat1, lon1, lat2, lon2), rtol=0, atol=1e-6)
+
+
+def test_spherical_formulas_within_stated_error(segments):
+    reference = geopy_distances(*segments)
+    # Sphere versus ellipsoid, at most 0.56% in the utils.location table
+    assert np.max(np.abs(haversine(*segments) / reference - 1)) < 0.0057
+    # Equirectangular stays within 4e-7 of haversine up to 5 km
+    np.testing.assert_allclose(equirectangular(*segments), haversine(*segments), rtol=4e-7)
+
+
+def test_scalar_wrappers_agree_with_arrays(segments):
+    for lat1, lon1, lat2, lon2 in list(zip(*segments))[:20]:
+        point1, point2 = (lat1, lon1), (lat2, lon2)
+        assert haversine_distance(point1, point2) == pytest.approx(float(haversine(lat1, lon1, lat2, lon2)), rel=1e-12)
+        assert equirectangular_distance(point1, point2) == pytest.approx(
+            float(equirectangular(lat1, lon1, lat2, lon2)), rel=1e-12
+        )
+        assert calculate_distance(point1, point2, mode='geodesic') == pytest.approx(
+            float(vincenty(lat1, lon1, lat2, lon2)), abs=1e-6
+        )
+
+
+def test_broadcasting_one_origin():
+    distances = haversine(40.0, -105.0, np.array([40.0, 40.01, 40.02]), np.array([-105.0, -105.0, -105.0]))
+    assert distances.shape == (3,)
+    assert distances[0] == 0.0
+    assert distances[2] == pytest.approx(2 * distances[1])
+
+
+@pytest.mark.parametrize('method', ['geodesic', 'haversine', 'equirectangular'])
+def test_track_distances(method):
+    latitudes = 40 + np.arange(50) * 1e-4
+    longitudes = -105 + np.sin(np.arange(50)) * 1e-4
+    segments = segment_distances(latitudes, longitudes, method)
+    scalar = [calculate_distance((latitudes[i], longitudes[i]), (latitudes[i + 1], longitudes[i + 1]), mode=method)
+              for i in range(49)]
+    np.testing.assert_allclose(segments, scalar, rtol=1e-9, atol=1e-9)
+    np.testing.assert_allclose(track_distances(latitudes, longitudes, mode=method), segments)
+
+    cumulative = cumulative_distance(latitudes, longitudes, method)
+    assert cumulative.shape == (50,)
+    assert cumulative[0] == 0.0
+    np.testing.assert_allclose(np.diff(cumulative), segments)
+    assert cumulative[-1] == pytest.approx(segments.sum())
+
+
+def test_short_tracks():
+    assert segment_distances([], []).size == 0
+    assert segment_distances([40.0], [-105.0]).size == 0
+    assert cumulative_distance([], []).size == 0
+    np.testing.assert_array_equal(cumulative_distance([40.0], [-105.0]), [0.0])
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        track_distances([40.0, 40.1], [-105.0, -105.0], mode='flat')
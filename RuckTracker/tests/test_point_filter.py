@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from models import LocationPoint, RuckSession
+
+
+@pytest.fixture
+def active_session(client, user):
+    response = client.post('/api/sessions', json={'user_id': user['id'], 'ruck_weight_kg': 10})
+    session_id = response.get_json()['session']['id']
+    assert client.put(f'/api/sessions/{session_id}', json={'status': 'active'}).status_code == 200
+    return session_id
+
+
+def post_fix(client, session_id, seconds, latitude, longitude=-105.0):
+    """Send one client-stamped fix, as a phone does while walking"""
+    timestamp = datetime(2024, 5, 1, 7) + timedelta(seconds=seconds)
+    response = client.post(f'/api/sessions/{session_id}/statistics', json={
+        'latitude': latitude, 'longitude': longitude, 'timestamp': timestamp.isoformat() + 'Z'
+    })
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def stored_latitudes(session_id):
+    db.session.expire_all()
+    return [point.latitude for point in
+            LocationPoint.query.filter_by(session_id=session_id).order_by(LocationPoint.timestamp)]
+
+
+def test_single_fixes_recover_from_a_bad_first_fix(client, active_session):
+    # The first fix is 2 km off, so the honest fixes after it all look too fast to reach
+    post_fix(client, active_session, 0, 40.02)
+    honest = [40.0 + index * 1e-5 for index in range(20)]
+    responses = [post_fix(client, active_session, index + 1, latitude) for index, latitude in enumerate(honest)]
+
+    assert 'rejected' in responses[0]['message']
+    assert all('added' in response['message'] for response in responses[1:])
+    assert stored_latitudes(active_session) == [40.02] + honest
+    session = db.session.get(RuckSession, active_session)
+    assert session.points_received == session.points_stored == 21
+
+
+def test_single_fix_spike_is_still_rejected(client, active_session):
+    post_fix(client, active_session, 0, 40.0)
+    assert 'rejected' in post_fix(client, active_session, 1, 40.02)['message']
+    post_fix(client, active_session, 2, 40.00001)
+    post_fix(client, active_session, 3, 40.00002)
+
+    assert stored_latitudes(active_session) == [40.0, 40.00001, 40.00002]
+    session = db.session.get(RuckSession, active_session)
+    assert session.points_received == 4
+    assert session.distance_km == pytest.approx(0.0022, abs=1e-4)
+
+
+def test_filter_settings_are_read_from_app_config_per_request(app, client, active_session, monkeypatch):
+    monkeypatch.setitem(app.config, 'GPS_MAX_SPEED_MPS', 0)
+    post_fix(client, active_session, 0, 40.0)
+    assert 'added' in post_fix(client, active_session, 1, 40.02)['message']
+
+    assert stored_latitudes(active_session) == [40.0, 40.02]
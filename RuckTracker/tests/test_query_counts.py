@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta
+
+from app import db
+from models import RuckSession, SessionReview, LocationPoint
+from tests.helpers import count_queries
+
+
+def add_sessions(user_id, count, first=0):
+    """Completed, reviewed sessions with a short route each"""
+    for index in range(first, first + count):
+        started = datetime(2024, 1, 1, 7) + timedelta(days=index)
+        session = RuckSession(user_id=user_id, ruck_weight_kg=15, status='completed',
+                              start_time=started, end_time=started + timedelta(hours=1),
+                              duration_seconds=3600, distance_km=5.0)
+        db.session.add(session)
+        db.session.flush()
+        db.session.add(SessionReview(session_id=session.id, rating=4))
+        db.session.add_all(
+            LocationPoint(session_id=session.id, latitude=40 + i * 1e-4, longitude=-105,
+                          timestamp=started + timedelta(minutes=i))
+            for i in range(3)
+        )
+    db.session.commit()
+
+
+def assert_constant_query_count(client, user, url, key):
+    """The same number of statements runs for one session as for many"""
+    add_sessions(user['id'], 1)
+    client.get(url)  # First requests may create per-user rows
+    response, single = count_queries(lambda: client.get(url))
+    assert response.status_code == 200
+    assert len(response.get_json()[key]) == 1
+
+    add_sessions(user['id'], 24, first=1)
+    response, many = count_queries(lambda: client.get(url))
+    assert response.status_code == 200
+    assert len(response.get_json()[key]) == 25
+    assert many == single
+
+
+def test_session_listing_query_count(client, user):
+    assert_constant_query_count(client, user, f"/api/sessions?user_id={user['id']}", 'sessions')
+    sessions = client.get(f"/api/sessions?user_id={user['id']}").get_json()['sessions']
+    assert all(session['review']['rating'] == 4 for session in sessions)
+
+
+def test_apple_health_export_query_count(client, user):
+    assert_constant_query_count(client, user, f"/api/users/{user['id']}/apple-health/sync", 'workouts')
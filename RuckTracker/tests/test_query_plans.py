@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from models import RuckSession, LocationPoint
+from api.rollups import aggregate_daily_totals
+from api.streaming import iter_location_point_chunks
+from tests.helpers import recorded_queries, query_plan
+
+
+@pytest.fixture
+def session_with_points(app, user):
+    """A completed session of the user with a few pages of location points"""
+    started = datetime(2024, 5, 1, 7)
+    session = RuckSession(user_id=user['id'], ruck_weight_kg=15, status='completed',
+                          start_time=started, end_time=started + timedelta(hours=1))
+    db.session.add(session)
+    db.session.flush()
+    db.session.add_all(
+        LocationPoint(session_id=session.id, latitude=40 + i * 1e-5, longitude=-105,
+                      timestamp=started + timedelta(seconds=i))
+        for i in range(25)
+    )
+    db.session.commit()
+    return session.id
+
+
+def plans_of(statements, table):
+    """Plans of the recorded statements that read from table"""
+    plans = [query_plan(statement, parameters) for statement, parameters in statements
+             if f"FROM {table}" in statement]
+    assert plans, f"No query read from {table}"
+    return plans
+
+
+def test_point_pages_use_session_timestamp_index(app, session_with_points):
+    with recorded_queries() as statements:
+        chunks = list(iter_location_point_chunks(session_with_points, chunk_size=10))
+    assert sum(len(chunk) for chunk in chunks) == 25
+
+    # The first page and the keyset pages after it
+    for plan in plans_of(statements, 'location_point'):
+        assert 'ix_location_point_session_timestamp' in plan, plan
+
+
+def test_daily_aggregation_uses_status_end_time_index(app, user, session_with_points):
+    with recorded_queries() as statements:
+        totals = aggregate_daily_totals([user['id']])
+    assert len(totals) == 1
+
+    for plan in plans_of(statements, 'ruck_session'):
+        assert 'ix_ruck_session_user_status_end_time' in plan, plan
+
+
+def test_session_listing_uses_start_time_index(app, client, user, session_with_points):
+    with recorded_queries() as statements:
+        response = client.get(f"/api/sessions?user_id={user['id']}")
+    assert response.status_code == 200
+    assert len(response.get_json()['sessions']) == 1
+
+    for plan in plans_of(statements, 'ruck_session'):
+        assert 'ix_ruck_session_user_start_time' in plan, plan
+
+
+def test_session_listing_pages_seek_into_start_time_index(app, client, user):
+    """Pages after a cursor are index ranges, and sessions without a start time follow by id"""
+    started = datetime(2024, 5, 1, 7)
+    db.session.add_all(
+        RuckSession(user_id=user['id'], ruck_weight_kg=15, status='completed',
+                    start_time=started + timedelta(days=i), end_time=started + timedelta(days=i, hours=1))
+        for i in range(5)
+    )
+    db.session.add_all(RuckSession(user_id=user['id'], ruck_weight_kg=15, status='created') for _ in range(2))
+    db.session.commit()
+
+    seen, after = [], None
+    with recorded_queries() as statements:
+        while True:
+            response = client.get(f"/api/sessions?user_id={user['id']}&limit=2" + (f"&after={after}" if after else ''))
+            seen += response.get_json()['sessions']
+            after = response.get_json()['next_cursor']
+            if after is None:
+                break
+
+    assert [session['start_time'] is None for session in seen] == [False] * 5 + [True] * 2
+    assert [session['id'] for session in seen[5:]] == sorted((session['id'] for session in seen[5:]), reverse=True)
+
+    seeks = [(statement, parameters) for statement, parameters in statements
+             if 'FROM ruck_session' in statement and '(ruck_session.start_time, ruck_session.id) <' in statement]
+    assert seeks, "No page continued from a cursor"
+    for plan in (query_plan(statement, parameters) for statement, parameters in seeks):
+        assert 'ix_ruck_session_user_start_time' in plan, plan
+        if db.engine.dialect.name == 'sqlite':
+            assert 'start_time<?' in plan, plan
@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from models import RuckSession, LocationPoint
+from api.recompute import recompute_session
+
+
+@pytest.fixture
+def active_session(client, user):
+    response = client.post('/api/sessions', json={'user_id': user['id'], 'ruck_weight_kg': 10})
+    session_id = response.get_json()['session']['id']
+    assert client.put(f'/api/sessions/{session_id}', json={'status': 'active'}).status_code == 200
+    return session_id
+
+
+def test_recompute_keeps_server_stamped_track(client, active_session):
+    # A backlog uploaded point by point arrives far faster than it was walked
+    for index in range(50):
+        response = client.post(f'/api/sessions/{active_session}/statistics', json={
+            'latitude': 40 + index * 1e-4, 'longitude': -105.0, 'altitude': 1600.0 + index
+        })
+        assert response.status_code == 200
+    before = client.get(f'/api/sessions/{active_session}').get_json()['session']
+    assert before['distance_km'] > 0.5
+
+    response = client.post(f'/api/sessions/{active_session}/recompute')
+    assert response.status_code == 200
+    assert response.get_json()['changes'] == {}
+    after = response.get_json()['session']
+    for field in ('distance_km', 'elevation_gain_m', 'calories_burned'):
+        assert after[field] == pytest.approx(before[field])
+
+
+def test_recompute_treats_legacy_points_as_server_stamped(user):
+    started = datetime(2024, 5, 1, 7)
+    session = RuckSession(user_id=user['id'], ruck_weight_kg=10, status='completed',
+                          start_time=started, end_time=started + timedelta(hours=1))
+    db.session.add(session)
+    db.session.flush()
+    # One batch stamped with a single server time, before the flag was stored
+    db.session.add_all(
+        LocationPoint(session_id=session.id, latitude=40 + index * 1e-4, longitude=-105.0,
+                      timestamp=started)
+        for index in range(10)
+    )
+    db.session.commit()
+
+    recompute_session(session, user['weight_kg'])
+    assert session.distance_km == pytest.approx(0.1, rel=0.01)
+
+
+def test_recompute_drops_client_stamped_spikes(user):
+    started = datetime(2024, 5, 1, 7)
+    session = RuckSession(user_id=user['id'], ruck_weight_kg=10, status='completed',
+                          start_time=started, end_time=started + timedelta(hours=1))
+    db.session.add(session)
+    db.session.flush()
+    latitudes = [40 + index * 1e-4 for index in range(10)]
+    latitudes[5] += 0.05  # About 5.5 km away and back within seconds
+    db.session.add_all(
+        LocationPoint(session_id=session.id, latitude=latitude, longitude=-105.0,
+                      timestamp=started + timedelta(seconds=10 * index), timestamp_from_client=True)
+        for index, latitude in enumerate(latitudes)
+    )
+    db.session.commit()
+
+    recompute_session(session, user['weight_kg'])
+    assert session.distance_km == pytest.approx(0.1, rel=0.01)
@@ -0,0 +1,140 @@
+import base64
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from models import RuckSession, LocationPoint
+from utils.route_encoding import (
+    encode_polyline, decode_polyline, encode_binary, decode_binary, encode_route,
+    POLYLINE_PRECISION, BINARY_PRECISION
+)
+
+CODECS = [
+    pytest.param(encode_polyline, decode_polyline, POLYLINE_PRECISION, id='polyline'),
+    pytest.param(encode_binary, decode_binary, BINARY_PRECISION, id='binary'),
+]
+
+
+def random_route(count=500, seed=16):
+    """A wandering track with a few gaps in altitude and time"""
+    rng = random.Random(seed)
+    latitude, longitude, altitude = -0.5, 179.0, 1600.0
+    timestamp = datetime(2024, 5, 1, 7, 0, 0, 123456)
+    points = []
+    for index in range(count):
+        latitude += rng.uniform(-1e-4, 1e-4)
+        longitude += rng.uniform(-1e-4, 1e-4)
+        altitude += rng.uniform(-2, 2)
+        timestamp += timedelta(seconds=rng.uniform(0.5, 5))
+        points.append((
+            latitude,
+            longitude,
+            None if index % 7 == 3 else altitude,
+            None if index % 11 == 5 else timestamp
+        ))
+    return points
+
+
+def assert_round_trip(points, decoded, precision):
+    assert len(decoded) == len(points)
+    for (latitude, longitude, altitude, timestamp), point in zip(points, decoded):
+        assert point['latitude'] == pytest.approx(latitude, abs=0.5 / precision + 1e-12)
+        assert point['longitude'] == pytest.approx(longitude, abs=0.5 / precision + 1e-12)
+        if altitude is None:
+            assert point['altitude'] is None
+        else:
+            assert point['altitude'] == pytest.approx(altitude, abs=0.05 + 1e-9)
+        if timestamp is None:
+            assert point['timestamp'] is None
+        else:
+            # Times keep whole milliseconds
+            assert point['timestamp'] == timestamp.replace(
+                microsecond=timestamp.microsecond // 1000 * 1000
+            ).isoformat()
+
+
+@pytest.mark.parametrize('encode, decode, precision', CODECS)
+def test_round_trip(encode, decode, precision):
+    points = random_route()
+    assert_round_trip(points, decode(encode(points)), precision)
+
+
+@pytest.mark.parametrize('encode, decode, precision', CODECS)
+def test_round_trip_missing_values_and_extremes(encode, decode, precision):
+    points = [
+        (0.0, 0.0, None, None),
+        (89.99999, -179.99999, -412.3, datetime(1969, 12, 31, 23, 59, 59)),
+        (-89.99999, 179.99999, None, datetime(2100, 1, 1)),
+        (45.0, 7.0, 8848.9, None),
+        (45.0, 7.0, 8848.9, datetime(2100, 1, 1)),
+    ]
+    assert_round_trip(points, decode(encode(points)), precision)
+
+
+@pytest.mark.parametrize('encode, decode, precision', CODECS)
+def test_empty_route(encode, decode, precision):
+    assert decode(encode([])) == []
+
+
+@pytest.mark.parametrize('encode, decode, precision', CODECS)
+def test_truncated_route_is_rejected(encode, decode, precision):
+    encoded = encode(random_route(10))
+    with pytest.raises(ValueError):
+        decode(encoded[:-1])
+
+
+def test_binary_requires_version():
+    with pytest.raises(ValueError):
+        decode_binary(b'')
+    with pytest.raises(ValueError):
+        decode_binary(b'\x02' + encode_binary(random_route(3))[1:])
+
+
+def test_encodings_are_smaller_than_json():
+    points = random_route(1000)
+    json_size = len(str([{'latitude': p[0], 'longitude': p[1], 'altitude': p[2],
+                          'timestamp': p[3] and p[3].isoformat()} for p in points]))
+    assert len(encode_polyline(points)) < json_size / 4
+    assert len(encode_binary(points)) < len(encode_polyline(points))
+
+
+def test_encode_route():
+    points = random_route(20)
+    polyline = encode_route(points, 'polyline')
+    assert polyline['precision'] == POLYLINE_PRECISION
+    assert_round_trip(points, decode_polyline(polyline['data']), POLYLINE_PRECISION)
+
+    binary = encode_route(points, 'binary')
+    assert binary['precision'] == BINARY_PRECISION
+    assert_round_trip(points, decode_binary(base64.b64decode(binary['data'])), BINARY_PRECISION)
+
+    with pytest.raises(ValueError):
+        encode_route(points, 'gpx')
+
+
+def test_session_route_formats(client, user):
+    started = datetime(2024, 5, 1, 7)
+    session = RuckSession(user_id=user['id'], ruck_weight_kg=15, status='completed',
+                          start_time=started, end_time=started + timedelta(hours=1))
+    db.session.add(session)
+    db.session.flush()
+    points = random_route(50)
+    db.session.add_all(
+        LocationPoint(session_id=session.id, latitude=latitude, longitude=longitude,
+                      altitude=altitude, timestamp=timestamp or started)
+        for latitude, longitude, altitude, timestamp in points
+    )
+    db.session.commit()
+    stored = [(row.latitude, row.longitude, row.altitude, row.timestamp) for row in
+              LocationPoint.query.filter_by(session_id=session.id)
+              .order_by(LocationPoint.timestamp, LocationPoint.id)]
+
+    route = client.get(f"/api/sessions/{session.id}?format=polyline").get_json()['session']['route']
+    assert_round_trip(stored, decode_polyline(route['data']), POLYLINE_PRECISION)
+
+    route = client.get(f"/api/sessions/{session.id}?format=binary").get_json()['session']['route']
+    assert_round_trip(stored, decode_binary(base64.b64decode(route['data'])), BINARY_PRECISION)
+
+    assert client.get(f"/api/sessions/{session.id}?format=gpx").status_code == 400
@@ -0,0 +1,25 @@
+from datetime import date
+
+from app import db
+from api.rollups import apply_rollup_changes
+from api.statistics_cache import InProcessCacheBackend, StatisticsCache
+
+
+def test_change_committed_by_another_worker_invalidates_every_worker(app, user):
+    # Two workers, each with a cache backend of its own
+    worker_a = StatisticsCache(InProcessCacheBackend())
+    worker_b = StatisticsCache(InProcessCacheBackend())
+    assert worker_a.get_or_compute(user['id'], {}, lambda: {'sessions': 0}) == {'sessions': 0}
+    assert worker_b.get_or_compute(user['id'], {}, lambda: {'sessions': 0}) == {'sessions': 0}
+    assert worker_a.get_or_compute(user['id'], {}, lambda: {'sessions': 1}) == {'sessions': 0}
+
+    # Worker B completes a session
+    contribution = (user['id'], date(2024, 5, 1), {
+        'distance_km': 5.0, 'elevation_gain_m': 0.0, 'calories_burned': 300.0,
+        'duration_seconds': 3600, 'session_count': 1
+    })
+    apply_rollup_changes([(None, contribution)])
+    db.session.commit()
+
+    assert worker_a.get_or_compute(user['id'], {}, lambda: {'sessions': 1}) == {'sessions': 1}
+    assert worker_b.get_or_compute(user['id'], {}, lambda: {'sessions': 1}) == {'sessions': 1}
@@ -0,0 +1,122 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Thread-safe, size-bounded LRU cache with an optional time-to-live.
+
+    Entries beyond max_size evict the least recently used key. Entries older
+    than ttl_seconds are treated as misses and dropped on access. With a weigh
+    function, entries are also evicted while their total weight exceeds
+    max_weight, so caches of values that vary widely in size can be bounded
+    by what they hold rather than how many values there are.
+    """
+
+    def __init__(self, max_size=1024, ttl_seconds=None, max_weight=None, weigh=None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.max_weight = max_weight
+        self.weigh = weigh
+        self.weight = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Counters for monitoring
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, stored_at, _ = entry
+            if self.ttl_seconds is not None and time.monotonic() - stored_at > self.ttl_seconds:
+                self._remove(key)
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """Store value under key, evicting the least recently used entries if full"""
+        with self._lock:
+            self._store(key, value)
+
+    def setdefault(self, key, value):
+        """Store value unless a live entry exists, returning whichever value is cached"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (self.ttl_seconds is None
+                                      or time.monotonic() - entry[1] <= self.ttl_seconds):
+                self._entries.move_to_end(key)
+                return entry[0]
+
+            self._store(key, value)
+            return value
+
+    def _store(self, key, value):
+        """Insert or refresh an entry; the caller must hold the lock"""
+        self._remove(key)
+        weight = self.weigh(value) if self.weigh is not None else 0
+        if self.max_weight is not None and weight > self.max_weight:
+            # Caching it would evict everything else and then itself
+            return
+        self._entries[key] = (value, time.monotonic(), weight)
+        self.weight += weight
+        while self._entries and (len(self._entries) > self.max_size
+                                 or (self.max_weight is not None and self.weight > self.max_weight)):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key):
+        """Remove key if present and return its entry; the caller must hold the lock"""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.weight -= entry[2]
+        return entry
+
+    def pop(self, key, default=None):
+        """Remove key and return its value, or default if it was not cached"""
+        with self._lock:
+            entry = self._remove(key)
+            return entry[0] if entry is not None else default
+
+    def discard_where(self, predicate):
+        """Remove every entry whose value matches predicate, returning the count removed"""
+        with self._lock:
+            keys = [key for key, (value, _, _) in self._entries.items() if predicate(value)]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self):
+        """Remove all entries"""
+        with self._lock:
+            self._entries.clear()
+            self.weight = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Return cache size and hit/miss/eviction counters"""
+        stats = {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
+        if self.weigh is not None:
+            stats['weight'] = self.weight
+            stats['max_weight'] = self.max_weight
+        return stats
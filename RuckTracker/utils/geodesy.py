@@ -0,0 +1,171 @@
+import numpy as np
+from geopy.distance import geodesic
+
+# Mean earth radius in kilometers, used by the spherical formulas
+EARTH_RADIUS_KM = 6371.0
+
+# WGS-84 ellipsoid
+WGS84_A = 6378.137  # Semi-major axis in kilometers
+WGS84_F = 1 / 298.257223563  # Flattening
+WGS84_B = (1 - WGS84_F) * WGS84_A  # Semi-minor axis in kilometers
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """
+    Great circle distance between arrays of points using the haversine formula.
+
+    Inputs broadcast against each other, so a single origin can be compared
+    with an array of destinations. Error versus the WGS-84 ellipsoid is up to
+    about 0.5% depending on latitude and bearing.
+
+    Args:
+        lat1, lon1 (array-like): Latitudes and longitudes of the first points in degrees
+        lat2, lon2 (array-like): Latitudes and longitudes of the second points in degrees
+
+    Returns:
+        numpy.ndarray: Distances in kilometers
+    """
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def equirectangular(lat1, lon1, lat2, lon2):
+    """
+    Flat-earth approximation of the distance between arrays of nearby points.
+
+    Projects each pair onto a plane at their mean latitude. For segments up
+    to a few kilometers it matches haversine to better than 1e-6 relative,
+    so its error versus the ellipsoid is the same spherical error.
+
+    Args:
+        lat1, lon1 (array-like): Latitudes and longitudes of the first points in degrees
+        lat2, lon2 (array-like): Latitudes and longitudes of the second points in degrees
+
+    Returns:
+        numpy.ndarray: Distances in kilometers
+    """
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+
+    x = (lon2 - lon1) * np.cos((lat1 + lat2) / 2)
+    y = lat2 - lat1
+    return EARTH_RADIUS_KM * np.hypot(x, y)
+
+
+def vincenty(lat1, lon1, lat2, lon2, max_iterations=200, tolerance=1e-12):
+    """
+    Ellipsoidal distance between arrays of points using Vincenty's inverse formula.
+
+    Agrees with geopy's geodesic (Karney's algorithm) to well under a
+    millimeter. Vincenty's iteration does not converge for nearly antipodal
+    points; those pairs are handed to geopy individually.
+
+    Args:
+        lat1, lon1 (array-like): Latitudes and longitudes of the first points in degrees
+        lat2, lon2 (array-like): Latitudes and longitudes of the second points in degrees
+        max_iterations (int): Iteration limit before falling back to geopy
+        tolerance (float): Convergence threshold on the longitude on the auxiliary sphere
+
+    Returns:
+        numpy.ndarray: Distances in kilometers
+    """
+    lat1, lon1, lat2, lon2 = np.broadcast_arrays(
+        *(np.asarray(value, dtype=float) for value in (lat1, lon1, lat2, lon2))
+    )
+    shape = lat1.shape
+    lat1, lon1, lat2, lon2 = (value.ravel() for value in (lat1, lon1, lat2, lon2))
+
+    U1 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat1)))
+    U2 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat2)))
+    sin_u1, cos_u1 = np.sin(U1), np.cos(U1)
+    sin_u2, cos_u2 = np.sin(U2), np.cos(U2)
+
+    L = np.radians(lon2 - lon1)
+    lam = L.copy()
+    converged = np.zeros(L.shape, dtype=bool)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for _ in range(max_iterations):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.hypot(cos_u2 * sin_lam, cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam)
+            cos_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+
+            # Coincident points have sin_sigma == 0
+            sin_alpha = np.where(sin_sigma == 0, 0.0, cos_u1 * cos_u2 * sin_lam / sin_sigma)
+            cos_sq_alpha = 1 - sin_alpha ** 2
+
+            # Equatorial lines have cos_sq_alpha == 0
+            cos_2sigma_m = np.where(cos_sq_alpha == 0, 0.0, cos_sigma - 2 * sin_u1 * sin_u2 / cos_sq_alpha)
+
+            C = WGS84_F / 16 * cos_sq_alpha * (4 + WGS84_F * (4 - 3 * cos_sq_alpha))
+            lam_prev = lam
+            lam = L + (1 - C) * WGS84_F * sin_alpha * (
+                sigma + C * sin_sigma * (cos_2sigma_m + C * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2))
+            )
+
+            converged = np.abs(lam - lam_prev) <= tolerance
+            if converged.all():
+                break
+
+    u_sq = cos_sq_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+    A = 1 + u_sq / 16384 * (4096 + u_sq * (-768 + u_sq * (320 - 175 * u_sq)))
+    B = u_sq / 1024 * (256 + u_sq * (-128 + u_sq * (74 - 47 * u_sq)))
+    delta_sigma = B * sin_sigma * (cos_2sigma_m + B / 4 * (
+        cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)
+        - B / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)
+    ))
+    distances = WGS84_B * A * (sigma - delta_sigma)
+
+    # Nearly antipodal pairs: fall back to geopy's geodesic, which always converges
+    for index in np.flatnonzero(~converged):
+        distances[index] = geodesic((lat1[index], lon1[index]), (lat2[index], lon2[index])).kilometers
+
+    return distances.reshape(shape)
+
+
+# Distance functions usable on whole tracks, keyed by distance mode
+DISTANCE_FUNCTIONS = {
+    'geodesic': vincenty,
+    'vincenty': vincenty,
+    'haversine': haversine,
+    'equirectangular': equirectangular,
+}
+
+
+def segment_distances(latitudes, longitudes, method='geodesic'):
+    """
+    Distances between consecutive points of a track.
+
+    Args:
+        latitudes (array-like): Track latitudes in degrees, in order
+        longitudes (array-like): Track longitudes in degrees, in order
+        method (str): One of DISTANCE_FUNCTIONS
+
+    Returns:
+        numpy.ndarray: n - 1 segment distances in kilometers
+    """
+    latitudes = np.asarray(latitudes, dtype=float)
+    longitudes = np.asarray(longitudes, dtype=float)
+    if latitudes.size < 2:
+        return np.zeros(0)
+
+    distance = DISTANCE_FUNCTIONS[method]
+    return distance(latitudes[:-1], longitudes[:-1], latitudes[1:], longitudes[1:])
+
+
+def cumulative_distance(latitudes, longitudes, method='geodesic'):
+    """
+    Distance travelled from the start of a track to each of its points.
+
+    Args:
+        latitudes (array-like): Track latitudes in degrees, in order
+        longitudes (array-like): Track longitudes in degrees, in order
+        method (str): One of DISTANCE_FUNCTIONS
+
+    Returns:
+        numpy.ndarray: n cumulative distances in kilometers, starting at 0
+    """
+    segments = segment_distances(latitudes, longitudes, method)
+    return np.concatenate(([0.0], np.cumsum(segments))) if np.size(latitudes) else np.zeros(0)
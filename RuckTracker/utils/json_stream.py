@@ -0,0 +1,135 @@
+import codecs
+import json
+import re
+
+_WHITESPACE = ' \t\n\r'
+
+# Characters that can continue a JSON number
+_NUMBER_TAIL = re.compile(r'[0-9eE.+-]*')
+
+
+class JSONStreamReader:
+    """
+    Read JSON values one at a time from a byte stream.
+
+    Only the unread tail of the input is buffered. Each value is decoded
+    with json.JSONDecoder.raw_decode once enough of it has arrived, so
+    memory is bounded by the largest single value rather than the document.
+    """
+
+    def __init__(self, stream, read_size=65536):
+        self.stream = stream
+        self.read_size = read_size
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self, at_least=0):
+        """Append one more read to the buffer; returns False at the end of the stream"""
+        if self._eof:
+            return False
+        data = self.stream.read(max(self.read_size, at_least))
+        self._eof = not data
+        self._buffer = self._buffer[self._pos:] + self._utf8.decode(data or b'', final=self._eof)
+        self._pos = 0
+        return bool(data)
+
+    def _peek(self):
+        """Skip whitespace and return the next character, or '' at the end of the input"""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char):
+        """Consume the next non-whitespace character, which must be char"""
+        found = self._peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} but found {found or 'end of input'!r}")
+        self._pos += 1
+
+    def read_value(self):
+        """
+        Decode the next complete JSON value.
+
+        Returns:
+            object: The decoded value
+
+        Raises:
+            ValueError: If the input is not valid JSON or ends inside the value
+        """
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError as e:
+                # Read as much again as is buffered, so retries stay linear in the value size
+                if self._fill(len(self._buffer) - self._pos):
+                    continue
+                raise ValueError(f"Invalid JSON: {e.msg}") from None
+
+            # A number is only complete once a character that cannot continue it has arrived
+            if (isinstance(value, (int, float)) and not isinstance(value, bool)
+                    and _NUMBER_TAIL.match(self._buffer, end).end() == len(self._buffer)
+                    and self._fill()):
+                continue
+            self._pos = end
+            return value
+
+    def iter_array(self):
+        """
+        Yield the elements of the JSON array that comes next, one at a time
+
+        Raises:
+            ValueError: If the input is not a well-formed array
+        """
+        self.expect('[')
+        if self._peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield self.read_value()
+            if self._peek() == ']':
+                self._pos += 1
+                return
+            self.expect(',')
+
+    def iter_object_array(self, key):
+        """
+        Yield the elements of one array-valued key of the top-level JSON object
+
+        Other keys are decoded and discarded in passing.
+
+        Args:
+            key (str): Key of the array to stream
+
+        Returns:
+            generator: Array elements in order; nothing if the key is absent
+
+        Raises:
+            ValueError: If the input is not a JSON object or key is not an array
+        """
+        self.expect('{')
+        if self._peek() == '}':
+            return
+        while True:
+            name = self.read_value()
+            if not isinstance(name, str):
+                raise ValueError("Expected an object key")
+            self.expect(':')
+            if name == key:
+                if self._peek() != '[':
+                    raise ValueError(f"{key} must be an array")
+                yield from self.iter_array()
+            else:
+                self.read_value()
+
+            if self._peek() == '}':
+                self._pos += 1
+                return
+            self.expect(',')
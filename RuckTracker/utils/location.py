@@ -1,20 +1,106 @@
 import logging
-from math import radians, sin, cos, sqrt, atan2
+import statistics
+from collections import deque
+from datetime import timedelta
+from math import radians, sin, cos, sqrt, atan2, hypot
+import numpy as np
+from flask import current_app, has_app_context
 from geopy.distance import geodesic
 
+from utils.geodesy import EARTH_RADIUS_KM, segment_distances
+
 logger = logging.getLogger(__name__)
 
-def calculate_distance(point1, point2):
+# Distance engines, selectable per deployment with DISTANCE_MODE or per call.
+#
+# Measured maximum relative error versus the WGS-84 geodesic, over random
+# bearings, for segments of 5 m to 5 km:
+#
+#   latitude          0°      30°     45°     60°     75°
+#   haversine         0.56%   0.31%   0.28%   0.36%   0.42%
+#   equirectangular   0.56%   0.31%   0.28%   0.36%   0.42%
+#
+# The error is the sphere-versus-ellipsoid difference and does not grow with
+# segment length; equirectangular stays within 4e-7 of haversine up to 5 km.
+# Measured cost per scalar call: geodesic ~91 µs, haversine ~1.0 µs,
+# equirectangular ~0.6 µs. Per array (utils.geodesy), in points per second:
+# geodesic (Vincenty) ~4.4M, haversine ~23M, equirectangular ~29M.
+# scripts/bench_distance_modes.py regenerates these figures.
+DISTANCE_MODES = ('geodesic', 'haversine', 'equirectangular')
+
+# Elevation filtering, selectable per deployment. Smoothing runs over a trailing
+# window of ELEVATION_WINDOW altitudes, so live ingest and recomputation see the
+# same values; hysteresis then ignores reversals smaller than ELEVATION_HYSTERESIS_M.
+# With smoothing 'none' and no hysteresis, every raw altitude delta is summed as before.
+ELEVATION_SMOOTHING_METHODS = ('none', 'median', 'savgol')
+
+# GPS quality filter applied to ingested and recomputed tracks (GPS_MAX_ACCURACY_M,
+# GPS_MAX_SPEED_MPS); 0 disables a check. Fixes with unknown accuracy or time are
+# never rejected by the matching check.
+
+# Defaults of the settings above. Deployments set them in the app config (see
+# app.py), which is read on every call; the defaults apply outside an app context.
+LOCATION_SETTINGS = {
+    'DISTANCE_MODE': 'geodesic',
+    'ELEVATION_SMOOTHING': 'none',
+    'ELEVATION_WINDOW': 5,
+    'ELEVATION_HYSTERESIS_M': 0.0,
+    'GPS_MAX_ACCURACY_M': 50.0,
+    'GPS_MAX_SPEED_MPS': 12.0,
+}
+
+
+def location_setting(name):
+    """
+    Current value of a distance, elevation or GPS filter setting.
+    
+    Args:
+        name (str): One of the LOCATION_SETTINGS keys
+        
+    Returns:
+        The value in current_app.config, or the default outside an app context
+    """
+    if has_app_context():
+        return current_app.config.get(name, LOCATION_SETTINGS[name])
+    return LOCATION_SETTINGS[name]
+
+
+def check_location_settings(config):
+    """
+    Reject unknown distance and elevation settings at startup.
+    
+    Raises:
+        ValueError: If a setting in config is invalid
+    """
+    if config["DISTANCE_MODE"] not in DISTANCE_MODES:
+        raise ValueError(f"DISTANCE_MODE must be one of {', '.join(DISTANCE_MODES)}")
+    if config["ELEVATION_SMOOTHING"] not in ELEVATION_SMOOTHING_METHODS:
+        raise ValueError(f"ELEVATION_SMOOTHING must be one of {', '.join(ELEVATION_SMOOTHING_METHODS)}")
+    if config["ELEVATION_WINDOW"] < 1:
+        raise ValueError("ELEVATION_WINDOW must be at least 1")
+
+
+def calculate_distance(point1, point2, mode=None):
     """
     Calculate the distance between two geographical points.
     
     Args:
         point1 (tuple): (latitude, longitude) of first point
         point2 (tuple): (latitude, longitude) of second point
+        mode (str): One of DISTANCE_MODES, defaults to DISTANCE_MODE
         
     Returns:
         float: Distance in kilometers
     """
+    mode = mode or location_setting('DISTANCE_MODE')
+    
+    if mode == 'haversine':
+        return haversine_distance(point1, point2)
+    if mode == 'equirectangular':
+        return equirectangular_distance(point1, point2)
+    if mode != 'geodesic':
+        raise ValueError(f"Unknown distance mode: {mode}")
+    
     try:
         # Use geopy's geodesic calculation for accurate distance
         distance = geodesic(point1, point2).kilometers
@@ -25,6 +111,25 @@ def calculate_distance(point1, point2):
         return haversine_distance(point1, point2)
 
 
+def track_distances(latitudes, longitudes, mode=None):
+    """
+    Calculate the distances between consecutive points of a track in one call.
+    
+    Args:
+        latitudes (array-like): Track latitudes in degrees, in order
+        longitudes (array-like): Track longitudes in degrees, in order
+        mode (str): One of DISTANCE_MODES, defaults to DISTANCE_MODE
+        
+    Returns:
+        numpy.ndarray: n - 1 segment distances in kilometers
+    """
+    mode = mode or location_setting('DISTANCE_MODE')
+    if mode not in DISTANCE_MODES:
+        raise ValueError(f"Unknown distance mode: {mode}")
+    
+    return segment_distances(latitudes, longitudes, method=mode)
+
+
 def haversine_distance(point1, point2):
     """
     Calculate the great circle distance between two points 
@@ -37,9 +142,6 @@ def haversine_distance(point1, point2):
     Returns:
         float: Distance in kilometers
     """
-    # Earth radius in kilometers
-    R = 6371.0
-    
     lat1, lon1 = point1
     lat2, lon2 = point2
     
@@ -51,11 +153,65 @@ def haversine_distance(point1, point2):
     dlat = lat2 - lat1
     a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
     c = 2 * atan2(sqrt(a), sqrt(1-a))
-    distance = R * c
+    distance = EARTH_RADIUS_KM * c
     
     return distance
 
 
+def equirectangular_distance(point1, point2):
+    """
+    Calculate the distance between two nearby points with a flat-earth
+    (equirectangular) approximation.
+    
+    Intended for consecutive GPS fixes a few meters apart, where it is as
+    accurate as haversine at a fraction of the cost.
+    
+    Args:
+        point1 (tuple): (latitude, longitude) of first point
+        point2 (tuple): (latitude, longitude) of second point
+        
+    Returns:
+        float: Distance in kilometers
+    """
+    lat1, lon1 = point1
+    lat2, lon2 = point2
+    
+    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
+    
+    x = (lon2 - lon1) * cos((lat1 + lat2) / 2)
+    y = lat2 - lat1
+    
+    return EARTH_RADIUS_KM * hypot(x, y)
+
+
+def within_deadband(kept, point, meters, seconds):
+    """
+    Check whether a GPS fix is close enough to the last stored one to skip storing it.
+    
+    Args:
+        kept (tuple): (latitude, longitude, altitude, timestamp) of the last stored point
+        point (tuple): (latitude, longitude, altitude, timestamp) of the new point
+        meters (float): Largest horizontal and vertical movement inside the deadband
+        seconds (float): Longest time after the stored point inside the deadband
+        
+    Returns:
+        bool: True if the point is inside the deadband
+    """
+    kept_latitude, kept_longitude, kept_altitude, kept_timestamp = kept
+    latitude, longitude, altitude, timestamp = point
+    
+    # Keep a point at least every `seconds`, so pauses still show up in the track
+    if kept_timestamp is None or timestamp is None:
+        return False
+    if not timedelta(0) <= timestamp - kept_timestamp < timedelta(seconds=seconds):
+        return False
+    
+    if kept_altitude is not None and altitude is not None and abs(altitude - kept_altitude) > meters:
+        return False
+    
+    return equirectangular_distance((kept_latitude, kept_longitude), (latitude, longitude)) * 1000 <= meters
+
+
 def calculate_elevation_change(altitude1, altitude2):
     """
     Calculate elevation gain and loss between two altitude points.
@@ -78,25 +234,270 @@ def calculate_elevation_change(altitude1, altitude2):
         return 0, abs(elevation_difference)  # Loss
 
 
-def filter_inaccurate_points(points, accuracy_threshold=10):
+def elevation_filter_enabled(smoothing=None, hysteresis_m=None):
+    """
+    Check whether elevation is filtered rather than summed from raw deltas.
+    
+    Args:
+        smoothing (str): One of ELEVATION_SMOOTHING_METHODS, defaults to ELEVATION_SMOOTHING
+        hysteresis_m (float): Hysteresis threshold, defaults to ELEVATION_HYSTERESIS_M
+        
+    Returns:
+        bool: True if smoothing or hysteresis is configured
+    """
+    smoothing = smoothing or location_setting('ELEVATION_SMOOTHING')
+    hysteresis_m = location_setting('ELEVATION_HYSTERESIS_M') if hysteresis_m is None else hysteresis_m
+    return smoothing != 'none' or hysteresis_m > 0
+
+
+def savgol_coefficients(window, polyorder=2):
+    """
+    Weights of a trailing Savitzky-Golay filter.
+    
+    Fits a polynomial to the last `window` samples by least squares and
+    evaluates it at the newest sample, so the filter needs no future points.
+    
+    Args:
+        window (int): Number of samples in the fit
+        polyorder (int): Polynomial degree, reduced for short windows
+        
+    Returns:
+        numpy.ndarray: `window` weights, oldest sample first
+    """
+    positions = np.arange(-(window - 1), 1, dtype=float)
+    design = np.vander(positions, min(polyorder, window - 1) + 1, increasing=True)
+    # Row 0 of the pseudo-inverse gives the fitted value at position 0
+    return np.linalg.pinv(design)[0]
+
+
+def smooth_altitudes(altitudes, smoothing=None, window=None):
+    """
+    Smooth a sequence of altitudes with a trailing window.
+    
+    The sequence is padded at the front with its first altitude, so every
+    output uses a full window, exactly as the incremental ElevationTracker does.
+    
+    Args:
+        altitudes (array-like): Altitudes in meters, without missing values
+        smoothing (str): One of ELEVATION_SMOOTHING_METHODS, defaults to ELEVATION_SMOOTHING
+        window (int): Window length, defaults to ELEVATION_WINDOW
+        
+    Returns:
+        numpy.ndarray: Smoothed altitudes, one per input
+    """
+    smoothing = smoothing or location_setting('ELEVATION_SMOOTHING')
+    window = window or location_setting('ELEVATION_WINDOW')
+    altitudes = np.asarray(altitudes, dtype=float)
+    if smoothing == 'none' or altitudes.size == 0 or window == 1:
+        return altitudes
+    
+    padded = np.concatenate((np.full(window - 1, altitudes[0]), altitudes))
+    windows = np.lib.stride_tricks.sliding_window_view(padded, window)
+    if smoothing == 'median':
+        return np.median(windows, axis=1)
+    if smoothing == 'savgol':
+        return windows @ savgol_coefficients(window)
+    raise ValueError(f"Unknown elevation smoothing: {smoothing}")
+
+
+def _hysteresis_changes(altitudes, threshold, anchor=None):
+    """Sum rises and falls that move at least `threshold` away from the last counted altitude."""
+    gain, loss = 0.0, 0.0
+    for altitude in altitudes:
+        if anchor is None:
+            anchor = altitude
+        elif altitude - anchor >= threshold:
+            gain += altitude - anchor
+            anchor = altitude
+        elif anchor - altitude >= threshold:
+            loss += anchor - altitude
+            anchor = altitude
+    return gain, loss, anchor
+
+
+def elevation_changes(altitudes, smoothing=None, window=None, hysteresis_m=None):
+    """
+    Calculate total elevation gain and loss of a track in one pass.
+    
+    Missing altitudes are skipped. Smoothing is vectorized; the hysteresis
+    scan is a single loop over the smoothed values.
+    
+    Args:
+        altitudes (array-like): Altitudes in meters, NaN where missing
+        smoothing (str): One of ELEVATION_SMOOTHING_METHODS, defaults to ELEVATION_SMOOTHING
+        window (int): Smoothing window, defaults to ELEVATION_WINDOW
+        hysteresis_m (float): Smallest counted change, defaults to ELEVATION_HYSTERESIS_M
+        
+    Returns:
+        tuple: (elevation_gain, elevation_loss) in meters
+    """
+    hysteresis_m = location_setting('ELEVATION_HYSTERESIS_M') if hysteresis_m is None else hysteresis_m
+    altitudes = np.asarray(altitudes, dtype=float)
+    altitudes = altitudes[~np.isnan(altitudes)]
+    smoothed = smooth_altitudes(altitudes, smoothing, window)
+    
+    if not hysteresis_m:
+        steps = np.diff(smoothed)
+        return float(steps[steps > 0].sum()), float(-steps[steps < 0].sum())
+    
+    gain, loss, _ = _hysteresis_changes(smoothed.tolist(), hysteresis_m)
+    return gain, loss
+
+
+class ElevationTracker:
+    """
+    Incremental form of elevation_changes for live ingest.
+    
+    Keeps a ring buffer of the last `window` altitudes and the hysteresis
+    anchor, so each new altitude costs one window computation. Feeding a
+    track point by point gives the same totals as elevation_changes on the
+    whole track.
     """
-    Filter out inaccurate GPS points.
+    
+    __slots__ = ('smoothing', 'window', 'hysteresis_m', 'coefficients', 'recent', 'last', 'anchor')
+    
+    def __init__(self, smoothing=None, window=None, hysteresis_m=None):
+        self.smoothing = smoothing or location_setting('ELEVATION_SMOOTHING')
+        self.window = window or location_setting('ELEVATION_WINDOW')
+        self.hysteresis_m = location_setting('ELEVATION_HYSTERESIS_M') if hysteresis_m is None else hysteresis_m
+        self.coefficients = (savgol_coefficients(self.window).tolist()
+                             if self.smoothing == 'savgol' else None)
+        self.recent = deque(maxlen=self.window)
+        self.last = None  # Last smoothed altitude
+        self.anchor = None  # Last altitude counted by the hysteresis
+    
+    @classmethod
+    def resume(cls, altitudes, **kwargs):
+        """
+        Rebuild a tracker from a session's most recent stored altitudes.
+        
+        Args:
+            altitudes (list): Up to `window` most recent altitudes, oldest first
+            
+        Returns:
+            ElevationTracker: Tracker whose next add() continues the track
+        """
+        tracker = cls(**kwargs)
+        for altitude in altitudes:
+            tracker.add(altitude)
+        # Changes already counted before the restart must not be counted again
+        tracker.anchor = tracker.last
+        return tracker
+    
+    def copy(self):
+        """Return an independent tracker in the same state, to advance speculatively"""
+        tracker = ElevationTracker(self.smoothing, self.window, self.hysteresis_m)
+        tracker.recent.extend(self.recent)
+        tracker.last, tracker.anchor = self.last, self.anchor
+        return tracker
+    
+    def _smoothed(self):
+        if self.smoothing == 'median':
+            return statistics.median(self.recent)
+        if self.smoothing == 'savgol':
+            return sum(weight * altitude for weight, altitude in zip(self.coefficients, self.recent))
+        return self.recent[-1]
+    
+    def add(self, altitude):
+        """
+        Add the next altitude of the track.
+        
+        Args:
+            altitude (float): Altitude in meters, or None if missing
+            
+        Returns:
+            tuple: (elevation_gain, elevation_loss) in meters contributed by this point
+        """
+        if altitude is None:
+            return 0.0, 0.0
+        
+        if not self.recent:
+            # Same front padding as smooth_altitudes
+            self.recent.extend([altitude] * (self.window - 1))
+        self.recent.append(altitude)
+        smoothed = self._smoothed()
+        
+        if self.hysteresis_m:
+            gain, loss, self.anchor = _hysteresis_changes([smoothed], self.hysteresis_m, self.anchor)
+        else:
+            step = smoothed - self.last if self.last is not None else 0.0
+            gain, loss = max(step, 0.0), max(-step, 0.0)
+        
+        self.last = smoothed
+        return gain, loss
+
+
+def filter_inaccurate_points(latitudes, longitudes, timestamps, horizontal_accuracy,
+                             accuracy_threshold=None, max_speed_mps=None, previous=None):
+    """
+    Find GPS fixes to reject, as a vectorized mask over a track.
+    
+    A fix is rejected if its horizontal accuracy is worse than
+    accuracy_threshold, if it repeats the timestamp of the previous kept fix,
+    or if it is a spike: reaching it from the previous kept fix and leaving
+    it for the next one both need more than max_speed_mps. The last fix
+    only needs the first jump, as nothing after it can vouch for it. A jump
+    followed by consistent fixes is kept as a real relocation, e.g. after a
+    signal gap. Fixes without an accuracy or timestamp pass those checks.
     
     Args:
-        points (list): List of location points
-        accuracy_threshold (float): Threshold for accuracy in meters
+        latitudes, longitudes (array-like): Fix coordinates in degrees, in track order
+        timestamps (array-like): Fix times in seconds since the epoch, NaN if unknown
+        horizontal_accuracy (array-like): Accuracy radius in meters, NaN if unknown
+        accuracy_threshold (float): Worst accepted accuracy, defaults to GPS_MAX_ACCURACY_M
+        max_speed_mps (float): Fastest plausible speed, defaults to GPS_MAX_SPEED_MPS
+        previous (tuple): (latitude, longitude, timestamp) of the last kept fix before
+            this track, if any
         
     Returns:
-        list: Filtered list of points
+        tuple: (keep, rejected) where keep is a boolean array and rejected maps
+        each reason ('accuracy', 'duplicate_timestamp', 'speed') to a count
     """
-    filtered_points = []
+    accuracy_threshold = location_setting('GPS_MAX_ACCURACY_M') if accuracy_threshold is None else accuracy_threshold
+    max_speed_mps = location_setting('GPS_MAX_SPEED_MPS') if max_speed_mps is None else max_speed_mps
+    
+    latitudes = np.asarray(latitudes, dtype=float)
+    longitudes = np.asarray(longitudes, dtype=float)
+    timestamps = np.asarray(timestamps, dtype=float)
+    horizontal_accuracy = np.asarray(horizontal_accuracy, dtype=float)
+    
+    # The previous fix takes part in the comparisons but is never rejected
+    offset = 0
+    if previous is not None and previous[0] is not None:
+        latitudes = np.concatenate(([previous[0]], latitudes))
+        longitudes = np.concatenate(([previous[1]], longitudes))
+        timestamps = np.concatenate(([np.nan if previous[2] is None else previous[2]], timestamps))
+        horizontal_accuracy = np.concatenate(([np.nan], horizontal_accuracy))
+        offset = 1
+    
+    keep = np.ones(latitudes.size, dtype=bool)
+    rejected = {'accuracy': 0, 'duplicate_timestamp': 0, 'speed': 0}
+    
+    if accuracy_threshold:
+        inaccurate = horizontal_accuracy > accuracy_threshold
+        inaccurate[:offset] = False
+        keep &= ~inaccurate
+        rejected['accuracy'] = int(inaccurate.sum())
+    
+    kept = np.flatnonzero(keep)
+    duplicate = np.diff(timestamps[kept]) == 0
+    keep[kept[1:][duplicate]] = False
+    rejected['duplicate_timestamp'] = int(duplicate.sum())
     
-    for point in points:
-        # Assuming point has an 'accuracy' attribute
-        if hasattr(point, 'accuracy') and point.accuracy <= accuracy_threshold:
-            filtered_points.append(point)
-        elif not hasattr(point, 'accuracy'):
-            # If no accuracy data, include the point
-            filtered_points.append(point)
+    while max_speed_mps:
+        kept = np.flatnonzero(keep)
+        if kept.size < 2:
+            break
+        elapsed = np.abs(np.diff(timestamps[kept]))
+        meters = segment_distances(latitudes[kept], longitudes[kept], method='equirectangular') * 1000
+        with np.errstate(divide='ignore', invalid='ignore'):
+            too_fast = meters / elapsed > max_speed_mps
+        spike = too_fast & np.concatenate((too_fast[1:], [True]))
+        # Neighbouring spikes share a jump; reject the first of each run this round
+        spike &= ~np.concatenate(([False], spike[:-1]))
+        if not spike.any():
+            break
+        keep[kept[1:][spike]] = False
+        rejected['speed'] += int(spike.sum())
     
-    return filtered_points
+    return keep[offset:], rejected
@@ -0,0 +1,117 @@
+from datetime import date, datetime, timedelta, timezone
+
+# Breakdown bucket sizes and the response key each one is reported under
+BUCKET_KEYS = {
+    'day': 'daily_breakdown',
+    'week': 'weekly_breakdown',
+    'month': 'monthly_breakdown',
+}
+
+
+def to_utc_naive(value):
+    """
+    Normalize an aware datetime to naive UTC, matching datetime.utcnow() columns.
+
+    Args:
+        value (datetime): Aware or naive datetime, or None
+
+    Returns:
+        datetime: Naive UTC datetime, or None
+    """
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _midnight(day):
+    return datetime(day.year, day.month, day.day)
+
+
+def year_range(year):
+    """
+    Half-open [start, end) datetime range covering a calendar year.
+
+    Args:
+        year (int): Calendar year
+
+    Returns:
+        tuple: (start, end) naive datetimes
+    """
+    return datetime(year, 1, 1), datetime(year + 1, 1, 1)
+
+
+def month_range(year, month):
+    """
+    Half-open [start, end) datetime range covering a calendar month.
+
+    Args:
+        year (int): Calendar year
+        month (int): Month number, 1-12
+
+    Returns:
+        tuple: (start, end) naive datetimes
+    """
+    start = datetime(year, month, 1)
+    end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    return start, end
+
+
+def iso_week_range(year, week):
+    """
+    Half-open [start, end) datetime range covering an ISO 8601 week.
+
+    ISO weeks run Monday to Sunday, and week 1 is the week containing the
+    year's first Thursday, so a week can start in the previous calendar year.
+
+    Args:
+        year (int): ISO week-numbering year
+        week (int): ISO week number, 1-53
+
+    Returns:
+        tuple: (start, end) naive datetimes
+    """
+    start = _midnight(date.fromisocalendar(year, week, 1))
+    return start, start + timedelta(days=7)
+
+
+def _next_month(day):
+    return date(day.year + 1, 1, 1) if day.month == 12 else date(day.year, day.month + 1, 1)
+
+
+def bucket_ranges(start, end, bucket):
+    """
+    Split a period into consecutive breakdown buckets.
+
+    Buckets are aligned to calendar days, ISO weeks or calendar months and
+    clipped to the period, so they exactly tile [start, end).
+
+    Args:
+        start (datetime): Inclusive start of the period, at midnight
+        end (datetime): Exclusive end of the period, at midnight
+        bucket (str): One of BUCKET_KEYS
+
+    Returns:
+        list: (label, bucket_start, bucket_end) tuples, where label is a dict
+        identifying the bucket in API responses
+    """
+    buckets = []
+    day = start.date()
+
+    while _midnight(day) < end:
+        if bucket == 'day':
+            following = day + timedelta(days=1)
+            label = {'date': day.isoformat()}
+        elif bucket == 'week':
+            following = day + timedelta(days=7 - day.weekday())
+            iso_year, iso_week, _ = day.isocalendar()
+            label = {'year': iso_year, 'week': iso_week}
+        elif bucket == 'month':
+            following = _next_month(day)
+            label = {'month': day.month}
+        else:
+            raise ValueError(f"Unknown bucket: {bucket}")
+
+        buckets.append((label, _midnight(day), min(_midnight(following), end)))
+        day = following
+
+    return buckets
@@ -0,0 +1,218 @@
+import base64
+from datetime import datetime, timedelta
+
+# Route formats accepted by format= parameters, besides the default JSON point list
+ROUTE_FORMATS = ('polyline', 'binary')
+
+# Integer units per degree; the polyline keeps Google's 1e5 (about 1.1 m)
+POLYLINE_PRECISION = 1e5
+BINARY_PRECISION = 1e6
+
+# Altitudes are stored in decimeters and timestamps in milliseconds since the epoch
+ALTITUDE_SCALE = 10
+EPOCH = datetime(1970, 1, 1)
+_MILLISECOND = timedelta(milliseconds=1)
+
+BINARY_VERSION = 1
+
+
+def _route_deltas(points, precision):
+    """
+    Turn points into per-point integer deltas from the previous point.
+
+    Coordinates are rounded before differencing, so rounding errors do not
+    accumulate along the track. Altitude and time are optional per point:
+    they are written as 2 * delta + 1 against the last point that had a
+    value, and as 0 when missing.
+    """
+    last_lat = last_lon = last_alt = last_time = 0
+    for latitude, longitude, altitude, timestamp in points:
+        lat = round(latitude * precision)
+        lon = round(longitude * precision)
+        yield lat - last_lat
+        yield lon - last_lon
+        last_lat, last_lon = lat, lon
+
+        if altitude is None:
+            yield 0
+        else:
+            alt = round(altitude * ALTITUDE_SCALE)
+            yield 2 * (alt - last_alt) + 1
+            last_alt = alt
+
+        if timestamp is None:
+            yield 0
+        else:
+            time_ms = (timestamp - EPOCH) // _MILLISECOND
+            yield 2 * (time_ms - last_time) + 1
+            last_time = time_ms
+
+
+def _route_points(values, precision):
+    """Rebuild point dicts from the integers produced by _route_deltas."""
+    points = []
+    lat = lon = alt = time_ms = 0
+    values = iter(values)
+    for lat_delta in values:
+        lat += lat_delta
+        lon += next(values)
+
+        altitude = None
+        alt_value = next(values)
+        if alt_value:
+            alt += (alt_value - 1) // 2
+            altitude = alt / ALTITUDE_SCALE
+
+        timestamp = None
+        time_value = next(values)
+        if time_value:
+            time_ms += (time_value - 1) // 2
+            timestamp = (EPOCH + time_ms * _MILLISECOND).isoformat()
+
+        points.append({
+            'latitude': lat / precision,
+            'longitude': lon / precision,
+            'altitude': altitude,
+            'timestamp': timestamp
+        })
+    return points
+
+
+def encode_polyline(points):
+    """
+    Encode a route as a Google encoded polyline extended with altitude and time.
+
+    Each point contributes four signed values (latitude, longitude,
+    altitude, time) in the polyline algorithm's printable 5-bit chunks, so
+    the lat/lon pairs use the familiar 1e5 precision.
+
+    Args:
+        points (iterable): (latitude, longitude, altitude, timestamp) tuples in
+            track order; altitude and timestamp may be None
+
+    Returns:
+        str: Encoded route
+    """
+    chunks = []
+    for value in _route_deltas(points, POLYLINE_PRECISION):
+        value = ~(value << 1) if value < 0 else value << 1
+        while value >= 0x20:
+            chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+            value >>= 5
+        chunks.append(chr(value + 63))
+    return ''.join(chunks)
+
+
+def decode_polyline(encoded):
+    """
+    Decode a route produced by encode_polyline.
+
+    Args:
+        encoded (str): Encoded route
+
+    Returns:
+        list: Point dicts with latitude, longitude, altitude and ISO timestamp
+
+    Raises:
+        ValueError: If the string is not a complete encoded route
+    """
+    def values():
+        index, length = 0, len(encoded)
+        while index < length:
+            result, shift = 0, 0
+            while True:
+                if index >= length:
+                    raise ValueError("Truncated polyline")
+                chunk = ord(encoded[index]) - 63
+                index += 1
+                result |= (chunk & 0x1f) << shift
+                shift += 5
+                if chunk < 0x20:
+                    break
+            yield ~(result >> 1) if result & 1 else result >> 1
+
+    try:
+        return _route_points(values(), POLYLINE_PRECISION)
+    except StopIteration:
+        raise ValueError("Truncated polyline")
+
+
+def encode_binary(points):
+    """
+    Encode a route as zigzag varint deltas behind a version byte.
+
+    Uses the same per-point values as the polyline at 1e6 coordinate
+    precision, packed 7 bits per byte instead of 5 printable bits.
+
+    Args:
+        points (iterable): (latitude, longitude, altitude, timestamp) tuples in
+            track order; altitude and timestamp may be None
+
+    Returns:
+        bytes: Encoded route
+    """
+    out = bytearray([BINARY_VERSION])
+    for value in _route_deltas(points, BINARY_PRECISION):
+        value = value << 1 if value >= 0 else (-value << 1) - 1
+        while value >= 0x80:
+            out.append(0x80 | (value & 0x7f))
+            value >>= 7
+        out.append(value)
+    return bytes(out)
+
+
+def decode_binary(data):
+    """
+    Decode a route produced by encode_binary.
+
+    Args:
+        data (bytes): Encoded route
+
+    Returns:
+        list: Point dicts with latitude, longitude, altitude and ISO timestamp
+
+    Raises:
+        ValueError: If the data is not a complete encoded route
+    """
+    if not data or data[0] != BINARY_VERSION:
+        raise ValueError("Unsupported binary route version")
+
+    def values():
+        index, length = 1, len(data)
+        while index < length:
+            result, shift = 0, 0
+            while True:
+                if index >= length:
+                    raise ValueError("Truncated binary route")
+                byte = data[index]
+                index += 1
+                result |= (byte & 0x7f) << shift
+                shift += 7
+                if byte < 0x80:
+                    break
+            yield -((result + 1) >> 1) if result & 1 else result >> 1
+
+    try:
+        return _route_points(values(), BINARY_PRECISION)
+    except StopIteration:
+        raise ValueError("Truncated binary route")
+
+
+def encode_route(points, route_format):
+    """
+    Encode a route for a JSON response in one of ROUTE_FORMATS.
+
+    Args:
+        points (iterable): (latitude, longitude, altitude, timestamp) tuples in track order
+        route_format (str): 'polyline' or 'binary'
+
+    Returns:
+        dict: {"format", "precision", "data"}; binary data is base64 encoded
+    """
+    if route_format == 'polyline':
+        return {'format': 'polyline', 'precision': POLYLINE_PRECISION,
+                'data': encode_polyline(points)}
+    if route_format == 'binary':
+        return {'format': 'binary', 'precision': BINARY_PRECISION,
+                'data': base64.b64encode(encode_binary(points)).decode('ascii')}
+    raise ValueError(f"Unknown route format: {route_format}")
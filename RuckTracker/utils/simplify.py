@@ -0,0 +1,168 @@
+import heapq
+
+import numpy as np
+
+from utils.geodesy import EARTH_RADIUS_KM
+
+# Simplification algorithms, and the unit their tolerance is given in
+SIMPLIFY_METHODS = {
+    'rdp': 'meters',
+    'vw': 'square meters',
+}
+
+
+def local_xy(latitudes, longitudes):
+    """
+    Project a track onto a local plane in meters.
+
+    Uses an equirectangular projection around the track's mean latitude,
+    which is accurate to well under a percent over the extent of a ruck.
+
+    Args:
+        latitudes (array-like): Track latitudes in degrees
+        longitudes (array-like): Track longitudes in degrees
+
+    Returns:
+        tuple: (x, y) arrays in meters
+    """
+    latitudes = np.asarray(latitudes, dtype=float)
+    longitudes = np.asarray(longitudes, dtype=float)
+    if latitudes.size == 0:
+        return np.zeros(0), np.zeros(0)
+
+    radius_m = EARTH_RADIUS_KM * 1000
+    lat0 = np.radians(latitudes.mean())
+    x = radius_m * np.radians(longitudes - longitudes[0]) * np.cos(lat0)
+    y = radius_m * np.radians(latitudes - latitudes[0])
+    return x, y
+
+
+def _distances_to_segment(x, y, ax, ay, bx, by):
+    """Distances from points to the segment a-b, or to a if the segment is a single point."""
+    dx, dy = bx - ax, by - ay
+    length_sq = dx * dx + dy * dy
+    if length_sq == 0:
+        return np.hypot(x - ax, y - ay)
+    t = np.clip(((x - ax) * dx + (y - ay) * dy) / length_sq, 0.0, 1.0)
+    return np.hypot(x - (ax + t * dx), y - (ay + t * dy))
+
+
+def rdp_importance(x, y):
+    """
+    Ramer-Douglas-Peucker importance of every point of a track.
+
+    A point's importance is the largest tolerance at which RDP keeps it, so
+    running RDP at any tolerance t is equivalent to keeping the points with
+    importance > t. One pass therefore serves every level of detail.
+
+    Args:
+        x, y (numpy.ndarray): Projected track coordinates in meters
+
+    Returns:
+        numpy.ndarray: Importance in meters; endpoints are infinite
+    """
+    n = len(x)
+    importance = np.zeros(n)
+    if n == 0:
+        return importance
+    importance[0] = importance[-1] = np.inf
+
+    stack = [(0, n - 1, np.inf)]
+    while stack:
+        start, end, parent = stack.pop()
+        if end - start < 2:
+            continue
+
+        distances = _distances_to_segment(x[start + 1:end], y[start + 1:end],
+                                          x[start], y[start], x[end], y[end])
+        index = start + 1 + int(np.argmax(distances))
+        # A point is only reached if every enclosing split was kept
+        value = min(float(distances[index - start - 1]), parent)
+        importance[index] = value
+
+        stack.append((start, index, value))
+        stack.append((index, end, value))
+
+    return importance
+
+
+def vw_importance(x, y):
+    """
+    Visvalingam-Whyatt importance of every point of a track.
+
+    Points are removed smallest effective area first. A point's importance
+    is the largest area removed up to and including it, which keeps the
+    order monotonic, so keeping points with importance > t matches running
+    VW with an area threshold of t.
+
+    Args:
+        x, y (numpy.ndarray): Projected track coordinates in meters
+
+    Returns:
+        numpy.ndarray: Importance in square meters; endpoints are infinite
+    """
+    n = len(x)
+    importance = np.full(n, np.inf)
+    if n < 3:
+        return importance
+
+    x, y = x.tolist(), y.tolist()
+
+    def area(a, b, c):
+        return abs((x[b] - x[a]) * (y[c] - y[a]) - (x[c] - x[a]) * (y[b] - y[a])) / 2
+
+    previous = list(range(-1, n - 1))
+    following = list(range(1, n + 1))
+    current = [None] + [area(i - 1, i, i + 1) for i in range(1, n - 1)] + [None]
+    heap = [(current[i], i) for i in range(1, n - 1)]
+    heapq.heapify(heap)
+
+    largest = 0.0
+    while heap:
+        value, index = heapq.heappop(heap)
+        # Skip entries superseded by a recomputed area or an earlier removal
+        if current[index] != value:
+            continue
+
+        largest = max(largest, value)
+        importance[index] = largest
+        current[index] = None
+
+        before, after = previous[index], following[index]
+        following[before], previous[after] = after, before
+        for neighbor in (before, after):
+            if 0 < neighbor < n - 1:
+                current[neighbor] = area(previous[neighbor], neighbor, following[neighbor])
+                heapq.heappush(heap, (current[neighbor], neighbor))
+
+    return importance
+
+
+IMPORTANCE_FUNCTIONS = {
+    'rdp': rdp_importance,
+    'vw': vw_importance,
+}
+
+
+def select_points(importance, tolerance=None, max_points=None):
+    """
+    Indices of the points to keep for a level of detail.
+
+    Args:
+        importance (numpy.ndarray): Output of rdp_importance or vw_importance
+        tolerance (float): Keep points more important than this, if given
+        max_points (int): Keep at most this many of the most important points, if given
+
+    Returns:
+        numpy.ndarray: Sorted indices into the track
+    """
+    if tolerance is not None:
+        candidates = np.flatnonzero(importance > tolerance)
+    else:
+        candidates = np.arange(len(importance))
+
+    if max_points is not None and len(candidates) > max_points:
+        top = np.argpartition(importance[candidates], -max_points)[-max_points:]
+        candidates = np.sort(candidates[top])
+
+    return candidates